@@ -0,0 +1,171 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+
+from decoder import decode_answer
+from settings import (API_CACHE, API_CACHE_SIZE, API_KEEP_ALIVE, API_POOL_SIZE,
+                      ENDPOINT)
+
+REQUEST_TIMEOUT = 10
+# Ответ API не изменился: тело не нужно декодировать и проверять.
+NOT_MODIFIED = object()
+_CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*\d+')
+
+
+class ResponseCache:
+    """Валидаторы и хеш последнего ответа API для каждого токена.
+
+    Запись ключуется токеном и from_date: если подписчик спрашивает с тем
+    же from_date, в запрос добавляются If-None-Match/If-Modified-Since, а
+    ответ, совпадающий с прошлым побайтно, считается неизменившимся.
+    Поле current_date при сравнении не учитывается - API обновляет его в
+    каждом ответе. Хранится по одной записи на токен, не больше size
+    записей: вытесняется токен, который дольше всех не опрашивали.
+
+    Ответ запоминается до разбора, поэтому если разобрать его не удалось,
+    запись нужно забыть (forget()): иначе тот же ответ при следующем
+    опросе сочтётся неизменившимся и сбой - исправленным.
+    """
+
+    def __init__(self, size=API_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+
+    def conditional_headers(self, token, from_date):
+        """Заголовки условного запроса, если у ответа были валидаторы."""
+        entry = self._entries.get(token)
+        if entry is None or entry[0] != from_date:
+            return {}
+        headers = {}
+        if entry[1]:
+            headers['If-None-Match'] = entry[1]
+        if entry[2]:
+            headers['If-Modified-Since'] = entry[2]
+        return headers
+
+    def unchanged(self, token, from_date, headers, content):
+        """Запоминает ответ и сообщает, совпал ли он с прошлым."""
+        digest = hashlib.blake2b(_CURRENT_DATE.sub(b'', content),
+                                 digest_size=16).digest()
+        entry = self._entries.pop(token, None)
+        self._entries[token] = (from_date, headers.get('ETag'),
+                                headers.get('Last-Modified'), digest)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return (entry is not None and entry[0] == from_date
+                and entry[3] == digest)
+
+    def forget(self, token):
+        """Забывает ответ для токена: следующий ответ будет разобран."""
+        self._entries.pop(token, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PracticumClient:
+    """Клиент API Практикума с пулом постоянных соединений.
+
+    Пока клиент не открыт, запросы идут через requests.get - так функции
+    homework можно вызывать без настройки. После open() все запросы идут
+    через общий requests.Session: DNS, TCP и TLS рукопожатие выполняются
+    один раз на соединение, а не на каждый опрос. Открытый клиент с
+    use_cache ещё и отправляет условные запросы через ResponseCache.
+
+    requests не закрывает простаивающие соединения сам, а заголовок
+    Keep-Alive серверы не обязаны соблюдать. Поэтому если клиент не делал
+    запросов дольше keep_alive секунд, перед следующим запросом
+    соединения пула закрываются и открываются заново.
+    """
+
+    def __init__(self, endpoint=ENDPOINT, timeout=REQUEST_TIMEOUT,
+                 pool_size=API_POOL_SIZE, keep_alive=API_KEEP_ALIVE,
+                 use_cache=API_CACHE, clock=time.monotonic):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.use_cache = use_cache
+        self.clock = clock
+        self.session = None
+        self.cache = None
+        self._last_used = clock()
+
+    def open(self):
+        """Создаёт сессию с пулом на pool_size соединений."""
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if self.keep_alive:
+            session.headers['Connection'] = 'keep-alive'
+            session.headers['Keep-Alive'] = f'timeout={self.keep_alive}'
+        else:
+            session.headers['Connection'] = 'close'
+        self.session = session
+        if self.use_cache:
+            self.cache = ResponseCache()
+        return self
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request_params(self, token, timestamp):
+        """Параметры запроса статусов домашних работ для токена."""
+        headers = {'Authorization': f'OAuth {token}'}
+        if self.cache is not None:
+            headers.update(self.cache.conditional_headers(token, timestamp))
+        return {'url': self.endpoint, 'headers': headers,
+                'params': {'from_date': timestamp}, 'timeout': self.timeout}
+
+    def decode(self, token, timestamp, response):
+        """Тело ответа как dict или NOT_MODIFIED, если оно не изменилось.
+
+        Открытый клиент разбирает тело decoder.decode_answer: работы в
+        ответе становятся записями Homework.
+        """
+        if self.session is None:
+            return response.json()
+        if self.cache is not None:
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                return NOT_MODIFIED
+            if self.cache.unchanged(token, timestamp, response.headers,
+                                    response.content):
+                return NOT_MODIFIED
+        return decode_answer(response.content)
+
+    def forget(self, token):
+        """Забывает закешированный ответ для токена, если кеш включён."""
+        if self.cache is not None:
+            self.cache.forget(token)
+
+    def get(self, **request_params):
+        """Выполняет GET запрос через пул соединений."""
+        if self.session is None:
+            import requests
+            return requests.get(**request_params)
+        self._expire_idle()
+        try:
+            return self.session.get(**request_params)
+        finally:
+            self._last_used = self.clock()
+
+    def _expire_idle(self):
+        idle = self.clock() - self._last_used
+        if self.keep_alive and idle > self.keep_alive:
+            for adapter in set(self.session.adapters.values()):
+                adapter.close()
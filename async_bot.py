@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from http import HTTPStatus
+
+import aiohttp
+from telegram.error import (BadRequest, NetworkError, RetryAfter,
+                            TelegramError, Unauthorized)
+
+import breaker
+import exceptions as exptns
+import homework
+import messages
+import metrics
+from api_client import NOT_MODIFIED, ResponseCache
+from decoder import decode_answer
+from engine import report_drift
+from error_digest import ErrorAggregator
+from log_setup import POLL_LOGGER
+from notifier import MESSAGE_SEPARATOR, Outbox, is_transient, report_sent
+from policy import parse_retry_after
+from scheduler import PollScheduler
+from settings import (API_CACHE, API_KEEP_ALIVE, API_POOL_SIZE, ENDPOINT,
+                      POLL_BATCH_WINDOW, POLL_STAGGER, TELEGRAM_API_URL)
+
+TELEGRAM_SEND_URL = TELEGRAM_API_URL + '{token}/sendMessage'
+REQUEST_TIMEOUT = 10
+MAX_SENDS_IN_FLIGHT = 8
+
+poll_log = logging.getLogger(POLL_LOGGER)
+
+
+async def get_api_answer(session, token, timestamp, cache=None):
+    """Асинхронно запрашивает эндпоинт API. Возвращает ответ API type dict.
+
+    С кешем cache вместо неизменившегося ответа возвращает NOT_MODIFIED.
+    Пока API недоступен, сразу выбрасывает CircuitOpenError.
+    """
+    poll_log.info('Асинхронный запрос к API.')
+    headers = {'Authorization': f'OAuth {token}'}
+    if cache is not None:
+        headers.update(cache.conditional_headers(token, timestamp))
+    params = {'from_date': int(timestamp)}
+    msg = (
+        'Во время подключения к эндпоинту {url} произошла непредвиденная'
+        'ошибка, params = {params};'
+    ).format(url=ENDPOINT, params=params)
+    breaker.PRACTICUM.before()
+    started = time.perf_counter()
+    failed = True
+    try:
+        async with session.get(ENDPOINT, headers=headers,
+                               params=params) as response:
+            failed = response.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            if response.status == HTTPStatus.NOT_MODIFIED:
+                return NOT_MODIFIED
+            if response.status != HTTPStatus.OK:
+                raise exptns.NotOkResponseError(
+                    msg, retry_after=parse_retry_after(
+                        response.headers.get('Retry-After'), time.time()
+                    )
+                )
+            content = await response.read()
+            if cache is not None and cache.unchanged(
+                token, timestamp, response.headers, content
+            ):
+                return NOT_MODIFIED
+            answer = decode_answer(content)
+    except Exception as error:
+        raise ConnectionError(msg, f' ошибка: {error}') from error
+    finally:
+        breaker.PRACTICUM.record(failed)
+        metrics.API_LATENCY.observe(time.perf_counter() - started)
+    poll_log.info('API запрошен.')
+    return answer
+
+
+async def send_message(session, bot_token, chat_id, message):
+    """Асинхронно отправляет сообщение в Telegram чат chat_id.
+
+    Пока телеграм недоступен, сразу выбрасывает CircuitOpenError.
+    """
+    breaker.TELEGRAM.before()
+    poll_log.info('Собираюсь отправить в телеграм сообщение: %s.', message)
+    url = TELEGRAM_SEND_URL.format(token=bot_token)
+    payload = {'chat_id': chat_id, 'text': message}
+    if messages.CATALOGUE.parse_mode:
+        payload['parse_mode'] = messages.CATALOGUE.parse_mode
+    started = time.perf_counter()
+    failed = True
+    try:
+        async with session.post(url, json=payload) as response:
+            failed = response.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            answer = await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        raise NetworkError(f'Ошибка при отправке телеграм сообщения: {error}')
+    finally:
+        breaker.TELEGRAM.record(failed)
+        metrics.SEND_LATENCY.observe(time.perf_counter() - started)
+    if not answer.get('ok'):
+        retry_after = answer.get('parameters', {}).get('retry_after')
+        if retry_after:
+            raise RetryAfter(retry_after)
+        raise telegram_error(response.status, answer.get('description'))
+    poll_log.info('Отправлено сообщение: %s', message)
+
+
+def telegram_error(status, description):
+    """Ошибка телеграма того же типа, что выбросил бы python-telegram-bot."""
+    message = f'Ошибка при отправке телеграм сообщения: {description}'
+    if status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        return NetworkError(message)
+    if status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+        return Unauthorized(message)
+    return BadRequest(message)
+
+
+class AsyncSendQueue:
+    """Драйвер Outbox для asyncio: отправки идут отдельной задачей.
+
+    put() не ждёт телеграма; до max_in_flight отправок выполняются
+    одновременно. Ошибки отправки и on_sent обрабатываются так же, как в
+    notifier.SendQueue.
+    """
+
+    def __init__(self, session, bot_token, outbox=None,
+                 max_in_flight=MAX_SENDS_IN_FLIGHT, on_sent=None):
+        self.session = session
+        self.bot_token = bot_token
+        self.outbox = Outbox() if outbox is None else outbox
+        self.on_sent = on_sent
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def put(self, chat_id, message):
+        """Ставит сообщение в очередь на отправку."""
+        self.outbox.put(chat_id, message)
+        self._wakeup.set()
+
+    def put_many(self, chat_ids, message):
+        """Ставит одно сообщение в очередь для нескольких чатов сразу."""
+        self.outbox.put_many(chat_ids, message)
+        self._wakeup.set()
+
+    async def run(self):
+        """Бесконечно отправляет сообщения из очереди."""
+        while True:
+            item, wait = self.outbox.take()
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._slots.acquire()
+            asyncio.create_task(self._deliver(*item))
+
+    async def _deliver(self, chat_id, messages):
+        try:
+            await send_message(self.session, self.bot_token, chat_id,
+                               MESSAGE_SEPARATOR.join(messages))
+        except (RetryAfter, exptns.CircuitOpenError) as error:
+            logging.warning('Отправка в чат %s отложена на %.0f с: %s',
+                            chat_id, error.retry_after, error)
+            self.outbox.requeue(chat_id, messages, error.retry_after)
+            self._wakeup.set()
+            return
+        except TelegramError as error:
+            if is_transient(error):
+                delay = self.outbox.retry(chat_id, messages)
+                logging.warning('Отправка в чат %s не удалась, повтор через '
+                                '%.0f с: %s', chat_id, delay, error)
+                self._wakeup.set()
+                return
+            logging.error('Сообщение в чат %s не отправлено: %s', chat_id,
+                          error, exc_info=True)
+        except Exception as error:
+            logging.error('Сбой отправки в чат %s: %s', chat_id, error,
+                          exc_info=True)
+        finally:
+            self._slots.release()
+        self.outbox.done(chat_id)
+        self._wakeup.set()
+        report_sent(self.on_sent, chat_id, messages)
+
+
+class AsyncPoller:
+    """Асинхронный конвейер опрос -> проверка -> разбор -> отправка.
+
+    Асинхронно здесь только выполняется запрос, полученный ответ
+    разбирается синхронной homework.handle_response, общей с синхронным
+    режимом. Сообщения уходят через send_queue и не задерживают опрос, о
+    сбоях сообщается так, как решит агрегатор errors.
+    """
+
+    def __init__(self, session, send_queue, errors, cache=None):
+        self.session = session
+        self.send_queue = send_queue
+        self.errors = errors
+        self.cache = cache
+
+    async def poll(self, subscriber):
+        """Один цикл опроса API и отправки новых вердиктов подписчику.
+
+        Возвращает ошибку опроса или None - по ней выбирается пауза.
+        """
+        try:
+            response = await get_api_answer(
+                self.session, subscriber.token, subscriber.timestamp,
+                self.cache
+            )
+        except Exception as error:
+            return homework.handle_response(self.send_queue, self.errors,
+                                            subscriber, error=error,
+                                            cache=self.cache)
+        return homework.handle_response(self.send_queue, self.errors,
+                                        subscriber, response,
+                                        cache=self.cache)
+
+
+async def run_cycle(scheduler, poll, max_concurrency, policy):
+    """Опрашивает подписчиков, чей опрос наступил, в max_concurrency задач."""
+    due = iter(scheduler.pop_due())
+
+    async def worker():
+        for subscriber, scheduled in due:
+            scheduler.started(scheduled)
+            error = await poll(subscriber)
+            scheduler.reschedule(subscriber, scheduled,
+                                 policy.next_delay(subscriber, error))
+
+    await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+
+
+async def run(registry, bot_token, max_concurrency, policy,
+              after_cycle=None, outbox=None, journal=None,
+              stagger=POLL_STAGGER, window=POLL_BATCH_WINDOW):
+    """Бесконечный асинхронный цикл опроса по расписанию policy.
+
+    С журналом journal сообщения проходят через state.StateJournal так же,
+    как в синхронном режиме; after_cycle тогда должен вызывать его commit().
+    """
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    if API_KEEP_ALIVE:
+        connector = aiohttp.TCPConnector(limit=API_POOL_SIZE,
+                                         keepalive_timeout=API_KEEP_ALIVE)
+    else:
+        connector = aiohttp.TCPConnector(limit=API_POOL_SIZE,
+                                         force_close=True)
+    async with aiohttp.ClientSession(timeout=timeout,
+                                     connector=connector) as session:
+        send_queue = AsyncSendQueue(
+            session, bot_token, outbox,
+            on_sent=journal.sent if journal is not None else None
+        )
+        metrics.SEND_QUEUE_DEPTH.set_function(send_queue.outbox.__len__)
+        if journal is not None:
+            journal.bind(send_queue)
+        poller = AsyncPoller(
+            session, send_queue if journal is None else journal,
+            ErrorAggregator(),
+            ResponseCache() if API_CACHE else None
+        )
+
+        scheduler = PollScheduler(registry, stagger, window=window)
+
+        async def poll_forever():
+            while True:
+                await run_cycle(scheduler, poller.poll, max_concurrency,
+                                policy)
+                if after_cycle is not None:
+                    after_cycle()
+                report_drift(scheduler)
+                await asyncio.sleep(scheduler.time_to_next())
+
+        await asyncio.gather(send_queue.run(), poll_forever())
@@ -0,0 +1,166 @@
+"""Бенчмарки горячих функций бота.
+
+Запуск: python -m benchmarks.run --output bench.json
+Сравнение с прошлым прогоном: python -m benchmarks.run --compare old.json
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import threading
+import timeit
+from functools import partial
+
+import decoder
+import homework
+import messages
+from api_client import PracticumClient
+from engine import PollingEngine
+from error_digest import ErrorAggregator
+from policy import FixedPolicy
+from subscribers import Subscriber, SubscriberRegistry
+from tools import fake_practicum
+
+PAYLOAD_SIZES = (0, 10, 100, 1000, 10000)
+STATUSES = messages.CATALOGUE.statuses
+REPEAT = 5
+
+
+class NullQueue:
+    """Очередь отправки, которая ничего не отправляет."""
+
+    def put(self, chat_id, message):
+        """Отбрасывает сообщение."""
+
+    def put_many(self, chat_ids, message):
+        """Отбрасывает сообщение для всех чатов."""
+
+
+def make_response(size):
+    """Ответ API с size работами."""
+    return {
+        'homeworks': [
+            {'id': index, 'homework_name': f'hw{index}',
+             'status': STATUSES[index % len(STATUSES)],
+             'date_updated': '2022-02-13T14:40:57Z',
+             'lesson_name': 'Итоговый проект', 'reviewer_comment': ''}
+            for index in range(size)
+        ],
+        'current_date': 1000198000,
+    }
+
+
+def measure(name, func, size=None):
+    """Время одного вызова func: медиана и разброс по REPEAT замерам."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    samples = [total / number for total in timer.repeat(REPEAT, number)]
+    result = {'name': name, 'size': size, 'number': number,
+              'median': statistics.median(samples), 'min': min(samples),
+              'stdev': statistics.stdev(samples)}
+    print(f'{name:<28} {size if size is not None else "":>6} '
+          f'{result["median"] * 1e6:>12.2f} мкс')
+    return result
+
+
+def bench_pure():
+    """check_response и parse_status на ответах разного размера."""
+    results = []
+    for size in PAYLOAD_SIZES:
+        response = make_response(size)
+        homeworks = response['homeworks']
+        results.append(measure(
+            'check_response', partial(homework.check_response, response), size
+        ))
+        results.append(measure(
+            'parse_status', lambda: [homework.parse_status(item)
+                                     for item in homeworks], size
+        ))
+    return results
+
+
+def bench_decode():
+    """Разбор тела ответа: json.loads против decoder.decode_answer."""
+    results = []
+    for size in PAYLOAD_SIZES:
+        content = json.dumps(make_response(size)).encode()
+        results.append(measure('json_loads',
+                               partial(json.loads, content), size))
+        results.append(measure(f'decode_answer_{decoder.DECODER}',
+                               partial(decoder.decode_answer, content), size))
+    return results
+
+
+def bench_stub():
+    """get_api_answer и итерация цикла main против локальной заглушки."""
+    simulation = fake_practicum.Simulation(homeworks=3, transition_rate=0)
+    server = fake_practicum.make_server(simulation)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = (f'http://127.0.0.1:{server.server_port}'
+                f'{fake_practicum.API_PATH}')
+    homework.api_client = PracticumClient(endpoint=endpoint).open()
+    registry = SubscriberRegistry(
+        Subscriber(f'token{index}', index, timestamp=0) for index in range(10)
+    )
+    engine = PollingEngine(
+        registry, partial(homework.poll_subscriber, NullQueue(),
+                          ErrorAggregator()),
+        4, FixedPolicy(0),
+    )
+    try:
+        return [
+            measure('get_api_answer', partial(homework.get_api_answer_for,
+                                              'token', 0)),
+            measure('main_loop_iteration', engine.run_cycle, len(registry)),
+        ]
+    finally:
+        engine.shutdown()
+        homework.api_client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def git_revision():
+    """Текущий коммит или None вне git."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    """Печатает отношение медиан к прошлому прогону из path."""
+    with open(path, encoding='utf-8') as file:
+        baseline = {(item['name'], item['size']): item['median']
+                    for item in json.load(file)['results']}
+    for item in results:
+        old = baseline.get((item['name'], item['size']))
+        if old:
+            print(f'{item["name"]:<28} {item["size"] or "":>6} '
+                  f'{item["median"] / old:>8.2f}x')
+
+
+def main(argv=None):
+    """Прогоняет бенчмарки и сохраняет результат в JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare')
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    results = bench_pure() + bench_decode() + bench_stub()
+    report = {'revision': git_revision(), 'python': platform.python_version(),
+              'results': results}
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Предохранители (circuit breaker) API Практикума и телеграма.
+
+Пока сервис недоступен, опросы и отправки не ждут таймаута, а сразу
+получают CircuitOpenError. Предохранитель общий для всех подписчиков
+процесса:
+- closed: запросы идут, неудачи подряд считаются; threshold неудач
+  размыкают цепь;
+- open: запросы отклоняются reset_timeout секунд;
+- half-open: проходит один пробный запрос, остальные отклоняются до
+  его результата; успех замыкает цепь, неудача снова размыкает.
+Неудачей считается только признак недоступности сервиса - сетевая
+ошибка, таймаут или ответ 5xx; ответ с ошибкой про конкретный токен или
+чат означает, что сервис работает.
+"""
+import logging
+import threading
+import time
+
+import metrics
+from exceptions import CircuitOpenError
+from settings import (API_BREAKER_RESET, API_BREAKER_THRESHOLD,
+                      TELEGRAM_BREAKER_RESET, TELEGRAM_BREAKER_THRESHOLD)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Предохранитель одного сервиса. threshold=0 выключает его."""
+
+    def __init__(self, name, threshold, reset_timeout, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            logging.warning('Предохранитель %s: %s -> %s.', self.name,
+                            self.state, state)
+            metrics.BREAKER_TRANSITIONS.inc(self.name, state)
+            self.state = state
+
+    def _reject(self, retry_after):
+        metrics.BREAKER_REJECTED.inc(self.name)
+        raise CircuitOpenError(
+            f'Сервис {self.name} недоступен, запросы приостановлены',
+            retry_after=retry_after,
+        )
+
+    def before(self):
+        """Пропускает запрос или отклоняет его CircuitOpenError.
+
+        Пропущенный запрос должен закончиться вызовом record().
+        """
+        if not self.threshold:
+            return
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN:
+                self._reject(self.reset_timeout)
+            remaining = self._opened_at + self.reset_timeout - self.clock()
+            if remaining > 0:
+                self._reject(remaining)
+            self._set_state(HALF_OPEN)
+
+    def record(self, failed):
+        """Учитывает исход пропущенного запроса."""
+        if not self.threshold:
+            return
+        with self._lock:
+            if not failed:
+                self.failures = 0
+                self._set_state(CLOSED)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self._opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def reset(self):
+        """Замыкает цепь и забывает неудачи."""
+        with self._lock:
+            self.failures = 0
+            self.state = CLOSED
+
+
+PRACTICUM = CircuitBreaker('practicum', API_BREAKER_THRESHOLD,
+                           API_BREAKER_RESET)
+TELEGRAM = CircuitBreaker('telegram', TELEGRAM_BREAKER_THRESHOLD,
+                          TELEGRAM_BREAKER_RESET)
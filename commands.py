@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime
+
+from telegram.ext import CommandHandler, Updater
+
+import messages
+from settings import (SUBSCRIBERS_PATH, TELEGRAM_API_URL, WEBHOOK_LISTEN,
+                      WEBHOOK_PORT, WEBHOOK_URL)
+from subscribers import save_subscriber
+
+UPDATER_WORKERS = 2
+
+
+def status_text(subscribers, locale=None):
+    """Ответ на /status по уже известным боту статусам подписок чата.
+
+    Статусы называются по каталогу сообщений в локали locale.
+    """
+    if not subscribers:
+        return 'Вы не подписаны. Отправьте /subscribe <токен Практикума>.'
+    lines = []
+    for subscriber in subscribers:
+        counts = subscriber.homeworks.counts()
+        checked = datetime.fromtimestamp(subscriber.timestamp).strftime(
+            '%d.%m.%Y %H:%M'
+        )
+        if not counts:
+            lines.append(f'Изменений статусов с {checked} не было.')
+            continue
+        summary = ', '.join(
+            f'{messages.CATALOGUE.label(status, locale)} - {count}'
+            for status, count in sorted(counts.items())
+        )
+        lines.append(f'Работ: {sum(counts.values())} ({summary}). '
+                     f'Последнее изменение учтено {checked}.')
+    return '\n'.join(lines)
+
+
+class CommandHandlers:
+    """Обработчики команд телеграма поверх реестра подписчиков.
+
+    /status отвечает из состояния в памяти и не обращается к API.
+    /subscribe добавляет подписчика в реестр, который опрашивает движок, и
+    дописывает его в SUBSCRIBERS_PATH, чтобы подписка пережила перезапуск.
+    Чат, подписавшийся на уже известный токен, добавляется в его рассылку.
+    """
+
+    def __init__(self, registry, subscribers_path=SUBSCRIBERS_PATH):
+        self.registry = registry
+        self.subscribers_path = subscribers_path
+
+    def status(self, update, context):
+        """Команда /status."""
+        chat_id = update.effective_chat.id
+        subscribers = [subscriber for subscriber in self.registry
+                       if chat_id in subscriber.chats]
+        update.message.reply_text(status_text(
+            subscribers, messages.CATALOGUE.locale_for(chat_id)
+        ))
+
+    def subscribe(self, update, context):
+        """Команда /subscribe <токен>."""
+        if not self.subscribers_path:
+            update.message.reply_text('Подписка через бота не включена.')
+            return
+        if len(context.args) != 1:
+            update.message.reply_text(
+                'Отправьте /subscribe <токен Практикума>.'
+            )
+            return
+        token = context.args[0]
+        chat_id = update.effective_chat.id
+        current = self.registry.get(token)
+        if current is not None and chat_id in current.chats:
+            update.message.reply_text('Вы уже подписаны на этот токен.')
+            return
+        save_subscriber(self.subscribers_path, token, chat_id)
+        self.registry.subscribe(token, chat_id)
+        logging.info('Новый подписчик в чате %s.', chat_id)
+        update.message.reply_text(
+            'Подписка оформлена: пришлю сообщение, когда статус работы '
+            'изменится.'
+        )
+
+
+def start_updater(token, registry, mode):
+    """Запускает приём команд в фоновых потоках python-telegram-bot.
+
+    mode - polling (long polling getUpdates) или webhook. Опрос API
+    Практикума продолжается в основном потоке и не ждёт команд.
+    """
+    updater = Updater(token=token, base_url=TELEGRAM_API_URL,
+                      workers=UPDATER_WORKERS)
+    handlers = CommandHandlers(registry)
+    updater.dispatcher.add_handler(CommandHandler('status', handlers.status))
+    updater.dispatcher.add_handler(
+        CommandHandler(['start', 'subscribe'], handlers.subscribe)
+    )
+    if mode == 'webhook':
+        updater.start_webhook(listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT,
+                              url_path=token, webhook_url=WEBHOOK_URL + token)
+    else:
+        updater.start_polling()
+    logging.info('Приём команд телеграма запущен: %s.', mode)
+    return updater
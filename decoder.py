@@ -0,0 +1,127 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+from settings import JSON_DECODER
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _orjson_loads():
+    import orjson
+    return orjson.loads
+
+
+def _msgspec_loads():
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+
+def _json_loads():
+    return json.loads
+
+
+LOADERS = {'orjson': _orjson_loads, 'msgspec': _msgspec_loads,
+           'json': _json_loads}
+AUTO_ORDER = ('orjson', 'msgspec', 'json')
+
+
+def select_loads(name=JSON_DECODER):
+    """Имя и функция разбора JSON: name или, при auto, самая быстрая.
+
+    Не установленная библиотека заменяется стандартным json.
+    """
+    if name != 'auto' and name not in LOADERS:
+        raise ValueError(f'Неизвестный разборщик JSON: {name}')
+    for candidate in AUTO_ORDER if name == 'auto' else (name, 'json'):
+        try:
+            return candidate, LOADERS[candidate]()
+        except ImportError:
+            if candidate == name:
+                logging.warning('Библиотека %s не установлена, ответы API '
+                                'разбираются стандартным json.', name)
+
+
+DECODER, loads = select_loads()
+
+
+class Homework:
+    """Домашняя работа из ответа API: только поля, нужные боту.
+
+    Для кода, написанного под словари из API, запись отвечает на get() и
+    [] по именам полей API: homework_name, status, id, date_updated.
+    """
+
+    __slots__ = ('id', 'name', 'status', 'date_updated')
+
+    FIELDS = {'id': 'id', 'homework_name': 'name', 'status': 'status',
+              'date_updated': 'date_updated'}
+
+    def __init__(self, name, status, homework_id=None, date_updated=None):
+        self.id = homework_id
+        self.name = name
+        self.status = sys.intern(status)
+        self.date_updated = date_updated
+
+    @property
+    def updated(self):
+        """Время последнего изменения, с эпохи, или None."""
+        if not self.date_updated:
+            return None
+        return int(datetime.strptime(self.date_updated, DATE_FORMAT)
+                   .replace(tzinfo=timezone.utc).timestamp())
+
+    def get(self, field, default=None):
+        """Значение поля API field или default, как у словаря."""
+        attribute = self.FIELDS.get(field)
+        return default if attribute is None else getattr(self, attribute)
+
+    def __getitem__(self, field):
+        attribute = self.FIELDS.get(field)
+        if attribute is None:
+            raise KeyError(field)
+        return getattr(self, attribute)
+
+    def keys(self):
+        """Имена полей API, как у словаря."""
+        return self.FIELDS.keys()
+
+    def __eq__(self, other):
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return all(getattr(self, attribute) == getattr(other, attribute)
+                   for attribute in self.__slots__)
+
+    def __repr__(self):
+        return (f'Homework(name={self.name!r}, status={self.status!r}, '
+                f'id={self.id!r})')
+
+
+def to_record(item):
+    """Homework из словаря API или сам item, если он некорректен.
+
+    Некорректные элементы остаются как есть, чтобы parse_status сообщил
+    о них прежней ошибкой.
+    """
+    if isinstance(item, dict):
+        name = item.get('homework_name')
+        status = item.get('status')
+        if name and status and isinstance(status, str):
+            return Homework(name, status, item.get('id'),
+                            item.get('date_updated'))
+    return item
+
+
+def decode_answer(content, loads=loads):
+    """Разбирает тело ответа API, заменяя работы записями Homework.
+
+    Ответ неожиданной формы возвращается как есть: его отвергнет
+    check_response.
+    """
+    answer = loads(content)
+    if isinstance(answer, dict):
+        homeworks = answer.get('homeworks')
+        if isinstance(homeworks, list):
+            answer['homeworks'] = [to_record(item) for item in homeworks]
+    return answer
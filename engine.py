@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+import metrics
+from scheduler import PollScheduler
+
+# Отставание опросов от расписания, при котором пишется предупреждение, с.
+DRIFT_WARNING = 30
+
+
+class BaseEngine(ABC):
+    """Общая часть движков опроса: расписание и цикл run_forever().
+
+    Момент следующего опроса каждого подписчика выбирает policy по
+    результату предыдущего, а PollScheduler разносит первые опросы по окну
+    stagger и собирает в один цикл опросы, наступившие за window секунд.
+    Наследники реализуют run_cycle() и shutdown().
+    """
+
+    def __init__(self, registry, policy, after_cycle=None,
+                 clock=time.monotonic, sleep=None, stagger=0, window=0):
+        self.registry = registry
+        self.policy = policy
+        self.after_cycle = after_cycle
+        self.clock = clock
+        self.scheduler = PollScheduler(registry, stagger, clock, window)
+        self._stopping = threading.Event()
+        self.sleep = sleep or self._stopping.wait
+
+    def _reschedule(self, subscriber, scheduled, error):
+        self.scheduler.reschedule(
+            subscriber, scheduled, self.policy.next_delay(subscriber, error)
+        )
+
+    def _cycle_done(self):
+        if self.after_cycle is not None:
+            self.after_cycle()
+        report_drift(self.scheduler)
+
+    @abstractmethod
+    def run_cycle(self):
+        """Опрашивает подписчиков, чей опрос наступил."""
+
+    def time_to_next_poll(self):
+        """Сколько секунд спать до ближайшего запланированного опроса."""
+        return self.scheduler.time_to_next()
+
+    def run_forever(self):
+        """Цикл опроса по расписанию до вызова stop()."""
+        self._stopping.clear()
+        while not self._stopping.is_set():
+            self.run_cycle()
+            self.sleep(self.time_to_next_poll())
+
+    def stop(self):
+        """Просит run_forever() завершиться после текущего цикла."""
+        self._stopping.set()
+
+    def shutdown(self):
+        """Освобождает ресурсы движка."""
+
+
+class PollingEngine(BaseEngine):
+    """Опрашивает подписчиков реестра из одного процесса.
+
+    Одновременно выполняется не больше max_concurrency опросов: новая задача
+    ставится в пул только после освобождения слота, поэтому число объектов
+    в памяти не зависит от количества подписчиков.
+    """
+
+    def __init__(self, registry, poll, max_concurrency, policy,
+                 after_cycle=None, clock=time.monotonic, sleep=None,
+                 stagger=0, window=0):
+        super().__init__(registry, policy, after_cycle, clock, sleep,
+                         stagger, window)
+        self.poll = poll
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='poll'
+        )
+
+    def _run_poll(self, subscriber, scheduled):
+        try:
+            self.scheduler.started(scheduled)
+            try:
+                error = self.poll(subscriber)
+            except Exception as exc:
+                logging.error('Необработанная ошибка опроса %r: %s',
+                              subscriber, exc, exc_info=True)
+                error = exc
+            self._reschedule(subscriber, scheduled, error)
+        finally:
+            self._slots.release()
+
+    def run_cycle(self):
+        """Опрашивает подписчиков, чей опрос наступил, и ждёт завершения."""
+        for subscriber, scheduled in self.scheduler.pop_due():
+            self._slots.acquire()
+            self._executor.submit(self._run_poll, subscriber, scheduled)
+        for _ in range(self.max_concurrency):
+            self._slots.acquire()
+        for _ in range(self.max_concurrency):
+            self._slots.release()
+        self._cycle_done()
+
+    def shutdown(self):
+        """Останавливает пул потоков."""
+        self._executor.shutdown(wait=True)
+
+
+class FetchPoolEngine(BaseEngine):
+    """Опрос в два шага: запросы к API в пуле, разбор - в потоке цикла.
+
+    fetch(subscriber) выполняется в пуле pool (pools.MonitoredPool) и
+    только ходит в сеть. handle(subscriber, answer) разбирает ответы в
+    потоке цикла по мере готовности: answer() возвращает ответ или
+    выбрасывает ошибку запроса, handle возвращает ошибку опроса или None,
+    как poll у PollingEngine. Состояние подписчиков меняет только поток
+    цикла.
+
+    В пуле всё время до pool.workers запросов: как только один завершился,
+    в пул уходит следующий подписчик. У каждого запроса свой срок timeout;
+    опрос, не уложившийся в него, считается неудачным (TimeoutError), а
+    поздний ответ отбрасывается.
+    """
+
+    def __init__(self, registry, fetch, handle, pool, policy, timeout,
+                 after_cycle=None, clock=time.monotonic, sleep=None,
+                 stagger=0, window=0):
+        super().__init__(registry, policy, after_cycle, clock, sleep,
+                         stagger, window)
+        self.fetch = fetch
+        self.handle = handle
+        self.pool = pool
+        self.timeout = timeout
+
+    def _finish(self, subscriber, scheduled, answer):
+        try:
+            error = self.handle(subscriber, answer)
+        except Exception as exc:
+            logging.error('Необработанная ошибка опроса %r: %s',
+                          subscriber, exc, exc_info=True)
+            error = exc
+        self._reschedule(subscriber, scheduled, error)
+
+    def _timed_out(self):
+        raise TimeoutError(f'API не ответил за {self.timeout} с')
+
+    def _fill(self, due, running):
+        """Дополняет пул запросами следующих подписчиков до pool.workers.
+
+        Поток зависшего запроса освобождается не раньше, чем истечёт
+        таймаут HTTP, поэтому submit() может ненадолго подождать.
+        """
+        for subscriber, scheduled in islice(
+            due, self.pool.workers - len(running)
+        ):
+            self.scheduler.started(scheduled)
+            future = self.pool.submit(self.fetch, subscriber)
+            running[future] = (subscriber, scheduled,
+                               self.clock() + self.timeout)
+
+    def _collect(self, running):
+        """Разбирает завершившиеся запросы и запросы с истёкшим сроком."""
+        deadline = min(item[2] for item in running.values())
+        done, _ = wait(running, timeout=max(0.0, deadline - self.clock()),
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            subscriber, scheduled, _ = running.pop(future)
+            self._finish(subscriber, scheduled, future.result)
+        now = self.clock()
+        for future in [future for future, item in running.items()
+                       if item[2] <= now]:
+            subscriber, scheduled, _ = running.pop(future)
+            self.pool.timed_out()
+            self._finish(subscriber, scheduled, self._timed_out)
+
+    def run_cycle(self):
+        """Опрашивает подписчиков, чей опрос наступил, скользящим окном."""
+        due = iter(self.scheduler.pop_due())
+        running = {}
+        self._fill(due, running)
+        while running:
+            self._collect(running)
+            self._fill(due, running)
+        self._cycle_done()
+        self.pool.report()
+
+    def shutdown(self):
+        """Останавливает пул, не дожидаясь зависших запросов."""
+        self.pool.shutdown(wait=False)
+
+
+def report_drift(scheduler):
+    """Пишет отставание опросов цикла от расписания в метрики и лог."""
+    drift = scheduler.drift()
+    if not drift['polls']:
+        return
+    metrics.POLL_DRIFT.set(drift['max'])
+    if drift['max'] > DRIFT_WARNING:
+        logging.warning('Опросы отстают от расписания: в среднем на %.1f с, '
+                        'максимум на %.1f с.', drift['mean'], drift['max'])
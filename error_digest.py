@@ -0,0 +1,79 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from settings import ERROR_SUMMARY_INTERVAL
+
+MAX_SIGNATURE_LENGTH = 200
+# Сколько разных сбоев одного чата помнить: дольше всех не
+# повторявшийся вытесняется.
+MAX_INCIDENTS = 20
+_VOLATILE = re.compile(r'0x[0-9a-fA-F]+|\d+')
+_SPACES = re.compile(r'\s+')
+
+
+def error_signature(error):
+    """Класс ошибки и текст без чисел, адресов и лишних пробелов."""
+    text = _SPACES.sub(' ', _VOLATILE.sub('#', str(error))).strip()
+    return type(error).__name__, text[:MAX_SIGNATURE_LENGTH]
+
+
+class Incident:
+    """Серия одинаковых сбоев в одном чате."""
+
+    __slots__ = ('reported_at', 'unreported', 'total')
+
+    def __init__(self, now):
+        self.reported_at = now
+        self.unreported = 0
+        self.total = 1
+
+
+class ErrorAggregator:
+    """Решает, какие сообщения о сбоях отправлять в чат.
+
+    Сбои группируются по классу ошибки и нормализованному тексту.
+    О первом сбое группы сообщается сразу, о повторах - сводкой не чаще
+    раза в interval секунд, а при первом успешном опросе после сбоев
+    отправляется сообщение о восстановлении. Для чата помнится не больше
+    MAX_INCIDENTS групп.
+    """
+
+    def __init__(self, interval=ERROR_SUMMARY_INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._incidents = {}
+        self._lock = threading.Lock()
+
+    def failure(self, chat_id, error):
+        """Текст для отправки о сбое или None, если сообщать рано."""
+        now = self.clock()
+        signature = error_signature(error)
+        with self._lock:
+            incidents = self._incidents.setdefault(chat_id, OrderedDict())
+            incident = incidents.get(signature)
+            if incident is None:
+                incidents[signature] = Incident(now)
+                if len(incidents) > MAX_INCIDENTS:
+                    incidents.popitem(last=False)
+                return f'Сбой в работе программы: {error}'
+            incidents.move_to_end(signature)
+            incident.total += 1
+            incident.unreported += 1
+            if now - incident.reported_at < self.interval:
+                return None
+            count, incident.unreported = incident.unreported, 0
+            incident.reported_at = now
+        minutes = round(self.interval / 60)
+        return (f'Сбой продолжается: ещё {count} за последние {minutes} мин. '
+                f'Последняя ошибка: {error}')
+
+    def success(self, chat_id):
+        """Текст о восстановлении, если до этого в чате были сбои."""
+        with self._lock:
+            incidents = self._incidents.pop(chat_id, None)
+        if not incidents:
+            return None
+        total = sum(incident.total for incident in incidents.values())
+        return f'Работа восстановлена после {total} сбоев подряд.'
@@ -19,4 +19,14 @@ class NotExpectedHwStatusError(Exception):
 class NotOkResponseError(Exception):
     """Request got not OK Status."""
 
-    pass
+    def __init__(self, *args, retry_after=None):
+        super().__init__(*args)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ConnectionError):
+    """Service is down, request rejected without being sent."""
+
+    def __init__(self, *args, retry_after=None):
+        super().__init__(*args)
+        self.retry_after = retry_after
@@ -1,50 +1,131 @@
+import argparse
 import logging
+import os
+import re
+import signal
+import sys
 import time
+from functools import partial
 from http import HTTPStatus
 
-import requests
-from telegram import Bot
-from telegram.error import TelegramError
-
+import breaker
 import exceptions as exptns
-from settings import (ENDPOINT, HEADERS, HOMEWORK_VERDICTS, PRACTICUM_TOKEN,
-                      RETRY_TIME, TELEGRAM_CHAT_ID, TELEGRAM_TOKEN,
+import memory
+import messages
+import metrics
+from api_client import NOT_MODIFIED, PracticumClient
+from decoder import Homework
+from engine import FetchPoolEngine, PollingEngine
+from error_digest import ErrorAggregator
+from log_setup import POLL_LOGGER, setup_logging
+from notifier import Outbox, SendQueue, is_transient
+from policy import AdaptivePolicy, FixedPolicy, parse_retry_after
+from settings import (BOT_UPDATES, LOG_JSON, LOG_LEVEL, LOG_POLL_SAMPLE,
+                      MAX_BACKOFF, MAX_CONCURRENT_POLLS,
+                      MEMORY_REPORT_INTERVAL, METRICS_PORT, MIN_BACKOFF,
+                      POLL_BATCH_WINDOW, POLL_POLICY, POLL_STAGGER,
+                      POOL_FETCH_TIMEOUT, POOL_FETCH_WORKERS,
+                      POOL_SEND_TIMEOUT, POOL_SEND_WORKERS,
+                      PRACTICUM_TOKEN, PROFILE_MODE,
+                      SETTINGS_PROBLEMS, STATE_PATH, SUBSCRIBERS_PATH,
+                      TELEGRAM_API_URL, TELEGRAM_CHAT_ID, TELEGRAM_CHAT_RATE,
+                      TELEGRAM_RATE, TELEGRAM_TOKEN, WEBHOOK_URL,
                       constant_tuple)
+from state import StateJournal, open_backend
+from subscribers import Subscriber, SubscriberRegistry
+
+OK_STATUSES = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+# Сколько секунд при остановке ждать отправки оставшихся сообщений.
+SHUTDOWN_TIMEOUT = 10
+BOT_TOKEN_PATTERN = re.compile(r'\d+:[\w-]+')
+# Функции, время которых замеряет профилировщик.
+TIMED_FUNCTIONS = ('get_api_answer_for', 'check_response', 'parse_status',
+                   'send_message_to')
+ASYNC_TIMED_FUNCTIONS = ('get_api_answer', 'send_message')
+
+api_client = PracticumClient()
+poll_log = logging.getLogger(POLL_LOGGER)
 
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegram чат, определяемый TELEGRAM_CHAT_ID."""
-    logging.info(f'Собираюсь отправить в телеграм сообщение: {message}.')
+    send_message_to(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_message_to(bot, chat_id, message):
+    """Отправляет сообщение в Telegram чат chat_id.
+
+    Пока телеграм недоступен, сразу выбрасывает CircuitOpenError. Ошибки
+    телеграма выбрасываются как есть: по их типу очередь отправки решает,
+    повторять ли отправку.
+    """
+    from telegram.error import RetryAfter, TelegramError
+    breaker.TELEGRAM.before()
+    poll_log.info('Собираюсь отправить в телеграм сообщение: %s.', message)
+    started = time.perf_counter()
+    failed = True
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        bot.send_message(chat_id, message,
+                         parse_mode=messages.CATALOGUE.parse_mode)
+        failed = False
+    except RetryAfter:
+        failed = False
+        raise
     except TelegramError as error:
-        raise TelegramError(f'Ошибка при отправке телеграм сообщения: {error}')
+        failed = is_transient(error)
+        raise
     else:
-        logging.info(f'Отправлено сообщение: {message}')
+        poll_log.info('Отправлено сообщение: %s', message)
+    finally:
+        breaker.TELEGRAM.record(failed)
+        metrics.SEND_LATENCY.observe(time.perf_counter() - started)
 
 
 def get_api_answer(timestamp):
     """Запрашивает эндпоинт API. При успехе возвращает ответ API type dict."""
-    logging.info('Запрос к API.')
-    request_params = {'url': ENDPOINT, 'headers': HEADERS,
-                      'params': {'from_date': timestamp}, 'timeout': 10}
+    return get_api_answer_for(PRACTICUM_TOKEN, timestamp)
+
+
+def get_api_answer_for(token, timestamp):
+    """Запрашивает эндпоинт API с токеном подписчика token.
+
+    Открытый api_client с кешем вместо неизменившегося ответа возвращает
+    NOT_MODIFIED. Пока API недоступен, сразу выбрасывает CircuitOpenError.
+    """
+    return api_client.decode(token, timestamp, request_api(token, timestamp))
+
+
+def request_api(token, timestamp):
+    """HTTP ответ API для токена token без разбора тела."""
+    poll_log.info('Запрос к API.')
+    request_params = api_client.request_params(token, timestamp)
+    msg = (
+        'Во время подключения к эндпоинту {url} произошла непредвиденная'
+        'ошибка, params = {params};'
+    ).format(**request_params)
+    breaker.PRACTICUM.before()
+    started = time.perf_counter()
+    failed = True
     try:
-        response = requests.get(**request_params)
-        msg = (
-            'Во время подключения к эндпоинту {url} произошла непредвиденная'
-            'ошибка, headers = {headers}; params = {params};'
-        ).format(**request_params)
-        if response.status_code != HTTPStatus.OK:
-            raise exptns.NotOkResponseError(msg)
+        response = api_client.get(**request_params)
+        failed = response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+        if response.status_code not in OK_STATUSES:
+            headers = getattr(response, 'headers', {})
+            raise exptns.NotOkResponseError(msg, retry_after=parse_retry_after(
+                headers.get('Retry-After'), time.time()
+            ))
     except Exception as error:
         raise ConnectionError(msg, f' ошибка: {error}') from error
-    logging.info('API запрошен.')
-    return response.json()
+    finally:
+        breaker.PRACTICUM.record(failed)
+        metrics.API_LATENCY.observe(time.perf_counter() - started)
+    poll_log.info('API запрошен.')
+    return response
 
 
 def check_response(response):
     """Проверяет ответ API на корректность."""
-    logging.info('response получен, проверяем.')
+    poll_log.info('response получен, проверяем.')
     if not isinstance(response, dict):
         raise TypeError(f'Ответ API не словарь, а {type(response)}'
                         f'следующего содержания: {response}')
@@ -57,35 +138,448 @@ def check_response(response):
         raise TypeError('В ответе от API под ключом "homeworks"'
                         f'пришел не список, а {type(homeworks)}'
                         f'следующего содержания: {homeworks}')
-    logging.info('response проверен')
+    poll_log.info('response проверен')
     return homeworks
 
 
 def parse_status(homework):
-    """Достаёт из информации о конкретной ДЗ её статус. Возвращает вердикт."""
-    logging.info('Начали парсить.')
-    homework_name = homework.get('homework_name')
-    homework_status = homework.get('status')
-    if not homework_name or not homework_status:
-        key_list = list(homework.keys())
-        raise KeyError(f'В ДЗ нет нужных ключей. Вот какие есть: {key_list}')
-    if homework_status not in HOMEWORK_VERDICTS:
-        raise exptns.NotExpectedHwStatusError('В ответе API неизвестный'
-                                              f'статус ДЗ: {homework_status}')
-    verdict = HOMEWORK_VERDICTS[homework_status]
-    logging.info('парсинг завершился')
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    """Достаёт из информации о конкретной ДЗ её статус. Возвращает вердикт.
+
+    Вердикт - в локали по умолчанию; о статусе, которого нет в каталоге
+    сообщений, сообщает NotExpectedHwStatusError.
+    """
+    poll_log.info('Начали парсить.')
+    if isinstance(homework, Homework):
+        homework_name, homework_status = homework.name, homework.status
+    else:
+        homework_name = homework.get('homework_name')
+        homework_status = homework.get('status')
+        if not homework_name or not homework_status:
+            key_list = list(homework.keys())
+            raise KeyError('В ДЗ нет нужных ключей. '
+                           f'Вот какие есть: {key_list}')
+    message = messages.CATALOGUE.render(homework_status, homework_name)
+    poll_log.info('парсинг завершился')
+    return message
 
 
 def check_tokens():
     """Проверяет доступность необходимых переменных окружения."""
-    logging.info('проверяем токены')
+    poll_log.info('проверяем токены')
     return all((PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID))
 
 
-def main():
-    """Основная логика работы бота."""
-    if not check_tokens():
+def config_problems(workers=0):
+    """Ошибки настроек, которые видны без обращения к сети.
+
+    workers - число рабочих процессов (--workers), между которыми делится
+    TELEGRAM_RATE.
+    """
+    required = {'TELEGRAM_TOKEN': TELEGRAM_TOKEN}
+    if not SUBSCRIBERS_PATH:
+        required.update(PRACTICUM_TOKEN=PRACTICUM_TOKEN,
+                        TELEGRAM_CHAT_ID=TELEGRAM_CHAT_ID)
+    problems = [f'не задана переменная {name}'
+                for name, value in required.items() if not value]
+    problems.extend(SETTINGS_PROBLEMS)
+    state_dir = os.path.dirname(os.path.abspath(STATE_PATH or '.'))
+    checks = (
+        (TELEGRAM_TOKEN and not BOT_TOKEN_PATTERN.fullmatch(TELEGRAM_TOKEN),
+         'TELEGRAM_TOKEN не похож на токен бота'),
+        (POLL_POLICY not in ('adaptive', 'fixed'),
+         f'неизвестная политика POLL_POLICY: {POLL_POLICY}'),
+        (MIN_BACKOFF > MAX_BACKOFF, 'MIN_BACKOFF больше MAX_BACKOFF'),
+        (min(TELEGRAM_RATE, TELEGRAM_CHAT_RATE) <= 0,
+         'TELEGRAM_RATE и TELEGRAM_CHAT_RATE должны быть больше нуля'),
+        (workers and TELEGRAM_RATE / workers < 1,
+         f'с --workers {workers} на процесс приходится меньше одного '
+         f'сообщения в секунду из TELEGRAM_RATE={TELEGRAM_RATE}'),
+        (BOT_UPDATES not in ('', 'polling', 'webhook'),
+         f'неизвестный режим BOT_UPDATES: {BOT_UPDATES}'),
+        (BOT_UPDATES == 'webhook' and not WEBHOOK_URL,
+         'для BOT_UPDATES=webhook нужен WEBHOOK_URL'),
+        (min(POOL_FETCH_WORKERS, POOL_SEND_WORKERS) <= 0,
+         'POOL_FETCH_WORKERS и POOL_SEND_WORKERS должны быть больше нуля'),
+        (min(POOL_FETCH_TIMEOUT, POOL_SEND_TIMEOUT) <= 0,
+         'POOL_FETCH_TIMEOUT и POOL_SEND_TIMEOUT должны быть больше нуля'),
+        (PROFILE_MODE not in ('', 'sample', 'cprofile'),
+         f'неизвестный режим PROFILE_MODE: {PROFILE_MODE}'),
+        (STATE_PATH and not os.access(state_dir, os.W_OK),
+         f'нет права записи в каталог STATE_PATH: {state_dir}'),
+    )
+    problems.extend(message for failed, message in checks if failed)
+    try:
+        messages.Catalogue.load()
+    except (OSError, ValueError) as error:
+        problems.append(f'не загружается каталог сообщений: {error}')
+    if SUBSCRIBERS_PATH:
+        try:
+            build_registry()
+        except Exception as error:
+            problems.append(f'не читается SUBSCRIBERS_PATH: {error}')
+    return problems
+
+
+def check_config(workers=0):
+    """Режим --check: печатает ошибки настроек, возвращает код выхода."""
+    problems = config_problems(workers)
+    for problem in problems:
+        print(f'Ошибка: {problem}.')
+    if problems:
+        return 1
+    print('Настройки в порядке.')
+    return 0
+
+
+def build_registry():
+    """Реестр подписчиков из SUBSCRIBERS_PATH или из переменных окружения."""
+    if SUBSCRIBERS_PATH:
+        return SubscriberRegistry.from_path(SUBSCRIBERS_PATH)
+    return SubscriberRegistry([Subscriber(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)])
+
+
+def process_response(send_queue, subscriber, response):
+    """Ставит в очередь вердикты по изменившимся работам из ответа API.
+
+    Вердикт составляется один раз на локаль и ставится сразу во все чаты
+    подписчика с этой локалью. О статусе, которого нет в каталоге
+    сообщений, сообщается общим текстом, и разбор ответа продолжается.
+
+    Курсор from_date сдвигается к current_date, только если в ответе были
+    работы: пока изменений нет, запрос остаётся тем же и может быть
+    отвечен из кеша.
+    """
+    homeworks = check_response(response)
+    changes = subscriber.homeworks.changes(homeworks)
+    if not changes:
+        poll_log.debug('Нет новых вердиктов по запросу.')
+    for key, homework in changes:
+        try:
+            msg = parse_status(homework)
+        except exptns.NotExpectedHwStatusError as error:
+            logging.warning('%s - отправляю общий текст.', error)
+            metrics.ERRORS.inc(type(error).__name__)
+            msg = messages.CATALOGUE.text(homework['status'],
+                                          homework['homework_name'])
+        for chats, text in messages.CATALOGUE.fan_out(
+            subscriber.chats, homework['status'], homework['homework_name'],
+            msg
+        ):
+            send_queue.put_many(chats, text)
+        subscriber.mark(key, homework['status'])
+    if homeworks:
+        subscriber.advance(response.get('current_date',
+                                        subscriber.timestamp))
+
+
+def poll_subscriber(send_queue, errors, subscriber):
+    """Один цикл опроса API и отправки новых вердиктов подписчику.
+
+    Сообщения ставятся в send_queue и не ждут телеграма, о сбоях
+    сообщается так, как решит агрегатор errors.
+    Возвращает ошибку опроса или None - по ней выбирается пауза.
+    """
+    return handle_answer(send_queue, errors, subscriber,
+                         partial(fetch_answer, subscriber))
+
+
+def fetch_answer(subscriber):
+    """Ответ API для подписчика subscriber с его курсора."""
+    return get_api_answer_for(subscriber.token, subscriber.timestamp)
+
+
+def fetch_response(subscriber):
+    """HTTP ответ API для подписчика subscriber с его курсора."""
+    return request_api(subscriber.token, subscriber.timestamp)
+
+
+def handle_fetched(send_queue, errors, subscriber, fetched):
+    """Разбирает ответ, полученный в пуле (режим --pool).
+
+    Тело сверяется с кешем и разбирается здесь, в потоке цикла: запрос,
+    который не уложился в таймаут и завершился позже, кеш не трогает.
+    """
+    def answer():
+        return api_client.decode(subscriber.token, subscriber.timestamp,
+                                 fetched())
+
+    return handle_answer(send_queue, errors, subscriber, answer)
+
+
+def handle_answer(send_queue, errors, subscriber, answer):
+    """Разбирает ответ API так же, как poll_subscriber.
+
+    answer() возвращает ответ API или выбрасывает ошибку запроса: это
+    сам запрос или разбор ответа, полученного в пуле (режим --pool).
+    """
+    try:
+        response = answer()
+    except Exception as error:
+        return handle_response(send_queue, errors, subscriber, error=error)
+    return handle_response(send_queue, errors, subscriber, response)
+
+
+def handle_response(send_queue, errors, subscriber, response=None,
+                    error=None, cache=None):
+    """Разбирает полученный ответ API или ошибку запроса error.
+
+    Общая часть опроса синхронного и асинхронного режимов. Вердикты
+    получают все чаты подписчика, а о сбоях и восстановлении узнаёт только
+    владелец токена - первый чат. При сбое ответ забывается в кеше cache
+    (по умолчанию - в api_client).
+    Возвращает ошибку опроса или None - по ней выбирается пауза.
+    """
+    metrics.POLLS.inc()
+    if error is None:
+        try:
+            if response is NOT_MODIFIED:
+                poll_log.debug('Ответ API не изменился.')
+            else:
+                process_response(send_queue, subscriber, response)
+        except Exception as exc:
+            error = exc
+    if error is not None:
+        report_failure(send_queue, errors, subscriber, error,
+                       api_client if cache is None else cache)
+        return error
+    recovery = errors.success(subscriber.chat_id)
+    if recovery:
+        send_queue.put(subscriber.chat_id,
+                       messages.CATALOGUE.escape(recovery))
+    return None
+
+
+def report_failure(send_queue, errors, subscriber, error, cache):
+    """Пишет сбой опроса в лог и сообщает о нём, как решит агрегатор."""
+    metrics.ERRORS.inc(type(error).__name__)
+    if isinstance(error, exptns.NotForSendingError):
+        logging.error(error, exc_info=error)
+        return
+    logging.error('Сбой в работе программы: %s', error, exc_info=error)
+    cache.forget(subscriber.token)
+    message = errors.failure(subscriber.chat_id, error)
+    if message:
+        send_queue.put(subscriber.chat_id, messages.CATALOGUE.escape(message))
+
+
+def terminate(signum, frame):
+    """Превращает SIGTERM в SystemExit, чтобы состояние успело сохраниться."""
+    sys.exit(0)
+
+
+def build_policy():
+    """Политика расписания опросов по настройке POLL_POLICY."""
+    if POLL_POLICY == 'fixed':
+        return FixedPolicy()
+    return AdaptivePolicy()
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Бот статусов домашней работы Я.Практикума.'
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--async', dest='use_async', action='store_true',
+                      help='опрашивать API в asyncio цикле событий')
+    mode.add_argument('--pool', dest='use_pool', action='store_true',
+                      help='запросы к API и отправку выполнять в '
+                           'отдельных пулах потоков')
+    parser.add_argument('--updates', choices=('polling', 'webhook'),
+                        default=BOT_UPDATES or None,
+                        help='принимать команды /status и /subscribe')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='разделить чаты между N рабочими процессами')
+    parser.add_argument('--check', action='store_true',
+                        help='проверить настройки и выйти')
+    parser.add_argument('--profile', choices=('sample', 'cprofile'),
+                        help='профилировать первые PROFILE_CYCLES циклов')
+    args = parser.parse_args(argv)
+    if args.workers and args.updates:
+        parser.error('приём команд не поддерживается вместе с --workers')
+    return args
+
+
+def build_shard(shard=None):
+    """Реестр и очередь отправки рабочего процесса с долей чатов shard.
+
+    Лимит отправок в телеграм делится между рабочими процессами поровну.
+    Без shard - весь реестр и очередь по умолчанию.
+    """
+    registry = build_registry()
+    if shard is None:
+        return registry, None
+    registry = shard.select(registry)
+    shard.start_reporting(registry)
+    return registry, Outbox(rate=TELEGRAM_RATE / shard.workers)
+
+
+def worker_argv(args):
+    """Аргументы командной строки рабочих процессов супервизора."""
+    argv = ['--async'] if args.use_async else []
+    if args.use_pool:
+        argv.append('--pool')
+    if args.profile:
+        argv.extend(['--profile', args.profile])
+    return argv
+
+
+def start_profiler(args):
+    """Профилировщик по --profile или PROFILE_MODE, без них - None.
+
+    Оборачивает замеряемые функции и перехватывает SIGUSR1; с --profile
+    захват начинается сразу.
+    """
+    mode = args.profile or PROFILE_MODE
+    if not mode:
+        return None
+    import profiling
+    profiler = profiling.Profiler(mode).arm()
+    profiler.instrument(sys.modules[__name__], TIMED_FUNCTIONS)
+    if args.use_async:
+        import async_bot
+        profiler.instrument(async_bot, ASYNC_TIMED_FUNCTIONS)
+    if args.profile:
+        profiler.start()
+    return profiler
+
+
+def start_memory_report():
+    """Отчёт о памяти по MEMORY_REPORT_INTERVAL, без него - None."""
+    if not MEMORY_REPORT_INTERVAL:
+        return None
+    return memory.MemoryReporter().start()
+
+
+def cycle_hook(registry, journal, shard=None, profiler=None, reporter=None):
+    """Действия в конце каждого цикла опроса.
+
+    Состояние сохраняется в journal, доля shard, профилировщик и отчёт о
+    памяти reporter отмечают завершённый цикл.
+    """
+    hooks = [partial(journal.commit, registry)]
+    for hook_owner in (shard, profiler, reporter):
+        if hook_owner is not None:
+            hooks.append(hook_owner.cycle_done)
+
+    def after_cycle():
+        for hook in hooks:
+            hook()
+
+    return after_cycle
+
+
+def start_metrics(registry, shard=None):
+    """Включает метрики, если задан METRICS_PORT.
+
+    Рабочий процесс только собирает их: отдаёт сводные метрики супервизор.
+    """
+    if not METRICS_PORT:
+        return
+    if shard is None:
+        metrics.start_server(METRICS_PORT)
+    else:
+        metrics.enable()
+    metrics.SUBSCRIBERS.set_function(registry.__len__)
+    metrics.RSS.set_function(memory.rss_bytes)
+
+
+def run_async(registry, journal, policy, after_cycle, outbox):
+    """Опрос в asyncio цикле событий до остановки процесса."""
+    import asyncio
+
+    import async_bot
+    try:
+        asyncio.run(async_bot.run(registry, TELEGRAM_TOKEN,
+                                  MAX_CONCURRENT_POLLS, policy, after_cycle,
+                                  outbox, journal))
+    finally:
+        journal.close()
+
+
+def start_sending(journal, outbox, request, pool=None):
+    """Запускает очередь отправки через бота с соединениями request.
+
+    Очередь получает недоставленное из журнала journal.
+    """
+    from telegram import Bot
+    bot = Bot(token=TELEGRAM_TOKEN, base_url=TELEGRAM_API_URL,
+              request=request)
+    send_queue = SendQueue(partial(send_message_to, bot), outbox,
+                           on_sent=journal.sent, pool=pool).start()
+    journal.bind(send_queue)
+    metrics.SEND_QUEUE_DEPTH.set_function(send_queue.outbox.__len__)
+    return send_queue
+
+
+def drive(engine, send_queue, registry, journal):
+    """Опрос движком engine до остановки процесса.
+
+    При остановке дожидается отправки и сохраняет состояние.
+    """
+    try:
+        engine.run_forever()
+    finally:
+        engine.shutdown()
+        send_queue.stop(timeout=SHUTDOWN_TIMEOUT)
+        journal.commit(registry)
+        journal.close()
+
+
+def run_threads(registry, journal, policy, after_cycle, outbox):
+    """Опрос пулом потоков до остановки процесса."""
+    from telegram.utils.request import Request
+    api_client.open()
+    send_queue = start_sending(journal, outbox, Request(con_pool_size=2))
+    poll = partial(poll_subscriber, journal, ErrorAggregator())
+    engine = PollingEngine(registry, poll,
+                           MAX_CONCURRENT_POLLS, policy,
+                           after_cycle=after_cycle, stagger=POLL_STAGGER,
+                           window=POLL_BATCH_WINDOW)
+    drive(engine, send_queue, registry, journal)
+
+
+def run_pool(registry, journal, policy, after_cycle, outbox):
+    """Опрос в режиме --pool до остановки процесса.
+
+    Запросы к API идут в пуле fetch, ответы разбираются в основном потоке
+    по мере готовности, сообщения отправляет пул send. Таймауты HTTP
+    совпадают с таймаутами задач пулов, так что зависший запрос
+    освобождает поток примерно тогда же, когда его перестают ждать.
+    """
+    from telegram.utils.request import Request
+
+    import pools
+    api_client.timeout = POOL_FETCH_TIMEOUT
+    api_client.pool_size = max(api_client.pool_size, POOL_FETCH_WORKERS)
+    api_client.open()
+    send_queue = start_sending(
+        journal, outbox,
+        Request(con_pool_size=POOL_SEND_WORKERS + 1,
+                connect_timeout=POOL_SEND_TIMEOUT,
+                read_timeout=POOL_SEND_TIMEOUT),
+        pools.MonitoredPool('send', POOL_SEND_WORKERS)
+    )
+    engine = FetchPoolEngine(
+        registry, fetch_response,
+        partial(handle_fetched, journal, ErrorAggregator()),
+        pools.MonitoredPool('fetch', POOL_FETCH_WORKERS), policy,
+        POOL_FETCH_TIMEOUT, after_cycle=after_cycle, stagger=POLL_STAGGER,
+        window=POLL_BATCH_WINDOW
+    )
+    drive(engine, send_queue, registry, journal)
+
+
+def main(args=None, shard=None):
+    """Основная логика работы бота.
+
+    С --workers процесс становится супервизором рабочих процессов, каждый
+    из которых вызывает main() со своей долей чатов shard.
+    """
+    if args is None:
+        args = parse_args([])
+    tokens_ok = TELEGRAM_TOKEN if SUBSCRIBERS_PATH else check_tokens()
+    if not tokens_ok:
         empty_tokens = []
         for const in constant_tuple:
             if not const:
@@ -94,34 +588,40 @@ def main():
         logging.critical(msg)
         raise exptns.MissingCostantError(msg)
 
-    bot = Bot(token=TELEGRAM_TOKEN)
-
-    current_timestamp = int(time.time())
-    prev_report = ''
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if not homeworks:
-                logging.debug('Нет новых вердиктов по запросу.')
-            else:
-                msg = parse_status(homeworks[0])
-                if prev_report != msg:
-                    prev_report = msg
-                    send_message(bot, msg)
-
-        except (TelegramError, exptns.NotForSendingError) as error:
-            logging.error(error, exc_info=True)
-        except (exptns.NotOkResponseError, exptns.NotExpectedHwStatusError,
-                ConnectionError, TypeError, KeyError, Exception) as error:
-            message = f'Сбой в работе программы: {error}'
-            logging.error(message, exc_info=True)
-            send_message(bot, message)
-        finally:
-            time.sleep(RETRY_TIME)
+    signal.signal(signal.SIGTERM, terminate)
+    if args.workers and shard is None:
+        import sharding
+        sharding.Supervisor(
+            args.workers, worker_argv(args),
+            forward_profile=bool(args.profile or PROFILE_MODE)
+        ).run_forever()
+        return
+    registry, outbox = build_shard(shard)
+    logging.info('Подписчиков в реестре: %s', len(registry))
+    logging.info('Чатов со своей локалью: %s, по умолчанию - %s.',
+                 len(messages.CATALOGUE.chat_locales),
+                 messages.CATALOGUE.default_locale)
+    start_metrics(registry, shard)
+    journal = StateJournal(open_backend(STATE_PATH)).restore(registry)
+    after_cycle = cycle_hook(registry, journal, shard, start_profiler(args),
+                             start_memory_report())
+    updater = None
+    if args.updates:
+        import commands
+        updater = commands.start_updater(TELEGRAM_TOKEN, registry,
+                                         args.updates)
+    run = (run_async if args.use_async
+           else run_pool if args.use_pool else run_threads)
+    try:
+        run(registry, journal, build_policy(), after_cycle, outbox)
+    finally:
+        if updater is not None:
+            updater.stop()
 
 
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.DEBUG,
-                        format='%(asctime)s, %(levelname)s, %(message)s')
-    main()
+    args = parse_args()
+    if args.check:
+        sys.exit(check_config(args.workers))
+    setup_logging(LOG_LEVEL, LOG_JSON, LOG_POLL_SAMPLE)
+    main(args)
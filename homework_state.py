@@ -0,0 +1,116 @@
+import sys
+from collections import Counter
+
+from settings import HOMEWORK_STATE_LIMIT
+
+# Окончательный статус: принятая работа больше не меняется.
+DONE_STATUS = 'approved'
+
+
+def homework_key(homework):
+    """Ключ работы в таблице: id из API, а без него - название."""
+    key = homework.get('id')
+    return key if key is not None else homework.get('homework_name')
+
+
+class HomeworkStates:
+    """Последние известные статусы домашних работ одного подписчика.
+
+    Таблица - словарь ключ работы -> статус. Ключом служит целочисленный id,
+    а строки статусов интернированы, так что на работу приходится одна
+    запись словаря без собственных копий строк.
+
+    Размер таблицы ограничен: принятые работы вычищаются при сдвиге
+    курсора (advance()), а сверх limit записей вытесняется работа, статус
+    которой менялся давнее всех. Вычищенные принятые работы остаются
+    только в счётчике counts() до перезапуска.
+
+    Изменения таблицы копятся до take_changes(): журнал состояния пишет
+    только их, а не сравнивает таблицу целиком.
+    """
+
+    __slots__ = ('_statuses', '_finished', '_retired', '_changed', 'limit')
+
+    def __init__(self, limit=HOMEWORK_STATE_LIMIT):
+        self._statuses = {}
+        self._finished = ()
+        self._retired = 0
+        self._changed = {}
+        self.limit = limit
+
+    def changes(self, homeworks):
+        """За один проход отбирает работы, статус которых изменился.
+
+        Возвращает пары (ключ, работа) от старых к новым: API отдаёт
+        свежие работы первыми. Таблица не меняется до вызова mark().
+        """
+        statuses = self._statuses
+        changed = []
+        for homework in reversed(homeworks):
+            key = homework_key(homework)
+            if statuses.get(key) != homework.get('status'):
+                changed.append((key, homework))
+        return changed
+
+    def mark(self, key, status):
+        """Запоминает статус, о котором подписчик уже уведомлён."""
+        statuses = self._statuses
+        statuses.pop(key, None)
+        statuses[key] = self._changed[key] = sys.intern(status)
+        if len(statuses) > self.limit:
+            evicted = next(iter(statuses))
+            del statuses[evicted]
+            self._changed[evicted] = None
+
+    def advance(self):
+        """Курсор подписчика сдвинулся: вычищает принятые работы.
+
+        Работа вычищается на втором сдвиге курсора после её принятия: API
+        её уже не возвращает, а повтор прежнего ответа ещё узнаётся.
+        """
+        statuses = self._statuses
+        for key in self._finished:
+            if statuses.get(key) == DONE_STATUS:
+                del statuses[key]
+                self._changed[key] = None
+                self._retired += 1
+        self._finished = [key for key, status in statuses.items()
+                          if status == DONE_STATUS]
+
+    def snapshot(self):
+        """Копия таблицы ключ работы -> статус."""
+        return dict(self._statuses)
+
+    def restore(self, statuses):
+        """Заменяет таблицу сохранённой копией."""
+        self._statuses = {key: sys.intern(status)
+                          for key, status in statuses.items()}
+        self._changed = {}
+
+    def take_changes(self):
+        """Изменения с прошлого вызова: ключ -> статус, None - удалена."""
+        changed, self._changed = self._changed, {}
+        return changed
+
+    def return_changes(self, changes):
+        """Возвращает несохранённые изменения, не затирая более новые."""
+        for key, status in changes.items():
+            self._changed.setdefault(key, status)
+
+    def counts(self):
+        """Сколько работ в каждом статусе, с вычищенными принятыми."""
+        counts = Counter(self._statuses.values())
+        if self._retired:
+            counts[DONE_STATUS] += self._retired
+        return counts
+
+    def has_status(self, status):
+        """Есть ли работа с таким последним статусом."""
+        return status in self._statuses.values()
+
+    def get(self, key):
+        """Последний известный статус работы или None."""
+        return self._statuses.get(key)
+
+    def __len__(self):
+        return len(self._statuses)
@@ -0,0 +1,98 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Логгер сообщений, которые пишутся на каждый опрос. Их можно проредить
+# настройкой LOG_POLL_SAMPLE, не трогая ошибки и служебные сообщения.
+POLL_LOGGER = 'homework.poll'
+TEXT_FORMAT = '%(asctime)s, %(levelname)s, %(message)s'
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON."""
+
+    def format(self, record):
+        """Сериализует запись в JSON."""
+        entry = {'time': self.formatTime(record), 'level': record.levelname,
+                 'logger': record.name, 'thread': record.threadName,
+                 'message': record.getMessage()}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """Пропускает долю rate записей: 1 - все, 0 - ни одной."""
+
+    def __init__(self, rate, rand=random.random):
+        super().__init__()
+        self.rate = rate
+        self.rand = rand
+
+    def filter(self, record):
+        """Случайно пропускает запись с вероятностью rate."""
+        return self.rate >= 1 or self.rand() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке опроса.
+
+    Стандартный prepare() склеивает сообщение с аргументами ещё до
+    постановки в очередь. Очередь здесь внутрипроцессная, поэтому запись
+    передаётся как есть, а форматирует её поток QueueListener. Только
+    traceback сразу превращается в текст: иначе запись в очереди держит
+    кадры стека со всеми их локальными переменными.
+    """
+
+    def prepare(self, record):
+        """Возвращает запись без форматирования, traceback - текстом."""
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+
+class IdempotentQueueListener(QueueListener):
+    """QueueListener, который можно останавливать повторно."""
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток, если он запущен."""
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(level='INFO', json_format=False, poll_sample=1.0,
+                  stream=None):
+    """Настраивает корневой логгер на неблокирующую запись через очередь.
+
+    Возвращает запущенный QueueListener; он останавливается при выходе.
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format
+                         else logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    listener = IdempotentQueueListener(log_queue, handler)
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    poll_logger = logging.getLogger(POLL_LOGGER)
+    for old_filter in poll_logger.filters[:]:
+        poll_logger.removeFilter(old_filter)
+    if poll_sample <= 0:
+        poll_logger.setLevel(logging.WARNING)
+    elif poll_sample < 1:
+        poll_logger.addFilter(SampleFilter(poll_sample))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
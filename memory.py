@@ -0,0 +1,94 @@
+"""Отчёт о памяти долго работающего процесса.
+
+Раз в MEMORY_REPORT_INTERVAL секунд (проверяется в конце цикла опроса) в
+лог пишется резидентная память процесса. С MEMORY_TRACE_FRAMES > 0
+включается tracemalloc, и в отчёт добавляются MEMORY_TRACE_TOP мест, где
+выделено больше всего памяти, с приростом с прошлого отчёта. tracemalloc
+замедляет каждое выделение памяти, поэтому по умолчанию выключен.
+"""
+import logging
+import os
+import resource
+import time
+import tracemalloc
+
+from settings import (MEMORY_REPORT_INTERVAL, MEMORY_TRACE_FRAMES,
+                      MEMORY_TRACE_TOP)
+
+MB = 1024 * 1024
+# Выделения самого tracemalloc и загрузчика модулей в отчёт не попадают.
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def rss_bytes():
+    """Резидентная память процесса, байт.
+
+    Без /proc - наибольшая за время работы, как её сообщает getrusage.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryReporter:
+    """Периодический отчёт о памяти в лог."""
+
+    def __init__(self, interval=MEMORY_REPORT_INTERVAL,
+                 trace_frames=MEMORY_TRACE_FRAMES, top=MEMORY_TRACE_TOP,
+                 clock=time.monotonic):
+        self.interval = interval
+        self.trace_frames = trace_frames
+        self.top = top
+        self.clock = clock
+        self._next_report = clock() + interval
+        self._previous = {}
+
+    def start(self):
+        """Включает tracemalloc, если он нужен отчёту."""
+        if self.trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        return self
+
+    def cycle_done(self):
+        """Отмечает конец цикла опроса: пишет отчёт, если пора."""
+        now = self.clock()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self.report()
+
+    def top_allocations(self):
+        """Крупнейшие места выделения: (место, байт, прирост, блоков).
+
+        Прирост считается от прошлого вызова; помнятся только места,
+        попавшие в отчёт, так что сам отчёт память не копит.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        rows = []
+        current = {}
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            frame = stat.traceback[0]
+            place = f'{frame.filename}:{frame.lineno}'
+            current[place] = stat.size
+            rows.append((place, stat.size,
+                         stat.size - self._previous.get(place, 0),
+                         stat.count))
+        self._previous = current
+        return rows
+
+    def report(self):
+        """Пишет в лог память процесса и крупнейшие места выделения."""
+        logging.info('Память процесса: %.1f МБ.', rss_bytes() / MB)
+        if not tracemalloc.is_tracing():
+            return
+        traced, peak = tracemalloc.get_traced_memory()
+        logging.info('tracemalloc: %.1f МБ, пик %.1f МБ.', traced / MB,
+                     peak / MB)
+        for place, size, growth, count in self.top_allocations():
+            logging.info('%s: %.1f КБ (%+.1f КБ), блоков %s.', place,
+                         size / 1024, growth / 1024, count)
@@ -0,0 +1,248 @@
+"""Тексты вердиктов: каталог локалей, шаблоны и разметка телеграма.
+
+Каталог - встроенные локали ru и en, дополненные файлом MESSAGES_PATH.
+В файле можно добавить статусы, локали, поменять шаблоны и закрепить за
+чатами локали без правки кода:
+
+    {
+        "locales": {
+            "ru": {"verdicts": {"pending": "Работа ждёт ревьюера."},
+                   "labels": {"pending": "ждёт ревьюера"}},
+            "en": {"template": "Homework {name}: {verdict}"}
+        },
+        "chats": {"123456": "en"}
+    }
+
+Известны статусы локали DEFAULT_LOCALE, о неизвестном статусе render()
+сообщает NotExpectedHwStatusError, а text() вместо вердикта отрисовывает
+общий шаблон fallback с самим статусом. Вердикт без перевода берётся из
+локали по умолчанию.
+
+Шаблоны разбираются один раз при загрузке каталога: вердикт и статус
+подставляются сразу, при отрисовке остаётся вставить название работы.
+Готовые тексты кешируются по (статус, название, локаль) - в рассылке на
+несколько чатов и при повторной отправке текст не собирается заново.
+
+MESSAGE_FORMAT выбирает разметку телеграма: пусто - обычный текст, HTML
+или MarkdownV2. Шаблоны templates[MESSAGE_FORMAT] пишутся в разметке,
+обычный шаблон, вердикты и название работы экранируются.
+"""
+import html
+import json
+import re
+from functools import lru_cache, partial
+from string import Formatter
+
+from exceptions import NotExpectedHwStatusError
+from settings import (DEFAULT_LOCALE, HOMEWORK_VERDICTS, MESSAGE_CACHE_SIZE,
+                      MESSAGE_FORMAT, MESSAGES_PATH)
+
+FIELDS = ('name', 'verdict', 'status')
+# Место статуса в шаблоне fallback: статус подставляется при отрисовке.
+STATUS = object()
+_MARKDOWN_SPECIAL = re.compile(r'[_*\[\]()~`>#+\-=|{}.!\\]')
+ESCAPES = {
+    '': str,
+    'HTML': partial(html.escape, quote=False),
+    'MarkdownV2': partial(_MARKDOWN_SPECIAL.sub, r'\\\g<0>'),
+}
+BUILTIN_LOCALES = {
+    'ru': {
+        'template': 'Изменился статус проверки работы "{name}". {verdict}',
+        'fallback': 'Изменился статус проверки работы "{name}": {status}.',
+        'templates': {
+            'HTML': 'Изменился статус проверки работы <b>{name}</b>. '
+                    '{verdict}',
+            'MarkdownV2': 'Изменился статус проверки работы *{name}*\\. '
+                          '{verdict}',
+        },
+        'verdicts': HOMEWORK_VERDICTS,
+        'labels': {
+            'approved': 'принято',
+            'reviewing': 'на проверке',
+            'rejected': 'с замечаниями',
+        },
+    },
+    'en': {
+        'template': 'Review status of "{name}" has changed. {verdict}',
+        'fallback': 'Review status of "{name}" has changed: {status}.',
+        'templates': {
+            'HTML': 'Review status of <b>{name}</b> has changed. {verdict}',
+            'MarkdownV2': 'Review status of *{name}* has changed\\. '
+                          '{verdict}',
+        },
+        'verdicts': {
+            'approved': 'The reviewer liked everything. Hooray!',
+            'reviewing': 'The reviewer has started the review.',
+            'rejected': 'The reviewer has left some comments.',
+        },
+        'labels': {
+            'approved': 'approved',
+            'reviewing': 'under review',
+            'rejected': 'changes requested',
+        },
+    },
+}
+
+
+def merge_locales(base, extra):
+    """Локали base, дополненные локалями extra из файла каталога."""
+    merged = {}
+    for locale in base.keys() | extra.keys():
+        old, new = base.get(locale, {}), extra.get(locale, {})
+        merged[locale] = {
+            'template': new.get('template', old.get('template')),
+            'fallback': new.get('fallback', old.get('fallback')),
+            **{key: {**old.get(key, {}), **new.get(key, {})}
+               for key in ('templates', 'verdicts', 'labels')},
+        }
+    return merged
+
+
+def compile_template(template, escape, markup, status, verdict):
+    """Части текста шаблона: None - место названия работы.
+
+    Текст вокруг полей экранируется, если шаблон не в разметке markup.
+    Статус None остаётся местом STATUS и подставляется при отрисовке.
+    """
+    values = {'verdict': escape(verdict),
+              'status': STATUS if status is None else escape(status)}
+    parts = []
+    for text, field, spec, conversion in Formatter().parse(template):
+        parts.append(text if markup else escape(text))
+        if field is None:
+            continue
+        if field not in FIELDS or spec or conversion:
+            raise ValueError(f'Недопустимое поле шаблона: {{{field}}}. '
+                             f'Допустимы: {", ".join(FIELDS)}')
+        parts.append(None if field == 'name' else values[field])
+    compiled = []
+    for part in parts:
+        text = isinstance(part, str)
+        if text and compiled and isinstance(compiled[-1], str):
+            compiled[-1] += part
+        else:
+            compiled.append(part)
+    return tuple(compiled)
+
+
+class Catalogue:
+    """Скомпилированные шаблоны вердиктов всех локалей.
+
+    chat_locales - локали чатов по строковому chat_id, остальные чаты
+    получают default_locale.
+    """
+
+    def __init__(self, locales=BUILTIN_LOCALES, default_locale=DEFAULT_LOCALE,
+                 fmt=MESSAGE_FORMAT, chat_locales=None,
+                 cache_size=MESSAGE_CACHE_SIZE):
+        if fmt not in ESCAPES:
+            raise ValueError(f'Неизвестная разметка MESSAGE_FORMAT: {fmt}')
+        if default_locale not in locales:
+            raise ValueError(f'Нет локали по умолчанию {default_locale}')
+        chat_locales = {str(chat): locale
+                        for chat, locale in (chat_locales or {}).items()}
+        unknown = set(chat_locales.values()) - locales.keys()
+        if unknown:
+            raise ValueError(f'Чатам назначены неизвестные локали: {unknown}')
+        self.default_locale = default_locale
+        self.fmt = fmt
+        self.parse_mode = fmt or None
+        self.escape = ESCAPES[fmt]
+        self.chat_locales = chat_locales
+        self.statuses = tuple(locales[default_locale]['verdicts'])
+        self._labels = {locale: data['labels']
+                        for locale, data in locales.items()}
+        self._compiled = {}
+        self._fallbacks = {
+            locale: compile_template(
+                data.get('fallback') or locales[default_locale]['fallback'],
+                self.escape, False, None, ''
+            )
+            for locale, data in locales.items()
+        }
+        for locale, data in locales.items():
+            self._compile_locale(locale, data, locales[default_locale])
+        self.render = lru_cache(cache_size)(self._render)
+
+    def _compile_locale(self, locale, data, default):
+        extra = data['verdicts'].keys() - set(self.statuses)
+        if extra:
+            raise ValueError(f'Статусы {extra} локали {locale} не заданы '
+                             f'в локали по умолчанию {self.default_locale}')
+        template = data['templates'].get(self.fmt)
+        markup = template is not None
+        if not markup:
+            template = data['template'] or default['template']
+        for status in self.statuses:
+            verdict = data['verdicts'].get(status,
+                                           default['verdicts'][status])
+            self._compiled[status, locale] = compile_template(
+                template, self.escape, markup, status, verdict
+            )
+
+    @classmethod
+    def load(cls, path=MESSAGES_PATH, **kwargs):
+        """Каталог из встроенных локалей и файла path, если он задан."""
+        if not path:
+            return cls(**kwargs)
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(merge_locales(BUILTIN_LOCALES, data.get('locales', {})),
+                   chat_locales=data.get('chats'), **kwargs)
+
+    def _render(self, status, name, locale=None):
+        parts = (self._compiled.get((status, locale))
+                 or self._compiled.get((status, self.default_locale)))
+        if parts is None:
+            raise NotExpectedHwStatusError(
+                f'В ответе API неизвестный статус ДЗ: {status}'
+            )
+        name = self.escape(name)
+        return ''.join(name if part is None else part for part in parts)
+
+    def text(self, status, name, locale=None):
+        """Вердикт, а для статуса не из каталога - общий текст со статусом."""
+        if status in self.statuses:
+            return self.render(status, name, locale)
+        parts = self._fallbacks.get(locale,
+                                    self._fallbacks[self.default_locale])
+        name, status = self.escape(name), self.escape(status)
+        return ''.join(name if part is None else status if part is STATUS
+                       else part for part in parts)
+
+    def locale_for(self, chat_id):
+        """Локаль чата chat_id."""
+        return self.chat_locales.get(str(chat_id), self.default_locale)
+
+    def label(self, status, locale=None):
+        """Короткое название статуса для /status, без перевода - статус."""
+        default = self._labels[self.default_locale]
+        labels = self._labels.get(locale, default)
+        return labels.get(status, default.get(status, status))
+
+    def fan_out(self, chats, status, name, message):
+        """Пары (чаты, текст) вердикта для рассылки в чаты chats.
+
+        message - вердикт в локали по умолчанию, для остальных локалей
+        текст отрисовывается один раз на группу чатов.
+        """
+        if not self.chat_locales:
+            return [(chats, message)]
+        groups = {}
+        for chat_id in chats:
+            groups.setdefault(self.locale_for(chat_id), []).append(chat_id)
+        return [
+            (tuple(group), message if locale == self.default_locale
+             else self.text(status, name, locale))
+            for locale, group in groups.items()
+        ]
+
+
+def __getattr__(name):
+    """Загружает CATALOGUE по настройкам при первом обращении."""
+    if name != 'CATALOGUE':
+        raise AttributeError(name)
+    global CATALOGUE
+    CATALOGUE = Catalogue.load()
+    return CATALOGUE
@@ -0,0 +1,235 @@
+"""Метрики бота в текстовом формате Prometheus.
+
+Пока экспорт не включён через start_server(), все инструменты сразу
+возвращаются из observe()/inc(), так что в выключенном виде метрики
+стоят одну проверку флага на вызов.
+"""
+import logging
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DELAY_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600)
+
+_registry = []
+_enabled = False
+
+
+def _format_labels(names, values):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric(ABC):
+    """Общая часть инструментов: имя, описание и метки."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self):
+        """Строки метрики в формате Prometheus."""
+        return [f'# HELP {self.name} {self.documentation}',
+                f'# TYPE {self.name} {self.kind}'] + self.samples()
+
+    @abstractmethod
+    def samples(self):
+        """Строки значений метрики."""
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        """Увеличивает счётчик с метками label_values."""
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[label_values] = (
+                self._values.get(label_values, 0) + amount
+            )
+
+    def samples(self):
+        """Строки значений метрики."""
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, labels)} {value}'
+                for labels, value in values]
+
+
+class Gauge(Metric):
+    """Значение, которое читается функцией в момент запроса метрик.
+
+    У метрики с метками значения задаются set() для каждого набора меток.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, read=None, labels=()):
+        super().__init__(name, documentation, labels)
+        self.read = read
+        self._value = 0
+        self._values = {}
+
+    def set(self, value, *label_values):
+        """Запоминает текущее значение с метками label_values."""
+        if not _enabled:
+            return
+        if self.labels:
+            with self._lock:
+                self._values[label_values] = value
+        else:
+            self._value = value
+
+    def set_function(self, read):
+        """Значение будет читаться вызовом read()."""
+        self.read = read
+
+    def samples(self):
+        """Строки значений метрики."""
+        if self.labels:
+            with self._lock:
+                values = list(self._values.items())
+            return [
+                f'{self.name}{_format_labels(self.labels, labels)} {value}'
+                for labels, value in values
+            ]
+        value = self.read() if self.read is not None else self._value
+        return [f'{self.name} {value}']
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value):
+        """Учитывает одно наблюдение."""
+        if not _enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self):
+        """Строки значений метрики."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_sum {total}')
+        lines.append(f'{self.name}_count {cumulative}')
+        return lines
+
+
+API_LATENCY = Histogram('homework_api_request_seconds',
+                        'Время запроса к API Практикума.')
+SEND_LATENCY = Histogram('homework_telegram_send_seconds',
+                         'Время отправки сообщения в телеграм.')
+QUEUE_WAIT = Histogram('homework_send_queue_wait_seconds',
+                       'Время сообщения в очереди отправки.', DELAY_BUCKETS)
+POLL_LAG = Histogram('homework_poll_lag_seconds',
+                     'Отставание опроса от расписания.', DELAY_BUCKETS)
+POLL_DRIFT = Gauge('homework_poll_drift_max_seconds',
+                   'Наибольшее отставание опроса от расписания за цикл.')
+POLLS = Counter('homework_polls_total', 'Число опросов API.')
+ERRORS = Counter('homework_errors_total', 'Ошибки опроса по классам.',
+                 ('exception',))
+SEND_QUEUE_DEPTH = Gauge('homework_send_queue_chats',
+                         'Чатов с неотправленными сообщениями.')
+BREAKER_TRANSITIONS = Counter('homework_breaker_transitions_total',
+                              'Переходы предохранителей между состояниями.',
+                              ('breaker', 'state'))
+BREAKER_REJECTED = Counter('homework_breaker_rejected_total',
+                           'Запросы, отклонённые предохранителем.',
+                           ('breaker',))
+SUBSCRIBERS = Gauge('homework_subscribers', 'Подписчиков в реестре.')
+POOL_WORKERS = Gauge('homework_pool_workers', 'Потоков в пуле.',
+                     labels=('pool',))
+POOL_ACTIVE = Gauge('homework_pool_active_tasks',
+                    'Задач, которые пул выполняет сейчас.', labels=('pool',))
+POOL_BUSY = Counter('homework_pool_busy_seconds_total',
+                    'Суммарное время работы потоков пула над задачами; '
+                    'загрузка - его скорость, делённая на число потоков.',
+                    ('pool',))
+POOL_TASKS = Counter('homework_pool_tasks_total',
+                     'Задачи пула по исходу: ok, error или timeout.',
+                     ('pool', 'outcome'))
+RSS = Gauge('homework_resident_memory_bytes',
+            'Резидентная память процесса, байт.')
+
+
+def collect():
+    """Имя, тип, описание и строки значений каждой метрики."""
+    return [(metric.name, metric.kind, metric.documentation, metric.samples())
+            for metric in _registry]
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def enable():
+    """Включает сбор метрик."""
+    global _enabled
+    _enabled = True
+
+
+def start_server(port, host='127.0.0.1'):
+    """Включает сбор метрик и отдаёт их на http://host:port/metrics."""
+    from http import HTTPStatus
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Отдаёт метрики по GET /metrics."""
+
+        def log_message(self, format, *args):
+            """Не пишет каждый запрос в stderr."""
+
+        def do_GET(self):
+            """Отдаёт текст метрик."""
+            if self.path != '/metrics':
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body = render().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics',
+                     daemon=True).start()
+    logging.info('Метрики доступны на http://%s:%s/metrics',
+                 host, server.server_port)
+    return server
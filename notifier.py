@@ -0,0 +1,310 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import metrics
+from exceptions import CircuitOpenError
+from settings import TELEGRAM_CHAT_RATE, TELEGRAM_RATE
+
+MAX_MESSAGE_LENGTH = 4096
+MESSAGE_SEPARATOR = '\n\n'
+# Как часто, с, забывать вёдра чатов, которые успели наполниться.
+BUCKET_SWEEP_INTERVAL = 60
+# Пауза перед повтором отправки после временной ошибки, с: удваивается с
+# каждой неудачей подряд, но не больше SEND_RETRY_MAX.
+SEND_RETRY_DELAY = 1
+SEND_RETRY_MAX = 300
+
+
+def is_transient(error):
+    """Временная ли ошибка телеграма: сеть, таймаут или ответ 5xx.
+
+    Такую отправку стоит повторить. BadRequest в python-telegram-bot тоже
+    NetworkError, но повтор его не исправит.
+    """
+    from telegram.error import BadRequest, NetworkError
+    return (isinstance(error, NetworkError)
+            and not isinstance(error, BadRequest))
+
+
+def report_sent(on_sent, chat_id, messages):
+    """Вызывает on_sent, если он задан; его ошибки только пишутся в лог."""
+    if on_sent is None:
+        return
+    try:
+        on_sent(chat_id, messages)
+    except Exception as error:
+        logging.error('Не удалось отметить отправку в чат %s: %s', chat_id,
+                      error, exc_info=True)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait(self, now):
+        """Сколько секунд ждать, пока появится токен."""
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def consume(self):
+        """Забирает токен. Вызывать после wait(), вернувшего 0."""
+        self.tokens -= 1
+
+    def full(self, now):
+        """Наполнилось ли ведро: тогда оно не отличается от нового."""
+        return (self.tokens + (now - self.updated) * self.rate
+                >= self.capacity)
+
+
+class Outbox:
+    """Исходящие сообщения телеграма с ограничением частоты.
+
+    Сообщения копятся по чатам: пока чат ждёт своей очереди, новые
+    сообщения для него склеиваются в одно. Чаты обслуживаются по кругу,
+    частота ограничена общим ведром токенов и ведром каждого чата. У чата
+    в отправке не больше одной пачки: взятый take() чат возвращается в
+    круг только после done() или requeue(), так что сообщения чата уходят
+    по порядку при любом числе отправляющих потоков.
+    Наполнившиеся вёдра чатов раз в BUCKET_SWEEP_INTERVAL секунд
+    забываются, так что память растёт с числом недавно писавших чатов.
+    Сам класс не потокобезопасен - синхронизацией занимается драйвер.
+    """
+
+    def __init__(self, rate=TELEGRAM_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+                 clock=time.monotonic):
+        self.chat_rate = chat_rate
+        self.clock = clock
+        # Ведро на rate < 1 токена никогда не наполнится до целого токена.
+        self._global = TokenBucket(rate, max(1, rate), clock())
+        self._chats = {}
+        self._pending = {}
+        self._not_before = {}
+        self._since = {}
+        self._failures = {}
+        self._in_flight = set()
+        self._ready = deque()
+        self._next_sweep = clock() + BUCKET_SWEEP_INTERVAL
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, chat_id, message):
+        """Кладёт сообщение в очередь чата."""
+        if chat_id in self._pending:
+            self._pending[chat_id].append(message)
+        else:
+            self._pending[chat_id] = [message]
+            self._since[chat_id] = self.clock()
+            if chat_id not in self._in_flight:
+                self._ready.append(chat_id)
+
+    def put_many(self, chat_ids, message):
+        """Кладёт одно сообщение в очереди нескольких чатов."""
+        for chat_id in chat_ids:
+            self.put(chat_id, message)
+
+    def requeue(self, chat_id, messages, delay):
+        """Возвращает неотправленные сообщения в начало очереди чата."""
+        self._not_before[chat_id] = self.clock() + delay
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            self._pending[chat_id] = list(messages)
+            self._since[chat_id] = self.clock()
+        else:
+            pending[:0] = messages
+        if chat_id in self._in_flight or pending is None:
+            self._in_flight.discard(chat_id)
+            self._ready.append(chat_id)
+
+    def retry(self, chat_id, messages):
+        """Возвращает сообщения после временной ошибки с растущей паузой.
+
+        Возвращает паузу, с. Счёт неудач чата сбрасывает done().
+        """
+        failures = self._failures.get(chat_id, 0)
+        self._failures[chat_id] = failures + 1
+        delay = min(SEND_RETRY_MAX, SEND_RETRY_DELAY * 2 ** failures)
+        self.requeue(chat_id, messages, delay)
+        return delay
+
+    def done(self, chat_id):
+        """Отмечает, что пачка чата отправлена или отброшена окончательно."""
+        self._failures.pop(chat_id, None)
+        if chat_id in self._in_flight:
+            self._in_flight.discard(chat_id)
+            if chat_id in self._pending:
+                self._ready.append(chat_id)
+
+    def take(self):
+        """Следующий чат, которому можно отправить сообщение.
+
+        Возвращает ((chat_id, messages), 0) или (None, wait), где wait -
+        сколько секунд ждать до следующей попытки (None - очередь пуста).
+        """
+        if not self._ready:
+            return None, None
+        now = self.clock()
+        wait = self._global.wait(now)
+        if wait:
+            return None, wait
+        for _ in range(len(self._ready)):
+            chat_id = self._ready[0]
+            chat_wait = max(self._chat_bucket(chat_id, now).wait(now),
+                            self._not_before.get(chat_id, 0) - now)
+            if chat_wait <= 0:
+                self._ready.popleft()
+                return (chat_id, self._pop_batch(chat_id)), 0
+            wait = chat_wait if not wait else min(wait, chat_wait)
+            self._ready.rotate(-1)
+        return None, wait
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, 1,
+                                                        now)
+        return bucket
+
+    def _sweep(self, now):
+        self._chats = {chat_id: bucket
+                       for chat_id, bucket in self._chats.items()
+                       if not bucket.full(now)}
+        self._next_sweep = now + BUCKET_SWEEP_INTERVAL
+
+    def _pop_batch(self, chat_id):
+        self._global.consume()
+        self._chats[chat_id].consume()
+        self._not_before.pop(chat_id, None)
+        pending = self._pending.pop(chat_id)
+        self._in_flight.add(chat_id)
+        now = self.clock()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        metrics.QUEUE_WAIT.observe(now - self._since.pop(chat_id, now))
+        size = len(pending[0])
+        count = 1
+        for message in pending[1:]:
+            size += len(MESSAGE_SEPARATOR) + len(message)
+            if size > MAX_MESSAGE_LENGTH:
+                break
+            count += 1
+        if count < len(pending):
+            self._pending[chat_id] = pending[count:]
+            self._since[chat_id] = now
+        return pending[:count]
+
+
+class SendQueue:
+    """Фоновый поток, отправляющий сообщения из Outbox.
+
+    put() не блокируется на телеграме, поэтому опрос API никогда не ждёт
+    отправки. На RetryAfter сообщения возвращаются в очередь чата и уходят
+    после паузы, которую попросил телеграм, на CircuitOpenError - после
+    паузы предохранителя, на временную ошибку (is_transient()) - после
+    растущей паузы Outbox.retry(). После отправки, удачной или
+    окончательно неудачной (BadRequest, Unauthorized), вызывается
+    on_sent(chat_id, messages). Прочие исключения send() считаются
+    окончательной ошибкой, а исключения on_sent только пишутся в лог:
+    поток отправки из-за них не останавливается.
+
+    С пулом pool (pools.MonitoredPool) поток только раздаёт сообщения, а
+    отправляют их потоки пула, не больше pool.workers одновременно.
+    Порядок сообщений одного чата сохраняется: Outbox не отдаёт следующую
+    пачку чата, пока не отправлена предыдущая.
+    """
+
+    def __init__(self, send, outbox=None, on_sent=None, pool=None):
+        self.send = send
+        self.outbox = Outbox() if outbox is None else outbox
+        self.on_sent = on_sent
+        self.pool = pool
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='send-queue',
+                                        daemon=True)
+
+    def put(self, chat_id, message):
+        """Ставит сообщение в очередь на отправку."""
+        with self._cond:
+            self.outbox.put(chat_id, message)
+            self._cond.notify()
+
+    def put_many(self, chat_ids, message):
+        """Ставит одно сообщение в очередь для нескольких чатов сразу."""
+        with self._cond:
+            self.outbox.put_many(chat_ids, message)
+            self._cond.notify()
+
+    def start(self):
+        """Запускает поток отправки."""
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Отправляет оставшиеся сообщения и останавливает поток."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _next(self):
+        with self._cond:
+            while True:
+                item, wait = self.outbox.take()
+                if item is not None:
+                    return item
+                if self._stopping and not self.outbox:
+                    return None
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                break
+            if self.pool is None:
+                self._deliver(*item)
+            else:
+                self.pool.submit(self._deliver, *item)
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def _deliver(self, chat_id, messages):
+        from telegram.error import RetryAfter, TelegramError
+        try:
+            self.send(chat_id, MESSAGE_SEPARATOR.join(messages))
+        except (RetryAfter, CircuitOpenError) as error:
+            logging.warning('Отправка в чат %s отложена на %.0f с: %s',
+                            chat_id, error.retry_after, error)
+            with self._cond:
+                self.outbox.requeue(chat_id, messages, error.retry_after)
+                self._cond.notify()
+            return
+        except TelegramError as error:
+            if is_transient(error):
+                with self._cond:
+                    delay = self.outbox.retry(chat_id, messages)
+                    self._cond.notify()
+                logging.warning('Отправка в чат %s не удалась, повтор через '
+                                '%.0f с: %s', chat_id, delay, error)
+                return
+            logging.error('Сообщение в чат %s не отправлено: %s', chat_id,
+                          error, exc_info=True)
+        except Exception as error:
+            logging.error('Сбой отправки в чат %s: %s', chat_id, error,
+                          exc_info=True)
+        with self._cond:
+            self.outbox.done(chat_id)
+            self._cond.notify()
+        report_sent(self.on_sent, chat_id, messages)
@@ -0,0 +1,83 @@
+import random
+from email.utils import parsedate_to_datetime
+
+import exceptions as exptns
+from settings import (ACTIVE_RETRY_TIME, MAX_BACKOFF, MIN_BACKOFF,
+                      POLL_JITTER, RETRY_TIME)
+
+ACTIVE_STATUS = 'reviewing'
+BACKOFF_ERRORS = (exptns.NotOkResponseError, ConnectionError, TimeoutError)
+
+
+def parse_retry_after(value, now):
+    """Секунды из заголовка Retry-After: число или HTTP дата."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_chain(error):
+    while error is not None:
+        yield error
+        error = error.__cause__
+
+
+class FixedPolicy:
+    """Прежнее поведение: всегда RETRY_TIME между опросами."""
+
+    def __init__(self, interval=RETRY_TIME):
+        self.interval = interval
+
+    def next_delay(self, subscriber, error=None):
+        """Пауза до следующего опроса подписчика, с."""
+        return self.interval
+
+
+class AdaptivePolicy:
+    """Пауза до следующего опроса в зависимости от его результата.
+
+    - Retry-After из ответа API соблюдается всегда;
+    - при NotOkResponseError и ConnectionError пауза растёт от min_backoff
+      вдвое с каждой ошибкой подряд, но не больше max_backoff;
+    - пока у подписчика есть работа на ревью, опрос идёт раз в active;
+    - в остальное время - раз в base.
+    Паузы размываются на ±jitter, чтобы подписчики не опрашивались
+    синхронно. Источник случайности передаётся снаружи ради тестов.
+    """
+
+    def __init__(self, base=RETRY_TIME, active=ACTIVE_RETRY_TIME,
+                 min_backoff=MIN_BACKOFF, max_backoff=MAX_BACKOFF,
+                 jitter=POLL_JITTER, rand=random.random):
+        self.base = base
+        self.active = active
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.rand = rand
+
+    def next_delay(self, subscriber, error=None):
+        """Пауза до следующего опроса подписчика, с."""
+        if error is None:
+            subscriber.failures = 0
+            if subscriber.homeworks.has_status(ACTIVE_STATUS):
+                return self._spread(self.active)
+            return self._spread(self.base)
+        retry_after = max(getattr(exc, 'retry_after', None) or 0
+                          for exc in _error_chain(error))
+        if not any(isinstance(exc, BACKOFF_ERRORS)
+                   for exc in _error_chain(error)):
+            return max(retry_after, self._spread(self.base))
+        subscriber.failures += 1
+        cap = min(self.max_backoff,
+                  self.min_backoff * 2 ** (subscriber.failures - 1))
+        return max(retry_after, cap / 2 + self.rand() * cap / 2)
+
+    def _spread(self, interval):
+        return interval * (1 - self.jitter + 2 * self.jitter * self.rand())
@@ -0,0 +1,97 @@
+"""Пулы потоков режима --pool с учётом их загрузки.
+
+Загрузка пула - доля времени, которую его потоки заняты задачами. Она
+видна в метриках homework_pool_* и в предупреждении в лог, когда пул
+занят почти всё время и задачи начинают ждать потоков.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Загрузка пула за цикл, при которой пишется предупреждение.
+SATURATION_WARNING = 0.9
+
+
+class MonitoredPool:
+    """Ограниченный пул потоков, который считает свою загрузку.
+
+    Одновременно в пуле не больше workers задач: submit() ждёт, пока
+    освободится поток, так что очередь задач не растёт без предела.
+    """
+
+    def __init__(self, name, workers, clock=time.monotonic):
+        self.name = name
+        self.workers = workers
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._busy = 0.0
+        self._since = clock()
+        metrics.POOL_WORKERS.set(workers, name)
+
+    def submit(self, func, *args):
+        """Ставит func(*args) в пул, дождавшись свободного потока."""
+        self._slots.acquire()
+        try:
+            return self._executor.submit(self._run, func, args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _run(self, func, args):
+        started = self.clock()
+        self._track(1, 0.0)
+        outcome = 'error'
+        try:
+            result = func(*args)
+            outcome = 'ok'
+            return result
+        finally:
+            elapsed = self.clock() - started
+            self._track(-1, elapsed)
+            metrics.POOL_BUSY.inc(self.name, amount=elapsed)
+            metrics.POOL_TASKS.inc(self.name, outcome)
+            self._slots.release()
+
+    def _track(self, delta, elapsed):
+        with self._lock:
+            self._active += delta
+            self._busy += elapsed
+            active = self._active
+        metrics.POOL_ACTIVE.set(active, self.name)
+
+    def timed_out(self, count=1):
+        """Учитывает задачи, результата которых не дождались."""
+        metrics.POOL_TASKS.inc(self.name, 'timeout', amount=count)
+
+    def utilisation(self):
+        """Загрузка пула с прошлого вызова, от 0 до 1.
+
+        Задача учитывается, когда завершается, поэтому загрузка за
+        короткий промежуток приблизительна.
+        """
+        now = self.clock()
+        with self._lock:
+            busy, self._busy = self._busy, 0.0
+            elapsed, self._since = now - self._since, now
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, busy / (elapsed * self.workers))
+
+    def report(self):
+        """Предупреждает в логе, если пул был почти всё время занят."""
+        utilisation = self.utilisation()
+        if utilisation >= SATURATION_WARNING:
+            logging.warning('Пул %s занят на %.0f%%: задачи ждут свободных '
+                            'потоков.', self.name, utilisation * 100)
+        return utilisation
+
+    def shutdown(self, wait=True):
+        """Останавливает пул, по умолчанию дождавшись начатых задач."""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,298 @@
+"""Профилирование работающего бота.
+
+Захват длится PROFILE_CYCLES циклов опроса и начинается по флагу
+--profile или по сигналу SIGUSR1 - на границе цикла, а не посреди опроса.
+Режим sample: отдельный поток раз в PROFILE_INTERVAL снимает стеки всех
+потоков, результат - файл speedscope (https://www.speedscope.app).
+Режим cprofile: cProfile в потоке цикла опроса и в вызовах обёрнутых
+функций в остальных потоках, результат - файл pstats. В обоих режимах
+рядом пишутся таймеры обёрнутых функций.
+
+Пока профилирование не настроено, функции не обёрнуты и сигнал не
+перехватывается, так что выключенное профилирование ничего не стоит.
+"""
+import atexit
+import cProfile
+import inspect
+import json
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from settings import PROFILE_CYCLES, PROFILE_DIR, PROFILE_INTERVAL
+
+MODES = ('sample', 'cprofile')
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+class Timers:
+    """Число вызовов, суммарное и наибольшее время каждой функции."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def observe(self, name, seconds):
+        """Учитывает вызов функции name длительностью seconds."""
+        with self._lock:
+            stats = self._stats.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def summary(self):
+        """Вызовы, суммарное, среднее и наибольшее время по функциям, с."""
+        with self._lock:
+            return {
+                name: {'calls': calls, 'total': total,
+                       'mean': total / calls, 'max': worst}
+                for name, (calls, total, worst) in sorted(self._stats.items())
+            }
+
+
+class Sampler:
+    """Выборочный профилировщик всех потоков процесса.
+
+    Одинаковые стеки одного потока хранятся один раз со счётчиком, так
+    что память растёт с числом разных стеков, а не с длиной захвата.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._frames = {}
+        self._stacks = {}
+        self._names = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _frame(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def sample(self):
+        """Снимает стеки всех потоков, кроме текущего."""
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self._stacks.setdefault(ident, Counter())[tuple(stack)] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        """Запускает поток выборки."""
+        self._thread = threading.Thread(target=self._run, name='profiler',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает поток выборки."""
+        self._stop.set()
+        self._thread.join()
+        self._names = {thread.ident: thread.name
+                       for thread in threading.enumerate()}
+
+    def speedscope(self, name):
+        """Захваченные стеки в формате файла speedscope."""
+        frames = [{'name': function, 'file': path, 'line': line}
+                  for function, path, line in self._frames]
+        profiles = []
+        for ident, stacks in self._stacks.items():
+            weights = [count * self.interval for count in stacks.values()]
+            profiles.append({
+                'type': 'sampled',
+                'name': self._names.get(ident, str(ident)),
+                'unit': 'seconds', 'startValue': 0, 'endValue': sum(weights),
+                'samples': [list(stack) for stack in stacks],
+                'weights': weights,
+            })
+        return {'$schema': SPEEDSCOPE_SCHEMA, 'name': name,
+                'shared': {'frames': frames}, 'profiles': profiles,
+                'exporter': 'homework profiling'}
+
+
+class Profiler:
+    """Захваты профиля на cycles циклов опроса и таймеры функций.
+
+    start(), stop() и cycle_done() вызываются в потоке цикла опроса.
+    Обёрнутые instrument() функции, пока захвата нет, стоят одну проверку
+    флага на вызов.
+    """
+
+    def __init__(self, mode, cycles=PROFILE_CYCLES, directory=PROFILE_DIR,
+                 interval=PROFILE_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f'Неизвестный режим профилирования: {mode}')
+        self.mode = mode
+        self.cycles = cycles
+        self.directory = directory
+        self.interval = interval
+        self.active = False
+        self.timers = Timers()
+        self._requested = False
+        self._remaining = 0
+        self._capture = 0
+        self._owner = None
+        self._sampler = None
+        self._profile = None
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def arm(self):
+        """Перехватывает SIGUSR1: сигнал запрашивает новый захват.
+
+        Захват, прерванный остановкой процесса, записывается при выходе.
+        """
+        signal.signal(signal.SIGUSR1, self._on_signal)
+        atexit.register(self._flush)
+        return self
+
+    def _flush(self):
+        if self.active:
+            self.stop()
+
+    def _on_signal(self, signum, frame):
+        self.request()
+
+    def request(self):
+        """Просит начать захват в конце ближайшего цикла опроса."""
+        self._requested = True
+
+    def cycle_done(self):
+        """Отмечает конец цикла опроса: начинает или завершает захват."""
+        if self.active:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self.stop()
+        elif self._requested:
+            self._requested = False
+            self.start()
+
+    def start(self):
+        """Начинает захват на cycles циклов опроса."""
+        logging.info('Профилирование (%s) на %s циклов опроса.', self.mode,
+                     self.cycles)
+        self.timers = Timers()
+        self._remaining = self.cycles
+        self._capture += 1
+        self._owner = threading.get_ident()
+        if self.mode == 'sample':
+            self._sampler = Sampler(self.interval)
+            self._sampler.start()
+        else:
+            self._thread_profiles = []
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self.active = True
+
+    def stop(self):
+        """Завершает захват и записывает файлы. Возвращает путь профиля."""
+        self.active = False
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, 'profile-{}-{}'.format(
+            os.getpid(), time.strftime('%Y%m%d-%H%M%S')
+        ))
+        if self.mode == 'sample':
+            self._sampler.stop()
+            path = f'{prefix}.speedscope.json'
+            with open(path, 'w') as file:
+                json.dump(self._sampler.speedscope(os.path.basename(prefix)),
+                          file)
+        else:
+            self._profile.disable()
+            stats = pstats.Stats(self._profile)
+            with self._lock:
+                thread_profiles = list(self._thread_profiles)
+            for lock, profile in thread_profiles:
+                with lock:
+                    stats.add(profile)
+            path = f'{prefix}.pstats'
+            stats.dump_stats(path)
+        summary = self.timers.summary()
+        with open(f'{prefix}.timers.json', 'w') as file:
+            json.dump(summary, file, indent=2)
+        for name, timer in summary.items():
+            logging.info('%s: %s вызовов, в среднем %.2f мс, максимум %.2f '
+                         'мс.', name, timer['calls'], timer['mean'] * 1000,
+                         timer['max'] * 1000)
+        logging.info('Профиль записан в %s', path)
+        return path
+
+    def _thread_profile(self):
+        entry = getattr(self._local, 'entry', None)
+        if entry is None or entry[0] != self._capture:
+            entry = (self._capture, threading.Lock(), cProfile.Profile())
+            self._local.entry = entry
+            with self._lock:
+                self._thread_profiles.append(entry[1:])
+        return entry[1:]
+
+    def _profiled(self, func, args, kwargs):
+        """Вызов func под cProfile текущего потока.
+
+        Поток цикла опроса уже профилируется целиком, вложенные вызовы
+        обёрнутых функций - внешним вызовом.
+        """
+        local = self._local
+        if (threading.get_ident() == self._owner
+                or getattr(local, 'busy', False)):
+            return func(*args, **kwargs)
+        lock, profile = self._thread_profile()
+        local.busy = True
+        try:
+            with lock:
+                return profile.runcall(func, *args, **kwargs)
+        finally:
+            local.busy = False
+
+    def timed(self, func):
+        """Обёртка func, которая во время захвата замеряет каждый вызов."""
+        name = func.__name__
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                if not self.active:
+                    return await func(*args, **kwargs)
+                timers, started = self.timers, time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    timers.observe(name, time.perf_counter() - started)
+
+            return timed_coroutine
+
+        @wraps(func)
+        def timed_call(*args, **kwargs):
+            if not self.active:
+                return func(*args, **kwargs)
+            timers, started = self.timers, time.perf_counter()
+            try:
+                if self.mode == 'cprofile':
+                    return self._profiled(func, args, kwargs)
+                return func(*args, **kwargs)
+            finally:
+                timers.observe(name, time.perf_counter() - started)
+
+        return timed_call
+
+    def instrument(self, module, names):
+        """Заменяет функции names модуля module обёртками timed()."""
+        for name in names:
+            setattr(module, name, self.timed(getattr(module, name)))
@@ -0,0 +1,121 @@
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+
+import metrics
+
+MAX_IDLE_SLEEP = 60
+
+
+def stagger_fraction(token):
+    """Постоянная доля [0, 1) интервала для токена."""
+    digest = hashlib.blake2b(str(token).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+class PollScheduler:
+    """Расписание опросов подписчиков реестра на двоичной куче.
+
+    В куче лежат записи (время опроса, номер, подписчик). Перенос опроса
+    добавляет новую запись за O(log n); запись действительна, пока её
+    время совпадает с subscriber.next_poll, устаревшие отбрасываются при
+    извлечении. Первый опрос подписчика сдвигается на постоянную по токену
+    долю stagger, поэтому подписчики с одинаковым интервалом опрашиваются
+    равномерно по нему, а не пачкой. Следующий опрос отсчитывается от
+    запланированного времени, а не от окончания опроса, так что сдвиги
+    не сбиваются. Отставание начала опроса от расписания копится в drift.
+
+    Циклы опроса начинаются не чаще раза в window секунд: опросы,
+    наступившие за это время, выполняются одним циклом, так что после
+    разнесения по stagger цикл - это не один опрос, и действия в конце
+    цикла (сохранение состояния) не повторяются на каждый опрос.
+    """
+
+    def __init__(self, registry, stagger=0, clock=time.monotonic, window=0):
+        self.registry = registry
+        self.stagger = stagger
+        self.clock = clock
+        self.window = window
+        self._next_cycle = 0.0
+        self._heap = []
+        self._counter = itertools.count()
+        self._members = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self._drift = [0, 0.0, 0.0]
+        self._sync()
+
+    def _push(self, subscriber, due):
+        subscriber.next_poll = due
+        heapq.heappush(self._heap, (due, next(self._counter), subscriber))
+
+    def _sync(self):
+        if self._version == self.registry.version:
+            return
+        self._version = self.registry.version
+        now = self.clock()
+        for subscriber in self.registry:
+            if self._members.get(subscriber.token) is subscriber:
+                continue
+            self._members[subscriber.token] = subscriber
+            self._push(subscriber, subscriber.next_poll or (
+                now + self.stagger * stagger_fraction(subscriber.token)
+            ))
+
+    def _valid(self, entry):
+        due, _, subscriber = entry
+        return (self._members.get(subscriber.token) is subscriber
+                and subscriber.next_poll == due)
+
+    def pop_due(self):
+        """Подписчики, чей опрос наступил, с запланированным временем."""
+        with self._lock:
+            self._sync()
+            now = self.clock()
+            self._next_cycle = now + self.window
+            due = []
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)
+                if self._valid(entry):
+                    due.append((entry[2], entry[0]))
+            return due
+
+    def started(self, scheduled):
+        """Учитывает отставание начавшегося опроса от расписания."""
+        drift = max(0.0, self.clock() - scheduled)
+        metrics.POLL_LAG.observe(drift)
+        with self._lock:
+            stats = self._drift
+            stats[0] += 1
+            stats[1] += drift
+            stats[2] = max(stats[2], drift)
+        return drift
+
+    def reschedule(self, subscriber, scheduled, delay):
+        """Назначает следующий опрос через delay от запланированного."""
+        with self._lock:
+            self._push(subscriber, max(self.clock(), scheduled + delay))
+
+    def time_to_next(self):
+        """Сколько секунд спать до ближайшего запланированного опроса."""
+        with self._lock:
+            self._sync()
+            heap = self._heap
+            while heap and not self._valid(heap[0]):
+                heapq.heappop(heap)
+            if not heap:
+                return MAX_IDLE_SLEEP
+            now = self.clock()
+            return min(MAX_IDLE_SLEEP, max(0.0, heap[0][0] - now,
+                                           self._next_cycle - now))
+
+    def drift(self):
+        """Число опросов, среднее и наибольшее отставание с прошлого вызова."""
+        with self._lock:
+            polls, total, worst = self._drift
+            self._drift = [0, 0.0, 0.0]
+        return {'polls': polls, 'mean': total / polls if polls else 0.0,
+                'max': worst}
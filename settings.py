@@ -1,22 +1,205 @@
-import os
-
-from dotenv import load_dotenv
+"""Настройки бота.
 
-load_dotenv()
-
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+Настройки из окружения читаются при первом обращении к любой из них, а не
+при импорте модуля: тогда же один раз подгружается .env (load_env()).
+"""
+import os
+from functools import partial
 
-constant_tuple = (PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+# Отметка в окружении: .env уже прочитан. Рабочие процессы наследуют её
+# вместе с переменными и файл не перечитывают.
+ENV_LOADED = 'HOMEWORK_ENV_LOADED'
 
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
-
 
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+
+
+def load_env():
+    """Дописывает в окружение переменные из .env, если ещё не дописаны."""
+    if os.environ.get(ENV_LOADED):
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    os.environ[ENV_LOADED] = '1'
+
+
+def _number(problems, name, default, kind=int):
+    """Число kind из переменной окружения name.
+
+    Если значение не разбирается, ошибка дописывается в problems, а
+    вместо значения берётся default.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return kind(value)
+    except ValueError:
+        problems.append(f'{name}={value!r} не число')
+        return default
+
+
+def _choice(problems, name, default, choices):
+    """Значение переменной окружения name из списка choices.
+
+    Иное значение, как и у _number, дописывается в problems и заменяется
+    default.
+    """
+    value = os.getenv(name, default)
+    if value in choices:
+        return value
+    problems.append(f'{name}={value!r} не одно из: {", ".join(choices)}')
+    return default
+
+
+def _read():
+    """Настройки из окружения."""
+    problems = []
+    number = partial(_number, problems)
+    choice = partial(_choice, problems)
+    practicum_token = os.getenv('PRACTICUM_TOKEN')
+    telegram_token = os.getenv('TELEGRAM_TOKEN')
+    telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
+    max_concurrent_polls = number('MAX_CONCURRENT_POLLS', 16)
+    return {
+        'PRACTICUM_TOKEN': practicum_token,
+        'TELEGRAM_TOKEN': telegram_token,
+        'TELEGRAM_CHAT_ID': telegram_chat_id,
+        'constant_tuple': (practicum_token, telegram_token, telegram_chat_id),
+
+        # Политика расписания опросов: adaptive или fixed (всегда
+        # RETRY_TIME).
+        'POLL_POLICY': os.getenv('POLL_POLICY', 'adaptive'),
+        'ACTIVE_RETRY_TIME': number('ACTIVE_RETRY_TIME', 120),
+        'MIN_BACKOFF': number('MIN_BACKOFF', 15),
+        'MAX_BACKOFF': number('MAX_BACKOFF', 1800),
+        'POLL_JITTER': number('POLL_JITTER', 0.1, float),
+        # Окно, по которому равномерно разносятся первые опросы
+        # подписчиков, с.
+        'POLL_STAGGER': number('POLL_STAGGER', RETRY_TIME),
+        # Опросы, наступившие в пределах окна, выполняются одним циклом,
+        # с: не чаще раза в окно сохраняется состояние.
+        'POLL_BATCH_WINDOW': number('POLL_BATCH_WINDOW', 1, float),
+        'ENDPOINT': os.getenv(
+            'PRACTICUM_ENDPOINT',
+            'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+        ),
+        'TELEGRAM_API_URL': os.getenv('TELEGRAM_API_URL',
+                                      'https://api.telegram.org/bot'),
+        'HEADERS': {'Authorization': f'OAuth {practicum_token}'},
+
+        # Файл (.json) или база SQLite (.db, .sqlite) с подписчиками. Если
+        # не задан, бот обслуживает одну пару
+        # PRACTICUM_TOKEN/TELEGRAM_CHAT_ID.
+        'SUBSCRIBERS_PATH': os.getenv('SUBSCRIBERS_PATH'),
+        'MAX_CONCURRENT_POLLS': max_concurrent_polls,
+        # Режим --pool: потоков в пулах запросов к API и отправки в
+        # телеграм и сколько секунд ждать одну задачу каждого пула.
+        'POOL_FETCH_WORKERS': number('POOL_FETCH_WORKERS',
+                                     max_concurrent_polls),
+        'POOL_SEND_WORKERS': number('POOL_SEND_WORKERS', 4),
+        'POOL_FETCH_TIMEOUT': number('POOL_FETCH_TIMEOUT', 15, float),
+        'POOL_SEND_TIMEOUT': number('POOL_SEND_TIMEOUT', 10, float),
+
+        # База SQLite, в которой между перезапусками хранятся курсоры
+        # from_date, статусы работ и журнал уведомлений. Пустая строка -
+        # хранить в памяти.
+        'STATE_PATH': os.getenv('STATE_PATH', 'state.db'),
+
+        # Ограничения телеграма: сообщений в секунду всего и в один чат.
+        'TELEGRAM_RATE': number('TELEGRAM_RATE', 25, float),
+        'TELEGRAM_CHAT_RATE': number('TELEGRAM_CHAT_RATE', 1, float),
+
+        # Как часто присылать сводку о повторяющемся сбое, с.
+        'ERROR_SUMMARY_INTERVAL': number('ERROR_SUMMARY_INTERVAL', 3600),
+
+        # Логирование: уровень, вывод в JSON lines и доля записываемых
+        # сообщений о каждом опросе (1 - все, 0 - ни одного).
+        'LOG_LEVEL': choice('LOG_LEVEL', 'INFO',
+                            ('DEBUG', 'INFO', 'WARNING', 'ERROR',
+                             'CRITICAL')),
+        'LOG_JSON': os.getenv('LOG_JSON', '0') == '1',
+        'LOG_POLL_SAMPLE': number('LOG_POLL_SAMPLE', 1, float),
+
+        # Порт HTTP сервера с метриками Prometheus (/metrics). 0 - не
+        # запускать.
+        'METRICS_PORT': number('METRICS_PORT', 0),
+
+        # Размер пула соединений к API и время жизни простаивающего
+        # соединения, с. API_KEEP_ALIVE=0 отключает постоянные соединения.
+        'API_POOL_SIZE': number('API_POOL_SIZE', max_concurrent_polls),
+        'API_KEEP_ALIVE': number('API_KEEP_ALIVE', 60),
+        # Условные запросы и пропуск разбора неизменившихся ответов API.
+        'API_CACHE': os.getenv('API_CACHE', '1') == '1',
+        # Сколько токенов держать в кеше ответов API, лишние вытесняются.
+        'API_CACHE_SIZE': number('API_CACHE_SIZE', 10000),
+        # Разборщик ответов API: auto, orjson, msgspec или json.
+        'JSON_DECODER': choice('JSON_DECODER', 'auto',
+                               ('auto', 'orjson', 'msgspec', 'json')),
+
+        # Приём команд /status и /subscribe: пусто - выключен, polling или
+        # webhook. Для webhook телеграм шлёт обновления на WEBHOOK_URL +
+        # токен бота.
+        'BOT_UPDATES': os.getenv('BOT_UPDATES', ''),
+        'WEBHOOK_URL': os.getenv('WEBHOOK_URL', ''),
+        'WEBHOOK_LISTEN': os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+        'WEBHOOK_PORT': number('PORT', 8443),
+
+        # Предохранители API Практикума и телеграма: после скольких
+        # неудач подряд запросы приостанавливаются (0 - никогда) и на
+        # сколько секунд до пробного запроса.
+        'API_BREAKER_THRESHOLD': number('API_BREAKER_THRESHOLD', 5),
+        'API_BREAKER_RESET': number('API_BREAKER_RESET', 30, float),
+        'TELEGRAM_BREAKER_THRESHOLD': number('TELEGRAM_BREAKER_THRESHOLD',
+                                             5),
+        'TELEGRAM_BREAKER_RESET': number('TELEGRAM_BREAKER_RESET', 30,
+                                         float),
+
+        # Профилирование: пусто - выключено, sample или cprofile. Захват
+        # длится PROFILE_CYCLES циклов опроса и запускается SIGUSR1;
+        # PROFILE_INTERVAL - шаг выборки режима sample, с.
+        'PROFILE_MODE': os.getenv('PROFILE_MODE', ''),
+        'PROFILE_CYCLES': number('PROFILE_CYCLES', 10),
+        'PROFILE_INTERVAL': number('PROFILE_INTERVAL', 0.005, float),
+        'PROFILE_DIR': os.getenv('PROFILE_DIR', 'profiles'),
+
+        # Тексты вердиктов (см. messages.py): файл каталога с добавочными
+        # статусами, локалями и локалями чатов, локаль по умолчанию,
+        # разметка телеграма (пусто, HTML или MarkdownV2) и сколько
+        # готовых текстов держать в кеше.
+        'MESSAGES_PATH': os.getenv('MESSAGES_PATH', ''),
+        'DEFAULT_LOCALE': os.getenv('DEFAULT_LOCALE', 'ru'),
+        'MESSAGE_FORMAT': os.getenv('MESSAGE_FORMAT', ''),
+        'MESSAGE_CACHE_SIZE': number('MESSAGE_CACHE_SIZE', 4096),
+
+        # Бюджет памяти (см. memory.py): сколько работ одного подписчика
+        # помнить, как часто писать в лог отчёт о памяти, с (0 - не
+        # писать), и сколько кадров стека хранить tracemalloc (0 - не
+        # трассировать) и сколько мест выделения показывать в отчёте.
+        'HOMEWORK_STATE_LIMIT': number('HOMEWORK_STATE_LIMIT', 500),
+        'MEMORY_REPORT_INTERVAL': number('MEMORY_REPORT_INTERVAL', 3600,
+                                         float),
+        'MEMORY_TRACE_FRAMES': number('MEMORY_TRACE_FRAMES', 0),
+        'MEMORY_TRACE_TOP': number('MEMORY_TRACE_TOP', 10),
+
+        # Переменные, которые не удалось разобрать: вместо них взяты
+        # значения по умолчанию, а --check о них сообщает.
+        'SETTINGS_PROBLEMS': problems,
+    }
+
+
+def __getattr__(name):
+    """Читает настройки окружения при первом обращении к любой из них."""
+    if name.startswith('__'):
+        raise AttributeError(name)
+    load_env()
+    values = _read()
+    globals().update(values)
+    if name not in values:
+        raise AttributeError(f"module 'settings' has no attribute {name!r}")
+    return values[name]
@@ -0,0 +1,318 @@
+"""Запуск бота в нескольких процессах: супервизор и рабочие процессы.
+
+Чаты распределяются по рабочим процессам согласованным хешированием, так
+что все подписки одного чата и его лимит отправок в телеграм живут в одном
+процессе. Токен с несколькими чатами опрашивает процесс его основного
+чата subscriber.chat_id. Курсоры и статусы рабочие процессы хранят в
+общей базе STATE_PATH.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from bisect import bisect_right
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+from settings import METRICS_PORT
+from subscribers import SubscriberRegistry
+
+REPLICAS = 64
+REPORT_INTERVAL = 5
+STOP_TIMEOUT = 15
+RESTART_DELAY = 1
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Кольцо согласованного хеширования.
+
+    Каждый узел стоит на кольце в replicas точках, ключ принадлежит узлу
+    ближайшей точки по часовой стрелке. При добавлении узла ему переходит
+    примерно 1/N ключей, остальные остаются на прежних узлах.
+    """
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        points = sorted((_hash(f'{node}:{replica}'), node)
+                        for node in nodes for replica in range(replicas))
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ key."""
+        index = bisect_right(self._points, _hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+class Shard:
+    """Доля чатов одного рабочего процесса из workers."""
+
+    def __init__(self, index, workers, reports=None):
+        self.index = index
+        self.workers = workers
+        self.ring = HashRing(range(workers))
+        self.reports = reports
+        self.last_cycle = None
+
+    def select(self, registry):
+        """Подписчики registry, чьи чаты принадлежат этой доле."""
+        return SubscriberRegistry(
+            subscriber for subscriber in registry
+            if self.ring.node_for(subscriber.chat_id) == self.index
+        )
+
+    def cycle_done(self):
+        """Отмечает завершение цикла опроса для проверки здоровья."""
+        self.last_cycle = time.time()
+
+    def start_reporting(self, registry):
+        """Раз в REPORT_INTERVAL отправляет супервизору отчёт о процессе."""
+        def report_forever():
+            while True:
+                self.reports.put({
+                    'index': self.index, 'pid': os.getpid(),
+                    'time': time.time(), 'last_cycle': self.last_cycle,
+                    'subscribers': len(registry),
+                    'metrics': metrics.collect(),
+                })
+                time.sleep(REPORT_INTERVAL)
+
+        threading.Thread(target=report_forever, name='report',
+                         daemon=True).start()
+
+
+def worker_main(index, workers, reports, argv):
+    """Точка входа рабочего процесса."""
+    import homework
+    from log_setup import setup_logging
+    from settings import LOG_JSON, LOG_LEVEL, LOG_POLL_SAMPLE
+    setup_logging(LOG_LEVEL, LOG_JSON, LOG_POLL_SAMPLE)
+    homework.main(homework.parse_args(argv),
+                  shard=Shard(index, workers, reports))
+
+
+def with_label(line, name, value):
+    """Строка значения метрики с дополнительной меткой name=value."""
+    series, _, sample = line.rpartition(' ')
+    label = f'{name}="{value}"'
+    if series.endswith('}'):
+        series = f'{series[:-1]},{label}}}'
+    else:
+        series = f'{series}{{{label}}}'
+    return f'{series} {sample}'
+
+
+def merge_metrics(reports):
+    """Метрики всех рабочих процессов с меткой worker в формате Prometheus."""
+    families = {}
+    for report in reports:
+        for name, kind, documentation, samples in report['metrics']:
+            family = families.setdefault(name, (kind, documentation, []))
+            family[2].extend(with_label(line, 'worker', report['index'])
+                             for line in samples)
+    lines = []
+    for name, (kind, documentation, samples) in families.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+    return lines
+
+
+class Supervisor:
+    """Запускает workers рабочих процессов и следит за ними.
+
+    Упавший процесс перезапускается с той же долей. SIGTTIN добавляет
+    рабочий процесс, SIGTTOU убирает: все процессы останавливаются с
+    сохранением состояния и запускаются с новым кольцом, переехавшие чаты
+    новый владелец читает из STATE_PATH. Отчёты процессов сводятся в
+    /metrics и /health на METRICS_PORT. С forward_profile SIGUSR1
+    пересылается всем рабочим процессам и запускает в них захват профиля.
+    """
+
+    def __init__(self, workers, argv=(), metrics_port=METRICS_PORT,
+                 forward_profile=False):
+        self.workers = workers
+        self.argv = list(argv)
+        self.metrics_port = metrics_port
+        self.forward_profile = forward_profile
+        self.context = multiprocessing.get_context('spawn')
+        self.reports = self.context.Queue()
+        self.restarts = 0
+        self._target = workers
+        self._processes = {}
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    def _start(self, index):
+        process = self.context.Process(
+            target=worker_main, name=f'worker-{index}',
+            args=(index, self.workers, self.reports, self.argv),
+        )
+        process.start()
+        self._processes[index] = process
+        logging.info('Запущен рабочий процесс %s/%s, pid %s.', index,
+                     self.workers, process.pid)
+
+    def start(self):
+        """Запускает рабочие процессы и приём отчётов."""
+        threading.Thread(target=self._collect, name='reports',
+                         daemon=True).start()
+        if self.metrics_port:
+            self._serve()
+        for index in range(self.workers):
+            self._start(index)
+        return self
+
+    def stop(self):
+        """Останавливает рабочие процессы, давая им сохранить состояние."""
+        processes = list(self._processes.values())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._processes = {}
+        with self._lock:
+            self._reports = {}
+
+    def resize(self, workers):
+        """Перезапускает процессы с новым числом долей."""
+        logging.info('Перераспределение чатов: %s -> %s рабочих процессов.',
+                     self.workers, workers)
+        self.stop()
+        self.workers = workers
+        for index in range(workers):
+            self._start(index)
+
+    def _collect(self):
+        while True:
+            try:
+                report = self.reports.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                process = self._processes.get(report['index'])
+                if process is not None and process.pid == report['pid']:
+                    self._reports[report['index']] = report
+
+    def health(self):
+        """Состояние рабочих процессов и общий признак здоровья."""
+        now = time.time()
+        with self._lock:
+            reports = dict(self._reports)
+        workers = []
+        for index, process in sorted(dict(self._processes).items()):
+            report = reports.get(index, {})
+            alive = process.is_alive()
+            fresh = now - report.get('time', 0) < REPORT_INTERVAL * 3
+            workers.append({
+                'index': index, 'pid': process.pid, 'alive': alive,
+                'reporting': fresh,
+                'subscribers': report.get('subscribers'),
+                'last_cycle': report.get('last_cycle'),
+            })
+        healthy = bool(workers) and all(
+            worker['alive'] and worker['reporting'] for worker in workers
+        )
+        return {'healthy': healthy, 'restarts': self.restarts,
+                'workers': workers}
+
+    def render_metrics(self):
+        """Сводные метрики в текстовом формате Prometheus."""
+        with self._lock:
+            reports = list(self._reports.values())
+        lines = merge_metrics(reports)
+        lines.append('# HELP homework_worker_up Рабочий процесс жив.')
+        lines.append('# TYPE homework_worker_up gauge')
+        lines.extend(
+            f'homework_worker_up{{worker="{index}"}} {int(process.is_alive())}'
+            for index, process in sorted(dict(self._processes).items())
+        )
+        lines.append('# HELP homework_worker_restarts_total '
+                     'Перезапуски упавших рабочих процессов.')
+        lines.append('# TYPE homework_worker_restarts_total counter')
+        lines.append(f'homework_worker_restarts_total {self.restarts}')
+        return '\n'.join(lines) + '\n'
+
+    def _serve(self):
+        supervisor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                """Не пишет каждый запрос в stderr."""
+
+            def do_GET(self):
+                """Сводные /metrics и /health рабочих процессов."""
+                if self.path == '/metrics':
+                    status = HTTPStatus.OK
+                    body = supervisor.render_metrics().encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/health':
+                    health = supervisor.health()
+                    status = (HTTPStatus.OK if health['healthy']
+                              else HTTPStatus.SERVICE_UNAVAILABLE)
+                    body = json.dumps(health).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(HTTPStatus.NOT_FOUND)
+                    return
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(('127.0.0.1', self.metrics_port),
+                                     Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics',
+                         daemon=True).start()
+        logging.info('Сводные метрики на http://127.0.0.1:%s/metrics',
+                     server.server_port)
+
+    def _forward(self, signum, frame):
+        for process in list(self._processes.values()):
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGTTIN:
+            self._target += 1
+        elif self._target > 1:
+            self._target -= 1
+
+    def run_forever(self):
+        """Следит за процессами, пока супервизор не остановят."""
+        signal.signal(signal.SIGTTIN, self._on_signal)
+        signal.signal(signal.SIGTTOU, self._on_signal)
+        if self.forward_profile:
+            signal.signal(signal.SIGUSR1, self._forward)
+        self.start()
+        try:
+            while True:
+                if self._target != self.workers:
+                    self.resize(self._target)
+                for index, process in list(self._processes.items()):
+                    if not process.is_alive():
+                        logging.error('Рабочий процесс %s завершился с кодом '
+                                      '%s, перезапуск.', index,
+                                      process.exitcode)
+                        self.restarts += 1
+                        self._start(index)
+                time.sleep(RESTART_DELAY)
+        finally:
+            self.stop()
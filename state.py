@@ -0,0 +1,334 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Сколько секунд ждать, пока другой процесс допишет свою транзакцию.
+BUSY_TIMEOUT = 30
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    key TEXT PRIMARY KEY,
+    timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS statuses (
+    key TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (key, homework)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id NOT NULL,
+    message TEXT NOT NULL,
+    created REAL NOT NULL,
+    sent REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (id) WHERE sent IS NULL;
+'''
+
+
+def token_key(token):
+    """Ключ подписчика в хранилище: токен в открытом виде не пишем."""
+    return hashlib.sha256(str(token).encode()).hexdigest()[:16]
+
+
+class Batch:
+    """Изменения состояния за один цикл опроса."""
+
+    __slots__ = ('cursors', 'statuses', 'removed', 'notifications', 'sent')
+
+    def __init__(self, notifications=(), sent=()):
+        self.cursors = []
+        self.statuses = []
+        self.removed = []
+        self.notifications = list(notifications)
+        self.sent = list(sent)
+
+    def __bool__(self):
+        return bool(self.cursors or self.statuses or self.removed
+                    or self.notifications or self.sent)
+
+
+class MemoryStateBackend:
+    """Хранилище состояния в памяти процесса: не переживает перезапуск.
+
+    Используется в тестах и при пустом STATE_PATH.
+    """
+
+    def __init__(self):
+        self._cursors = {}
+        self._statuses = {}
+        self._outbox = {}
+        self._next_id = 1
+
+    def load(self):
+        """Курсоры, статусы подписчиков и неотправленные уведомления."""
+        subscribers = {key: (timestamp, {})
+                       for key, timestamp in self._cursors.items()}
+        for (key, homework), status in self._statuses.items():
+            subscribers.setdefault(key, (None, {}))[1][homework] = status
+        pending = [(notification_id, chat_id, message)
+                   for notification_id, (chat_id, message, sent)
+                   in sorted(self._outbox.items()) if sent is None]
+        return subscribers, pending
+
+    def write(self, batch):
+        """Применяет batch и возвращает id новых уведомлений."""
+        self._cursors.update(batch.cursors)
+        for key, homework, status in batch.statuses:
+            self._statuses[key, homework] = status
+        for key, homework in batch.removed:
+            self._statuses.pop((key, homework), None)
+        now = time.time()
+        for notification_id in batch.sent:
+            chat_id, message, _ = self._outbox[notification_id]
+            self._outbox[notification_id] = (chat_id, message, now)
+        ids = []
+        for chat_id, message in batch.notifications:
+            ids.append(self._next_id)
+            self._outbox[self._next_id] = (chat_id, message, None)
+            self._next_id += 1
+        return ids
+
+    def close(self):
+        """Ничего не делает: закрывать нечего."""
+
+
+class SQLiteStateBackend:
+    """Хранилище состояния в базе SQLite в режиме WAL.
+
+    Каждый batch пишется одной транзакцией, то есть стоит одного fsync
+    журнала WAL на цикл опроса, а не на каждое сообщение. Таблица outbox -
+    журнал уведомлений: строка с пустым sent ещё не доставлена.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None,
+                                          timeout=BUSY_TIMEOUT)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=FULL')
+        self.connection.executescript(SCHEMA)
+
+    def load(self):
+        """Курсоры, статусы подписчиков и неотправленные уведомления."""
+        execute = self.connection.execute
+        subscribers = {
+            key: (timestamp, {}) for key, timestamp
+            in execute('SELECT key, timestamp FROM cursors')
+        }
+        for key, homework, status in execute(
+            'SELECT key, homework, status FROM statuses'
+        ):
+            subscribers.setdefault(key, (None, {}))[1][
+                json.loads(homework)] = status
+        pending = execute(
+            'SELECT id, chat_id, message FROM outbox WHERE sent IS NULL '
+            'ORDER BY id'
+        ).fetchall()
+        return subscribers, pending
+
+    def write(self, batch):
+        """Применяет batch одной транзакцией и возвращает id уведомлений."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cursors (key, timestamp) '
+                'VALUES (?, ?)', batch.cursors
+            )
+            connection.executemany(
+                'INSERT OR REPLACE INTO statuses (key, homework, status) '
+                'VALUES (?, ?, ?)',
+                [(key, json.dumps(homework), status)
+                 for key, homework, status in batch.statuses]
+            )
+            connection.executemany(
+                'DELETE FROM statuses WHERE key = ? AND homework = ?',
+                [(key, json.dumps(homework))
+                 for key, homework in batch.removed]
+            )
+            now = time.time()
+            connection.executemany(
+                'UPDATE outbox SET sent = ? WHERE id = ?',
+                [(now, notification_id) for notification_id in batch.sent]
+            )
+            ids = [
+                connection.execute(
+                    'INSERT INTO outbox (chat_id, message, created) '
+                    'VALUES (?, ?, ?)', (chat_id, message, now)
+                ).lastrowid
+                for chat_id, message in batch.notifications
+            ]
+            connection.execute('COMMIT')
+        except BaseException:
+            # SIGTERM может прийти уже после COMMIT: откатывать тогда
+            # нечего, а ошибка ROLLBACK скрыла бы SystemExit.
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        return ids
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        self.connection.close()
+
+
+def open_backend(path):
+    """Хранилище SQLite по пути path, а без него - хранилище в памяти."""
+    if not path:
+        return MemoryStateBackend()
+    return SQLiteStateBackend(path)
+
+
+class StateJournal:
+    """Журнал состояния бота поверх хранилища backend.
+
+    Опросы кладут сообщения в журнал, а не в очередь отправки. commit() в
+    конце цикла одной транзакцией сохраняет курсоры, статусы работ и
+    новые уведомления и только после этого отдаёт уведомления в
+    send_queue. Отправленные уведомления отмечаются в следующем commit().
+
+    Падение до commit() ничего не теряет: цикл повторяется с прежних
+    курсоров и статусов. Уведомления, сохранённые, но не отмеченные
+    отправленными, после перезапуска уходят повторно - дубль возможен,
+    только если процесс упал между ответом телеграма и ближайшим commit().
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.send_queue = None
+        self._lock = threading.Lock()
+        self._notifications = []
+        self._sent = []
+        self._pending = []
+        self._in_flight = {}
+
+    def restore(self, registry):
+        """Выставляет подписчикам сохранённые курсоры и статусы работ.
+
+        Недоставленные уведомления берутся только для чатов registry: с
+        одной базой могут работать несколько процессов, каждый со своими
+        чатами.
+        """
+        subscribers, self._pending = self.backend.load()
+        for subscriber in registry:
+            state = subscribers.get(token_key(subscriber.token))
+            if state is not None:
+                timestamp, statuses = state
+                if timestamp is not None:
+                    subscriber.timestamp = timestamp
+                subscriber.homeworks.restore(statuses)
+                registry.dirty.discard(subscriber.token)
+        chats = {chat_id for subscriber in registry
+                 for chat_id in subscriber.chats}
+        self._pending = [notification for notification in self._pending
+                         if notification[1] in chats]
+        if self._pending:
+            logging.info('Недоставленных уведомлений: %s',
+                         len(self._pending))
+        return self
+
+    def bind(self, send_queue):
+        """Подключает очередь отправки и отдаёт ей недоставленное."""
+        self.send_queue = send_queue
+        pending, self._pending = self._pending, []
+        self._release(pending)
+
+    def put(self, chat_id, message):
+        """Запоминает уведомление до commit()."""
+        with self._lock:
+            self._notifications.append((chat_id, message))
+
+    def put_many(self, chat_ids, message):
+        """Запоминает одно уведомление для нескольких чатов до commit()."""
+        with self._lock:
+            self._notifications.extend((chat_id, message)
+                                       for chat_id in chat_ids)
+
+    def sent(self, chat_id, messages):
+        """Отмечает доставленными уведомления чата из пачки messages.
+
+        Уведомления ищутся по тексту: в пачку попадают и сообщения,
+        отправленные мимо журнала, их отмечать нечем.
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(chat_id)
+            if not in_flight:
+                return
+            for message in messages:
+                ids = in_flight.get(message)
+                if ids:
+                    self._sent.append(ids.popleft())
+                    if not ids:
+                        del in_flight[message]
+            if not in_flight:
+                del self._in_flight[chat_id]
+
+    def _changes(self, registry, batch):
+        changed = []
+        while registry.dirty:
+            subscriber = registry.get(registry.dirty.pop())
+            if subscriber is None:
+                continue
+            key = token_key(subscriber.token)
+            changes = subscriber.homeworks.take_changes()
+            batch.cursors.append((key, subscriber.timestamp))
+            for homework, status in changes.items():
+                if status is None:
+                    batch.removed.append((key, homework))
+                else:
+                    batch.statuses.append((key, homework, status))
+            changed.append((subscriber, changes))
+        return changed
+
+    def _unwind(self, registry, batch, changed):
+        with self._lock:
+            self._notifications[:0] = batch.notifications
+            self._sent[:0] = batch.sent
+        for subscriber, changes in changed:
+            subscriber.homeworks.return_changes(changes)
+            registry.dirty.add(subscriber.token)
+
+    def commit(self, registry):
+        """Сохраняет изменения цикла одной транзакцией."""
+        with self._lock:
+            batch = Batch(self._notifications, self._sent)
+            self._notifications = []
+            self._sent = []
+        changed = self._changes(registry, batch)
+        if not batch:
+            return
+        try:
+            ids = self.backend.write(batch)
+        except sqlite3.Error as error:
+            logging.error('Не удалось сохранить состояние: %s', error,
+                          exc_info=True)
+            self._unwind(registry, batch, changed)
+            return
+        self._release([
+            (notification_id, chat_id, message) for notification_id,
+            (chat_id, message) in zip(ids, batch.notifications)
+        ])
+
+    def _release(self, notifications):
+        with self._lock:
+            for notification_id, chat_id, message in notifications:
+                self._in_flight.setdefault(chat_id, {}).setdefault(
+                    message, deque()
+                ).append(notification_id)
+        for _, chat_id, message in notifications:
+            self.send_queue.put(chat_id, message)
+
+    def close(self):
+        """Сохраняет отметки об отправке и закрывает хранилище."""
+        with self._lock:
+            batch = Batch(sent=self._sent)
+            self._sent = []
+        if batch:
+            self.backend.write(batch)
+        self.backend.close()
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from homework_state import HomeworkStates
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+_write_lock = threading.Lock()
+
+
+class Subscriber:
+    """Подписчик: токен Практикума, чаты в телеграме и состояние опроса.
+
+    Токен опрашивается один раз, вердикты рассылаются во все чаты chats.
+    chat_id - первый из них: по нему подписчик закрепляется за рабочим
+    процессом и группируются сообщения о сбоях.
+
+    mark() и advance() записывают токен в dirty - множество изменившихся
+    подписчиков реестра, которое читает журнал состояния.
+    """
+
+    __slots__ = ('token', 'chats', 'timestamp', 'homeworks', 'next_poll',
+                 'failures', 'dirty')
+
+    def __init__(self, token, chat_id, timestamp=None):
+        self.token = token
+        self.chats = (chat_id,)
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+        self.homeworks = HomeworkStates()
+        self.next_poll = 0.0
+        self.failures = 0
+        self.dirty = None
+
+    @property
+    def chat_id(self):
+        """Основной чат подписчика."""
+        return self.chats[0]
+
+    def advance(self, timestamp):
+        """Сдвигает курсор from_date на timestamp и чистит состояние работ."""
+        if timestamp != self.timestamp:
+            self.timestamp = timestamp
+            self.homeworks.advance()
+            self._touch()
+
+    def mark(self, key, status):
+        """Запоминает статус работы, о котором подписчик уведомлён."""
+        self.homeworks.mark(key, status)
+        self._touch()
+
+    def _touch(self):
+        if self.dirty is not None:
+            self.dirty.add(self.token)
+
+    def add_chat(self, chat_id):
+        """Добавляет чат в рассылку. False, если он уже в ней."""
+        if chat_id in self.chats:
+            return False
+        self.chats += (chat_id,)
+        return True
+
+    def __repr__(self):
+        return f'Subscriber(chats={self.chats!r})'
+
+
+class SubscriberRegistry:
+    """Реестр подписчиков: токен Практикума -> чаты в телеграме.
+
+    version растёт с каждым add(): по нему планировщик опросов замечает
+    новых подписчиков, не просматривая реестр на каждом цикле. dirty -
+    токены подписчиков, изменившихся с последнего сохранения состояния.
+    """
+
+    def __init__(self, subscribers=()):
+        self._subscribers = {}
+        self.version = 0
+        self.dirty = set()
+        for subscriber in subscribers:
+            self.add(subscriber)
+
+    @classmethod
+    def from_path(cls, path):
+        """Загружает реестр из .json файла или базы SQLite."""
+        path = Path(path)
+        if path.suffix in SQLITE_SUFFIXES:
+            pairs = _read_sqlite(path)
+        else:
+            pairs = _read_json(path)
+        registry = cls()
+        for token, chat_id in pairs:
+            registry.subscribe(token, chat_id)
+        return registry
+
+    def add(self, subscriber):
+        """Добавляет подписчика. Повторный токен заменяет прежнюю запись."""
+        self._subscribers[subscriber.token] = subscriber
+        subscriber.dirty = self.dirty
+        self.dirty.add(subscriber.token)
+        self.version += 1
+
+    def subscribe(self, token, chat_id):
+        """Подписывает чат на токен. False, если чат уже подписан.
+
+        На известный токен чат добавляется в рассылку того же подписчика,
+        и API по токену по-прежнему опрашивается один раз.
+        """
+        subscriber = self._subscribers.get(token)
+        if subscriber is None:
+            self.add(Subscriber(token, chat_id))
+            return True
+        return subscriber.add_chat(chat_id)
+
+    def get(self, token):
+        """Возвращает подписчика по токену или None."""
+        return self._subscribers.get(token)
+
+    def __iter__(self):
+        return iter(tuple(self._subscribers.values()))
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+def _read_json(path):
+    """Пары (токен, чат) из JSON: словарь или список объектов.
+
+    В словаре токену может соответствовать список чатов.
+    """
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        return ((token, chat_id) for token, chats in data.items()
+                for chat_id in (chats if isinstance(chats, list) else [chats]))
+    return ((item['token'], item['chat_id']) for item in data)
+
+
+def _read_sqlite(path):
+    """Пары (токен, чат) из таблицы subscribers базы SQLite."""
+    with closing(sqlite3.connect(path)) as connection:
+        return connection.execute(
+            'SELECT token, chat_id FROM subscribers'
+        ).fetchall()
+
+
+def save_subscriber(path, token, chat_id):
+    """Дописывает пару токен - чат в .json файл или базу SQLite реестра."""
+    path = Path(path)
+    with _write_lock:
+        if path.suffix in SQLITE_SUFFIXES:
+            _write_sqlite(path, token, chat_id)
+        else:
+            _write_json(path, token, chat_id)
+
+
+def _write_json(path, token, chat_id):
+    """Атомарно перезаписывает JSON реестра с новым подписчиком."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        data = []
+    if isinstance(data, dict):
+        chats = data.get(token, [])
+        chats = chats if isinstance(chats, list) else [chats]
+        if chat_id not in chats:
+            chats.append(chat_id)
+        data[token] = chats[0] if len(chats) == 1 else chats
+    elif {'token': token, 'chat_id': chat_id} not in data:
+        data.append({'token': token, 'chat_id': chat_id})
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_sqlite(path, token, chat_id):
+    """Записывает подписчика в таблицу subscribers базы SQLite."""
+    with closing(sqlite3.connect(path)) as connection, connection:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS subscribers (token, chat_id)'
+        )
+        connection.execute(
+            'DELETE FROM subscribers WHERE token = ? AND chat_id = ?',
+            (token, chat_id)
+        )
+        connection.execute('INSERT INTO subscribers VALUES (?, ?)',
+                           (token, chat_id))
@@ -1,9 +1,19 @@
 import sys
 from os.path import abspath, dirname
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture(autouse=True)
+def closed_breakers():
+    """Предохранители общие для процесса: каждый тест начинает с замкнутых."""
+    import breaker
+    breaker.PRACTICUM.reset()
+    breaker.TELEGRAM.reset()
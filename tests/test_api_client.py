@@ -0,0 +1,141 @@
+import json
+from functools import partial
+from http import HTTPStatus
+
+import homework
+from api_client import NOT_MODIFIED, PracticumClient, ResponseCache
+from error_digest import ErrorAggregator
+from subscribers import Subscriber
+from utils import FakeClock, ListQueue
+
+
+class TestPracticumClient:
+
+    def test_open_mounts_pooled_adapter(self):
+        with PracticumClient(pool_size=7, keep_alive=30) as client:
+            adapter = client.session.get_adapter(client.endpoint)
+            assert adapter._pool_maxsize == 7, (
+                'Проверьте, что размер пула соединений настраивается'
+            )
+            assert client.session.headers['Connection'] == 'keep-alive'
+        assert client.session is None, (
+            'Проверьте, что клиент закрывает сессию при выходе'
+        )
+
+    def test_idle_connections_closed(self):
+        clock = FakeClock()
+        client = PracticumClient(keep_alive=30, clock=clock).open()
+        closed = []
+        adapter = client.session.get_adapter(client.endpoint)
+        adapter.close = lambda: closed.append(clock.now)
+        client.session.get = lambda **kwargs: None
+        for clock.now in (10, 35, 70):
+            client.get(**client.request_params('token', 1))
+        assert closed == [70], (
+            'Проверьте, что соединения, простоявшие дольше keep_alive, '
+            'закрываются перед следующим запросом'
+        )
+
+    def test_session_reused_between_requests(self):
+        client = PracticumClient()
+        calls = []
+
+        class Session:
+            def get(self, **kwargs):
+                calls.append(kwargs)
+
+        client.session = Session()
+        client.get(**client.request_params('token', 1))
+        client.get(**client.request_params('token', 2))
+        assert [call['params']['from_date'] for call in calls] == [1, 2], (
+            'Проверьте, что все запросы идут через одну сессию'
+        )
+        assert calls[0]['headers']['Authorization'] == 'OAuth token'
+
+
+class Response:
+    def __init__(self, content, status_code=HTTPStatus.OK, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class TestResponseCache:
+
+    def test_conditional_headers_only_for_same_from_date(self):
+        cache = ResponseCache()
+        assert cache.conditional_headers('token', 1) == {}
+        cache.unchanged('token', 1, {'ETag': '"v1"'}, b'{}')
+        assert cache.conditional_headers('token', 1) == {
+            'If-None-Match': '"v1"'
+        }, 'Проверьте, что повторный запрос отправляет ETag'
+        assert cache.conditional_headers('token', 2) == {}, (
+            'Проверьте, что валидаторы не переносятся на другой from_date'
+        )
+
+    def test_current_date_ignored_when_comparing(self):
+        cache = ResponseCache()
+        first = b'{"homeworks": [], "current_date": 100}'
+        second = b'{"homeworks": [], "current_date": 200}'
+        assert not cache.unchanged('token', 1, {}, first)
+        assert cache.unchanged('token', 1, {}, second), (
+            'Проверьте, что ответ, отличающийся только current_date, '
+            'считается неизменившимся'
+        )
+        assert not cache.unchanged('token', 1, {}, b'{"homeworks": [1]}')
+
+    def test_decode_skips_unchanged_responses(self):
+        client = PracticumClient(use_cache=True).open()
+        body = b'{"homeworks": [], "current_date": 1}'
+        try:
+            assert client.decode('token', 1, Response(body)) == {
+                'homeworks': [], 'current_date': 1
+            }
+            assert client.decode('token', 1, Response(body)) is NOT_MODIFIED
+            assert client.decode(
+                'token', 1, Response(b'', HTTPStatus.NOT_MODIFIED)
+            ) is NOT_MODIFIED, 'Проверьте обработку ответа 304'
+        finally:
+            client.close()
+
+    def test_entries_limited(self):
+        cache = ResponseCache(size=2)
+        for token in ('a', 'b', 'a', 'c'):
+            cache.unchanged(token, 1, {'ETag': token}, b'{}')
+        assert len(cache) == 2
+        assert cache.conditional_headers('b', 1) == {}, (
+            'Проверьте, что вытесняется токен, который дольше всех не '
+            'опрашивали'
+        )
+        assert cache.conditional_headers('a', 1) == {'If-None-Match': 'a'}
+
+    def test_failed_response_not_cached(self, monkeypatch):
+        body = json.dumps({'homeworks': [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            {'id': 2, 'status': 'approved'},
+        ], 'current_date': 5}).encode()
+
+        class Session:
+            def get(self, **kwargs):
+                return Response(body)
+
+        client = PracticumClient(use_cache=True)
+        client.session = Session()
+        client.cache = ResponseCache()
+        monkeypatch.setattr(homework, 'api_client', client)
+        subscriber = Subscriber('token', 1, timestamp=0)
+        errors = ErrorAggregator()
+        queue = ListQueue()
+        for _ in range(2):
+            error = homework.handle_answer(
+                queue, errors, subscriber,
+                partial(homework.fetch_answer, subscriber)
+            )
+            assert error is not None, (
+                'Проверьте, что ответ, который не удалось разобрать, не '
+                'считается неизменившимся при следующем опросе'
+            )
+        assert not any('восстановлена' in message for _, message in queue)
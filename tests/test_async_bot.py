@@ -0,0 +1,112 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from telegram.error import BadRequest, NetworkError, Unauthorized
+
+import async_bot
+from api_client import ResponseCache
+from error_digest import ErrorAggregator
+from notifier import Outbox, is_transient
+from policy import FixedPolicy
+from scheduler import PollScheduler
+from subscribers import Subscriber, SubscriberRegistry
+from utils import ListQueue
+
+
+async def run_against_stub(registry, sent):
+    async def homework_statuses(request):
+        await asyncio.sleep(0.05)
+        return web.json_response({
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 1,
+        })
+
+    async def send_message(request):
+        sent.append(await request.json())
+        return web.json_response({'ok': True})
+
+    app = web.Application()
+    app.router.add_get('/api/', homework_statuses)
+    app.router.add_post('/bot{token}/sendMessage', send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    async_bot.ENDPOINT = f'http://127.0.0.1:{port}/api/'
+    async_bot.TELEGRAM_SEND_URL = (
+        f'http://127.0.0.1:{port}/bot{{token}}/sendMessage'
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            send_queue = async_bot.AsyncSendQueue(
+                session, 'bot', Outbox(rate=100, chat_rate=1)
+            )
+            sender = asyncio.create_task(send_queue.run())
+            poller = async_bot.AsyncPoller(session, send_queue,
+                                           ErrorAggregator())
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await async_bot.run_cycle(PollScheduler(registry), poller.poll,
+                                      10, FixedPolicy())
+            elapsed = loop.time() - started
+            while send_queue.outbox or len(sent) < len(registry):
+                await asyncio.sleep(0.01)
+            sender.cancel()
+            return elapsed
+    finally:
+        await runner.cleanup()
+
+
+class TestAsyncBot:
+
+    def test_cycle_overlaps_requests(self, monkeypatch):
+        monkeypatch.setattr(async_bot, 'ENDPOINT', async_bot.ENDPOINT)
+        monkeypatch.setattr(async_bot, 'TELEGRAM_SEND_URL',
+                            async_bot.TELEGRAM_SEND_URL)
+        registry = SubscriberRegistry(
+            Subscriber(str(i), i) for i in range(10)
+        )
+        sent = []
+        elapsed = asyncio.run(run_against_stub(registry, sent))
+        assert sorted(item['chat_id'] for item in sent) == list(range(10)), (
+            'Проверьте, что асинхронный цикл отправляет вердикт каждому чату'
+        )
+        assert elapsed < 0.05 * 5, (
+            'Проверьте, что запросы к API выполняются параллельно'
+        )
+
+    @pytest.mark.parametrize('status, error_type, transient', [
+        (502, NetworkError, True),
+        (403, Unauthorized, False),
+        (400, BadRequest, False),
+    ])
+    def test_telegram_error_types(self, status, error_type, transient):
+        error = async_bot.telegram_error(status, 'описание')
+        assert type(error) is error_type
+        assert is_transient(error) is transient, (
+            'Проверьте, что повторяются только ответы телеграма 5xx'
+        )
+
+    def test_failure_handled_like_sync_mode(self, monkeypatch):
+        async def get_api_answer(session, token, timestamp, cache=None):
+            raise ConnectionError('API недоступен')
+
+        monkeypatch.setattr(async_bot, 'get_api_answer', get_api_answer)
+        cache = ResponseCache()
+        cache.unchanged('token', 0, {}, b'{}')
+        queue = ListQueue()
+        registry = SubscriberRegistry()
+        for chat_id in (1, 2):
+            registry.subscribe('token', chat_id)
+        poller = async_bot.AsyncPoller(None, queue, ErrorAggregator(), cache)
+        error = asyncio.run(poller.poll(registry.get('token')))
+        assert isinstance(error, ConnectionError)
+        assert [chats for chats, _ in queue] == [(1,)], (
+            'Проверьте, что о сбое узнаёт только владелец токена'
+        )
+        assert len(cache) == 0, (
+            'Проверьте, что при сбое ответ забывается в кеше поллера'
+        )
@@ -0,0 +1,126 @@
+import threading
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import breaker
+import homework
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exceptions import CircuitOpenError
+from notifier import Outbox, SendQueue
+from utils import FakeClock
+
+
+class FakeResponse:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return {'homeworks': [], 'current_date': 1}
+
+
+def trip(circuit):
+    for _ in range(circuit.threshold):
+        circuit.before()
+        circuit.record(True)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_failures(self):
+        clock = FakeClock()
+        circuit = CircuitBreaker('api', 3, 30, clock)
+        for _ in range(2):
+            circuit.before()
+            circuit.record(True)
+        circuit.before()
+        circuit.record(False)
+        assert circuit.state == CLOSED, (
+            'Проверьте, что успех обнуляет счётчик неудач'
+        )
+        trip(circuit)
+        assert circuit.state == OPEN
+        clock.now = 10
+        with pytest.raises(CircuitOpenError) as error:
+            circuit.before()
+        assert error.value.retry_after == 20, (
+            'Проверьте, что отказ сообщает, сколько ждать до пробного запроса'
+        )
+
+    def test_half_open_lets_single_probe_through(self):
+        clock = FakeClock()
+        circuit = CircuitBreaker('api', 2, 30, clock)
+        trip(circuit)
+        clock.now = 30
+        circuit.before()
+        assert circuit.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            circuit.before()
+        circuit.record(True)
+        assert circuit.state == OPEN, (
+            'Проверьте, что неудачная проба снова размыкает цепь'
+        )
+        clock.now = 60
+        circuit.before()
+        circuit.record(False)
+        assert circuit.state == CLOSED
+        circuit.before()
+
+    def test_zero_threshold_disables_breaker(self):
+        circuit = CircuitBreaker('api', 0, 30)
+        for _ in range(10):
+            circuit.before()
+            circuit.record(True)
+        assert circuit.state == CLOSED
+
+
+class TestBreakerIntegration:
+
+    def test_api_outage_fails_fast(self, monkeypatch):
+        calls = []
+
+        def dead_endpoint(**kwargs):
+            calls.append(kwargs)
+            raise requests.ConnectionError('connection refused')
+
+        monkeypatch.setattr(requests, 'get', dead_endpoint)
+        for _ in range(breaker.PRACTICUM.threshold):
+            with pytest.raises(ConnectionError):
+                homework.get_api_answer_for('token', 0)
+        with pytest.raises(CircuitOpenError):
+            homework.get_api_answer_for('token', 0)
+        assert len(calls) == breaker.PRACTICUM.threshold, (
+            'Проверьте, что при разомкнутой цепи запрос к API не отправляется'
+        )
+
+    def test_client_errors_do_not_open_circuit(self, monkeypatch):
+        monkeypatch.setattr(requests, 'get',
+                            lambda **kwargs: FakeResponse(HTTPStatus.FORBIDDEN))
+        for _ in range(breaker.PRACTICUM.threshold * 2):
+            with pytest.raises(ConnectionError):
+                homework.get_api_answer_for('token', 0)
+        assert breaker.PRACTICUM.state == CLOSED, (
+            'Проверьте, что ошибки конкретного токена не размыкают цепь'
+        )
+
+    def test_open_circuit_requeues_messages(self):
+        delivered = []
+        attempted = threading.Event()
+
+        def send(chat_id, message):
+            attempted.set()
+            raise CircuitOpenError('телеграм недоступен', retry_after=60)
+
+        queue = SendQueue(send, Outbox(),
+                          on_sent=lambda *args: delivered.append(args))
+        queue.start()
+        queue.put(1, 'сообщение')
+        assert attempted.wait(5)
+        queue.stop(timeout=0.5)
+        assert delivered == [], (
+            'Проверьте, что при разомкнутой цепи сообщение не теряется'
+        )
+        assert len(queue.outbox) == 1
@@ -0,0 +1,73 @@
+import json
+from types import SimpleNamespace
+
+import requests
+
+from commands import CommandHandlers
+from subscribers import Subscriber, SubscriberRegistry
+
+
+def make_update(chat_id, replies):
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        message=SimpleNamespace(reply_text=replies.append),
+    )
+
+
+class TestCommandHandlers:
+
+    def test_status_answers_from_known_state(self, monkeypatch):
+        def no_requests(*args, **kwargs):
+            raise AssertionError('/status не должен обращаться к API')
+
+        monkeypatch.setattr(requests, 'get', no_requests)
+        subscriber = Subscriber('token', 1)
+        subscriber.homeworks.mark(1, 'approved')
+        subscriber.homeworks.mark(2, 'reviewing')
+        replies = []
+        CommandHandlers(SubscriberRegistry([subscriber]), None).status(
+            make_update(1, replies), SimpleNamespace(args=[])
+        )
+        assert 'Работ: 2' in replies[0], (
+            'Проверьте, что /status отвечает по сохранённым статусам'
+        )
+        assert 'на проверке - 1' in replies[0]
+
+    def test_subscribe_adds_to_registry_and_file(self, tmp_path):
+        path = tmp_path / 'subscribers.json'
+        registry = SubscriberRegistry()
+        handlers = CommandHandlers(registry, path)
+        replies = []
+        handlers.subscribe(make_update(5, replies),
+                           SimpleNamespace(args=['secret']))
+        assert registry.get('secret').chat_id == 5, (
+            'Проверьте, что /subscribe добавляет подписчика в реестр'
+        )
+        assert json.loads(path.read_text()) == [
+            {'token': 'secret', 'chat_id': 5}
+        ], 'Проверьте, что подписка сохраняется в файл реестра'
+        restarted = SubscriberRegistry.from_path(path)
+        assert restarted.get('secret').chat_id == 5
+
+    def test_second_chat_joins_shared_token(self, tmp_path):
+        path = tmp_path / 'subscribers.db'
+        registry = SubscriberRegistry()
+        handlers = CommandHandlers(registry, path)
+        replies = []
+        for chat_id in (5, 6, 6):
+            handlers.subscribe(make_update(chat_id, replies),
+                               SimpleNamespace(args=['cohort']))
+        assert len(registry) == 1
+        assert registry.get('cohort').chats == (5, 6), (
+            'Проверьте, что второй чат добавляется в рассылку токена'
+        )
+        assert replies[-1] == 'Вы уже подписаны на этот токен.'
+        assert SubscriberRegistry.from_path(path).get('cohort').chats == (5, 6)
+
+    def test_subscribe_requires_token(self, tmp_path):
+        registry = SubscriberRegistry()
+        replies = []
+        CommandHandlers(registry, tmp_path / 'subscribers.db').subscribe(
+            make_update(5, replies), SimpleNamespace(args=[])
+        )
+        assert len(registry) == 0 and replies
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import decoder
+from decoder import Homework, decode_answer
+from homework import check_response, parse_status
+from homework_state import HomeworkStates
+
+BODY = json.dumps({
+    'homeworks': [
+        {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing',
+         'date_updated': '2022-02-13T14:40:57Z', 'lesson_name': 'Урок'},
+        {'id': 1, 'status': 'approved'},
+    ],
+    'current_date': 1000,
+}).encode()
+
+
+class TestDecoder:
+
+    @pytest.mark.parametrize('name', ['json', 'auto'])
+    def test_homeworks_become_records(self, name):
+        _, loads = decoder.select_loads(name)
+        answer = decode_answer(BODY, loads)
+        record, broken = check_response(answer)
+        assert isinstance(record, Homework), (
+            'Проверьте, что работы из ответа становятся записями Homework'
+        )
+        assert record == Homework('hw2', 'reviewing', 2,
+                                  '2022-02-13T14:40:57Z')
+        assert record.updated == 1644763257
+        assert isinstance(broken, dict), (
+            'Проверьте, что некорректная работа остаётся словарём'
+        )
+        with pytest.raises(KeyError):
+            parse_status(broken)
+
+    def test_record_works_with_dict_based_code(self):
+        record = Homework('hw', 'approved', 7)
+        assert parse_status(record) == parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}
+        )
+        states = HomeworkStates()
+        [(key, _)] = states.changes([record])
+        assert key == 7 and record['status'] == 'approved'
+
+    def test_unknown_decoder_rejected(self):
+        with pytest.raises(ValueError):
+            decoder.select_loads('yaml')
@@ -0,0 +1,40 @@
+from error_digest import MAX_INCIDENTS, ErrorAggregator, error_signature
+from utils import FakeClock
+
+
+class TestErrorAggregator:
+
+    def test_signature_ignores_volatile_parts(self):
+        assert (error_signature(ConnectionError('timeout after 10.5 s'))
+                == error_signature(ConnectionError('timeout after 9.1  s'))), (
+            'Проверьте, что сбои с разными числами в тексте группируются'
+        )
+
+    def test_first_failure_then_summary_then_recovery(self):
+        clock = FakeClock()
+        errors = ErrorAggregator(interval=3600, clock=clock)
+        assert errors.failure(1, ConnectionError('API 1 недоступен'))
+        for minute in range(1, 6):
+            clock.now = minute * 600
+            message = errors.failure(1, ConnectionError('API 2 недоступен'))
+            assert message is None, (
+                'Проверьте, что повторы сбоя не отправляются до сводки'
+            )
+        clock.now = 3600
+        summary = errors.failure(1, ConnectionError('API 3 недоступен'))
+        assert summary and 'ещё 6' in summary, (
+            'Проверьте, что после интервала отправляется сводка'
+        )
+        recovery = errors.success(1)
+        assert recovery and '7' in recovery
+        assert errors.success(1) is None, (
+            'Проверьте, что сообщение о восстановлении отправляется один раз'
+        )
+
+    def test_incidents_per_chat_limited(self):
+        errors = ErrorAggregator(interval=60, clock=FakeClock())
+        for index in range(MAX_INCIDENTS + 5):
+            errors.failure(1, KeyError(f'поле_{"x" * index}'))
+        assert len(errors._incidents[1]) == MAX_INCIDENTS, (
+            'Проверьте, что число запоминаемых сбоев чата ограничено'
+        )
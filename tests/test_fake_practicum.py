@@ -0,0 +1,57 @@
+import threading
+
+import homework
+from api_client import PracticumClient
+from error_digest import ErrorAggregator
+from subscribers import Subscriber
+from tools import fake_practicum
+from utils import FakeClock, ListQueue
+
+
+class TestFakePracticum:
+
+    def test_pipeline_against_stub(self, monkeypatch):
+        simulation = fake_practicum.Simulation(homeworks=2,
+                                               transition_rate=1000)
+        server = fake_practicum.make_server(simulation)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = (f'http://127.0.0.1:{server.server_port}'
+                    f'{fake_practicum.API_PATH}')
+        monkeypatch.setattr(homework, 'api_client',
+                            PracticumClient(endpoint=endpoint))
+        subscriber = Subscriber('token', 1, timestamp=0)
+        queue = ListQueue()
+        try:
+            homework.poll_subscriber(queue, ErrorAggregator(), subscriber)
+            error = homework.poll_subscriber(queue, ErrorAggregator(),
+                                             subscriber)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert error is None, (
+            'Проверьте, что заглушка отвечает в формате API Практикума'
+        )
+        assert len(subscriber.homeworks) == 2
+        assert all(message.startswith('Изменился статус проверки работы')
+                   for _, message in queue)
+        assert simulation.stats()['polls'] == 2
+
+    def test_latency_includes_poll_delay(self, monkeypatch):
+        simulation = fake_practicum.Simulation(homeworks=20,
+                                               transition_rate=1, seed=1)
+        clock = FakeClock()
+        clock.now = 100.0
+        monkeypatch.setattr(fake_practicum.time, 'time', clock)
+        simulation.answer('token', 0)
+        clock.now = 110.0
+        answer = simulation.answer('token', 100)
+        assert answer['homeworks'], 'Проверьте, что работы меняют статус'
+        for item in answer['homeworks']:
+            simulation.delivered(f'"{item["homework_name"]}"')
+        latencies = simulation.stats()['latencies']
+        assert len(latencies) == len(answer['homeworks'])
+        assert all(0 <= latency <= 10 for latency in latencies)
+        assert sum(latencies) / len(latencies) > 1, (
+            'Проверьте, что время смены статуса разыгрывается между '
+            'опросами, а не совпадает с моментом опроса'
+        )
@@ -0,0 +1,76 @@
+from homework_state import HomeworkStates
+from subscribers import Subscriber
+
+
+class TestHomeworkStates:
+
+    def test_all_transitions_in_one_response(self):
+        states = HomeworkStates()
+        homeworks = [
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ]
+        changes = states.changes(homeworks)
+        assert [key for key, _ in changes] == [1, 2], (
+            'Проверьте, что в ответе обрабатываются все работы, '
+            'начиная со старой'
+        )
+        for key, homework in changes:
+            states.mark(key, homework['status'])
+        assert states.changes(homeworks) == [], (
+            'Проверьте, что уже отправленный статус не отправляется повторно'
+        )
+
+    def test_unmarked_change_is_emitted_again(self):
+        states = HomeworkStates()
+        homework = {'homework_name': 'hw', 'status': 'rejected'}
+        assert states.changes([homework]) == [('hw', homework)]
+        assert states.changes([homework]) == [('hw', homework)], (
+            'Проверьте, что неотправленный переход не теряется'
+        )
+
+    def test_approved_homeworks_trimmed_after_cursor_moves(self):
+        subscriber = Subscriber('token', 1, timestamp=0)
+        homeworks = [
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ]
+        for key, homework in subscriber.homeworks.changes(homeworks):
+            subscriber.homeworks.mark(key, homework['status'])
+        subscriber.advance(100)
+        assert subscriber.homeworks.changes(homeworks) == [], (
+            'Проверьте, что повтор прежнего ответа не шлёт вердикт заново'
+        )
+        subscriber.advance(100)
+        subscriber.advance(200)
+        assert len(subscriber.homeworks) == 1, (
+            'Проверьте, что принятая работа вычищается из состояния'
+        )
+        assert subscriber.homeworks.counts() == {'reviewing': 1,
+                                                 'approved': 1}, (
+            'Проверьте, что /status по-прежнему учитывает принятые работы'
+        )
+
+    def test_table_size_limited(self):
+        states = HomeworkStates(limit=2)
+        for key in (1, 2, 1, 3):
+            states.mark(key, 'reviewing')
+        assert states.snapshot() == {1: 'reviewing', 3: 'reviewing'}, (
+            'Проверьте, что вытесняется работа, которая дольше всех не '
+            'менялась'
+        )
+
+    def test_changes_tracked_until_taken(self):
+        states = HomeworkStates(limit=2)
+        for key in (1, 2, 3):
+            states.mark(key, 'reviewing')
+        assert states.take_changes() == {1: None, 2: 'reviewing',
+                                         3: 'reviewing'}, (
+            'Проверьте, что вытесненная работа записывается как удалённая'
+        )
+        assert states.take_changes() == {}
+        states.mark(2, 'approved')
+        states.return_changes({2: 'reviewing', 3: 'reviewing'})
+        assert states.take_changes() == {2: 'approved', 3: 'reviewing'}, (
+            'Проверьте, что возвращённые изменения не затирают новые'
+        )
@@ -0,0 +1,69 @@
+import io
+import json
+import logging
+
+from log_setup import POLL_LOGGER, setup_logging
+
+
+class TestLogSetup:
+
+    def teardown_method(self):
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        logging.getLogger(POLL_LOGGER).setLevel(logging.NOTSET)
+
+    def test_json_lines_through_queue(self):
+        stream = io.StringIO()
+        listener = setup_logging('INFO', json_format=True, stream=stream)
+        logging.getLogger('test').info('опрос %s', 42)
+        listener.stop()
+        entry = json.loads(stream.getvalue())
+        assert entry['message'] == 'опрос 42', (
+            'Проверьте, что запись форматируется в JSON строку'
+        )
+
+    def test_traceback_not_kept_in_queue(self, monkeypatch):
+        stream = io.StringIO()
+        listener = setup_logging('INFO', json_format=True, stream=stream)
+        queued = []
+        handler = logging.getLogger().handlers[0]
+        monkeypatch.setattr(handler, 'enqueue', queued.append)
+        try:
+            raise KeyError('homeworks')
+        except KeyError:
+            logging.getLogger('test').error('Сбой', exc_info=True)
+        listener.stop()
+        [record] = queued
+        assert record.exc_info is None, (
+            'Проверьте, что запись в очереди не держит traceback'
+        )
+        listener.handlers[0].handle(record)
+        assert 'KeyError' in json.loads(stream.getvalue())['exc_info']
+
+    def test_poll_logs_can_be_silenced(self):
+        stream = io.StringIO()
+        listener = setup_logging('INFO', poll_sample=0, stream=stream)
+        logging.getLogger(POLL_LOGGER).info('Запрос к API.')
+        logging.getLogger('test').error('Сбой')
+        listener.stop()
+        assert 'Запрос к API.' not in stream.getvalue(), (
+            'Проверьте, что LOG_POLL_SAMPLE=0 отключает сообщения опроса'
+        )
+        assert 'Сбой' in stream.getvalue()
+
+    def test_arguments_formatted_lazily(self):
+        calls = []
+
+        class Spy:
+            def __str__(self):
+                calls.append(1)
+                return 'spy'
+
+        stream = io.StringIO()
+        listener = setup_logging('WARNING', stream=stream)
+        logging.getLogger(POLL_LOGGER).info('%s', Spy())
+        listener.stop()
+        assert not calls, (
+            'Проверьте, что отфильтрованные записи не форматируются'
+        )
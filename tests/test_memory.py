@@ -0,0 +1,43 @@
+import logging
+import tracemalloc
+
+from memory import MemoryReporter, rss_bytes
+from utils import FakeClock
+
+
+def allocate():
+    return [bytearray(1024) for _ in range(512)]
+
+
+class TestMemoryReporter:
+
+    def test_rss_reported(self):
+        assert rss_bytes() > 0
+
+    def test_report_on_interval(self, caplog):
+        clock = FakeClock()
+        reporter = MemoryReporter(interval=60, trace_frames=0, clock=clock)
+        with caplog.at_level(logging.INFO):
+            reporter.cycle_done()
+            assert not caplog.records, (
+                'Проверьте, что отчёт пишется не чаще interval'
+            )
+            clock.now = 60
+            reporter.cycle_done()
+        assert 'Память процесса' in caplog.text
+
+    def test_top_allocations_with_growth(self):
+        was_tracing = tracemalloc.is_tracing()
+        reporter = MemoryReporter(interval=60, trace_frames=1, top=5).start()
+        try:
+            reporter.top_allocations()
+            kept = allocate()
+            rows = reporter.top_allocations()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+        place, size, growth, count = rows[0]
+        assert 'test_memory.py' in place, (
+            'Проверьте, что отчёт показывает место выделения памяти'
+        )
+        assert growth >= 512 * 1024 and count >= len(kept)
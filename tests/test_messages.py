@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+import homework
+import messages
+from commands import status_text
+from exceptions import NotExpectedHwStatusError
+from messages import Catalogue
+from subscribers import Subscriber, SubscriberRegistry
+from utils import ListQueue
+
+
+def write_catalogue(tmp_path, data):
+    path = tmp_path / 'messages.json'
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+class TestCatalogue:
+
+    def test_default_text_rendered_once(self):
+        catalogue = Catalogue()
+        first = catalogue.render('approved', 'hw.zip')
+        assert first == (
+            'Изменился статус проверки работы "hw.zip". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!'
+        )
+        assert catalogue.render('approved', 'hw.zip') is first, (
+            'Проверьте, что готовый текст берётся из кеша'
+        )
+        assert catalogue.render.cache_info().hits == 1
+
+    def test_statuses_configured_in_file(self, tmp_path):
+        path = write_catalogue(tmp_path, {
+            'locales': {
+                'ru': {'verdicts': {'pending': 'Работа ждёт ревьюера.'},
+                       'labels': {'pending': 'ждёт ревьюера'}},
+            },
+        })
+        catalogue = Catalogue.load(path)
+        assert catalogue.render('pending', 'hw').endswith(
+            'Работа ждёт ревьюера.'
+        ), 'Проверьте, что статус из файла каталога известен боту'
+        assert catalogue.render('pending', 'hw', 'en').endswith(
+            'Работа ждёт ревьюера.'
+        ), 'Проверьте, что вердикт без перевода берётся из локали по умолчанию'
+        assert catalogue.label('pending') == 'ждёт ревьюера'
+        with pytest.raises(NotExpectedHwStatusError):
+            catalogue.render('unknown', 'hw')
+
+    @pytest.mark.parametrize('fmt, expected', [
+        ('HTML', 'Review status of <b>a_b&lt;c&gt;</b> has changed. '
+                 'The reviewer liked everything. Hooray!'),
+        ('MarkdownV2', 'Review status of *a\\_b<c\\>* has changed\\. '
+                       'The reviewer liked everything\\. Hooray\\!'),
+    ])
+    def test_markup_escapes_name_and_verdict(self, fmt, expected):
+        catalogue = Catalogue(fmt=fmt)
+        assert catalogue.render('approved', 'a_b<c>', 'en') == expected
+        assert catalogue.parse_mode == fmt
+
+    def test_plain_template_escaped_for_markup(self, tmp_path):
+        path = write_catalogue(tmp_path, {
+            'locales': {'en': {'template': '{name} (v2): {verdict}',
+                               'templates': {'MarkdownV2': None}}},
+        })
+        catalogue = Catalogue.load(path, fmt='MarkdownV2')
+        assert catalogue.render('reviewing', 'hw', 'en') == (
+            'hw \\(v2\\): The reviewer has started the review\\.'
+        )
+
+    def test_unknown_status_falls_back(self):
+        catalogue = Catalogue(fmt='MarkdownV2')
+        assert catalogue.text('pending', 'hw_1') == (
+            'Изменился статус проверки работы "hw\\_1": pending\\.'
+        ), 'Проверьте общий текст для статуса не из каталога'
+        assert catalogue.text('approved', 'hw') == catalogue.render(
+            'approved', 'hw'
+        )
+
+    def test_invalid_template_rejected_at_load(self, tmp_path):
+        path = write_catalogue(tmp_path, {
+            'locales': {'ru': {'template': '{name} {homework.id}'}},
+        })
+        with pytest.raises(ValueError):
+            Catalogue.load(path)
+
+
+class TestLocales:
+
+    def test_verdict_rendered_once_per_locale(self, monkeypatch):
+        monkeypatch.setattr(messages, 'CATALOGUE',
+                            Catalogue(chat_locales={2: 'en', 3: 'en'}))
+        registry = SubscriberRegistry()
+        for chat_id in (1, 2, 3, 4):
+            registry.subscribe('cohort', chat_id)
+        queue = ListQueue()
+        homework.process_response(queue, registry.get('cohort'), {
+            'homeworks': [{'id': 1, 'homework_name': 'hw',
+                           'status': 'rejected'}],
+            'current_date': 1,
+        })
+        assert queue == [
+            ((1, 4), homework.parse_status({'homework_name': 'hw',
+                                            'status': 'rejected'})),
+            ((2, 3), 'Review status of "hw" has changed. '
+                     'The reviewer has left some comments.'),
+        ], 'Проверьте, что чаты получают вердикт в своей локали'
+
+    def test_status_labels_localized(self, monkeypatch):
+        monkeypatch.setattr(messages, 'CATALOGUE', Catalogue())
+        subscriber = Subscriber('token', 1)
+        subscriber.homeworks.mark(1, 'approved')
+        assert '(approved - 1)' in status_text([subscriber], 'en')
+        assert '(принято - 1)' in status_text([subscriber])
+
+    def test_unknown_status_does_not_stop_processing(self, monkeypatch):
+        monkeypatch.setattr(messages, 'CATALOGUE',
+                            Catalogue(chat_locales={2: 'en'}))
+        registry = SubscriberRegistry()
+        for chat_id in (1, 2):
+            registry.subscribe('cohort', chat_id)
+        subscriber = registry.get('cohort')
+        queue = ListQueue()
+        homework.process_response(queue, subscriber, {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'new', 'status': 'pending'},
+                {'id': 2, 'homework_name': 'old', 'status': 'approved'},
+            ],
+            'current_date': 7,
+        })
+        assert {
+            ((1,), 'Изменился статус проверки работы "new": pending.'),
+            ((2,), 'Review status of "new" has changed: pending.'),
+        } < set(queue), (
+            'Проверьте, что о неизвестном статусе сообщается общим текстом'
+        )
+        assert len(queue) == 4, (
+            'Проверьте, что остальные работы ответа тоже разбираются'
+        )
+        assert subscriber.timestamp == 7, (
+            'Проверьте, что курсор сдвигается несмотря на неизвестный статус'
+        )
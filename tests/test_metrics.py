@@ -0,0 +1,31 @@
+from urllib.request import urlopen
+
+import metrics
+
+
+class TestMetrics:
+
+    def test_disabled_metrics_record_nothing(self, monkeypatch):
+        monkeypatch.setattr(metrics, '_enabled', False)
+        histogram = metrics.Histogram('test_disabled_seconds', 'Тест.')
+        histogram.observe(1)
+        assert 'test_disabled_seconds_count 0' in histogram.render(), (
+            'Проверьте, что выключенные метрики ничего не накапливают'
+        )
+
+    def test_exporter_serves_prometheus_text(self, monkeypatch):
+        monkeypatch.setattr(metrics, '_enabled', False)
+        server = metrics.start_server(0)
+        try:
+            metrics.API_LATENCY.observe(0.02)
+            metrics.ERRORS.inc('ConnectionError')
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            with urlopen(url) as response:
+                text = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'homework_api_request_seconds_bucket{le="0.025"}' in text, (
+            'Проверьте, что гистограммы отдаются в формате Prometheus'
+        )
+        assert 'homework_errors_total{exception="ConnectionError"}' in text
@@ -0,0 +1,200 @@
+import threading
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+import notifier
+from notifier import BUCKET_SWEEP_INTERVAL, Outbox, SendQueue
+from utils import FakeClock
+
+
+class TestOutbox:
+
+    def test_messages_for_busy_chat_are_coalesced(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=10, chat_rate=1, clock=clock)
+        outbox.put(1, 'первое')
+        assert outbox.take() == ((1, ['первое']), 0)
+        outbox.done(1)
+        outbox.put(1, 'второе')
+        outbox.put(1, 'третье')
+        item, wait = outbox.take()
+        assert item is None and wait == 1, (
+            'Проверьте, что в один чат уходит не больше chat_rate '
+            'сообщений в секунду'
+        )
+        clock.now = 1
+        assert outbox.take() == ((1, ['второе', 'третье']), 0), (
+            'Проверьте, что накопившиеся сообщения чата склеиваются'
+        )
+
+    def test_one_batch_per_chat_in_flight(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=10, chat_rate=10, clock=clock)
+        outbox.put(1, 'первое')
+        outbox.take()
+        outbox.put(1, 'второе')
+        clock.now = 1
+        assert outbox.take() == (None, None), (
+            'Проверьте, что следующая пачка чата не отдаётся, пока '
+            'предыдущая не отправлена'
+        )
+        outbox.done(1)
+        assert outbox.take() == ((1, ['второе']), 0)
+        outbox.requeue(1, ['второе'], delay=0)
+        clock.now = 2
+        assert outbox.take() == ((1, ['второе']), 0), (
+            'Проверьте, что requeue() возвращает чат в очередь'
+        )
+
+    def test_global_rate_limit(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=2, chat_rate=1, clock=clock)
+        for chat_id in range(3):
+            outbox.put(chat_id, 'сообщение')
+        taken = [outbox.take()[0] for _ in range(3)]
+        assert taken[2] is None, (
+            'Проверьте, что общий лимит ограничивает все чаты вместе'
+        )
+
+    def test_fractional_rate_still_sends(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=25 / 32, chat_rate=1, clock=clock)
+        outbox.put(1, 'сообщение')
+        outbox.put(2, 'сообщение')
+        assert outbox.take()[0] == (1, ['сообщение'])
+        item, wait = outbox.take()
+        assert item is None and wait == 32 / 25
+        clock.now = wait
+        assert outbox.take()[0] == (2, ['сообщение']), (
+            'Проверьте, что общий лимит меньше одного сообщения в секунду '
+            'не останавливает отправку'
+        )
+
+    def test_retry_after_requeues(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=10, chat_rate=10, clock=clock)
+        outbox.put(1, 'сообщение')
+        (chat_id, messages), _ = outbox.take()
+        outbox.requeue(chat_id, messages, delay=5)
+        assert outbox.take() == (None, 5)
+        clock.now = 5
+        assert outbox.take() == ((1, ['сообщение']), 0)
+
+    def test_idle_chat_buckets_forgotten(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=100, chat_rate=1, clock=clock)
+        for chat_id in range(10):
+            outbox.put(chat_id, 'сообщение')
+            outbox.take()
+        clock.now = BUCKET_SWEEP_INTERVAL
+        outbox.put(42, 'сообщение')
+        outbox.take()
+        assert list(outbox._chats) == [42], (
+            'Проверьте, что вёдра давно не писавших чатов забываются'
+        )
+
+    def test_retry_backs_off(self):
+        clock = FakeClock()
+        outbox = Outbox(rate=10, chat_rate=10, clock=clock)
+        delays = [outbox.retry(1, ['сообщение']) for _ in range(3)]
+        assert delays == [1, 2, 4], (
+            'Проверьте, что пауза перед повтором растёт с каждой неудачей'
+        )
+        outbox.done(1)
+        assert outbox.retry(1, ['сообщение']) == 1
+
+
+class TestSendQueue:
+
+    def test_put_does_not_wait_for_telegram(self):
+        release = threading.Event()
+        sent = []
+        attempts = []
+
+        def send(chat_id, text):
+            attempts.append(text)
+            if len(attempts) == 1:
+                raise RetryAfter(0.01)
+            release.wait(1)
+            sent.append((chat_id, text))
+
+        queue = SendQueue(send).start()
+        queue.put(1, 'сообщение')
+        queue.put(2, 'сообщение')
+        release.set()
+        queue.stop(timeout=2)
+        assert sorted(sent) == [(1, 'сообщение'), (2, 'сообщение')], (
+            'Проверьте, что после RetryAfter сообщение отправляется повторно'
+        )
+
+    def test_on_sent_called_after_delivery_only(self):
+        done = []
+
+        def send(chat_id, text):
+            if not done and chat_id == 1 and text == 'первое':
+                done.append(None)
+                raise RetryAfter(0.01)
+
+        queue = SendQueue(send, on_sent=lambda chat_id, messages: done.append(
+            (chat_id, messages)
+        )).start()
+        queue.put(1, 'первое')
+        queue.stop(timeout=2)
+        assert done == [None, (1, ['первое'])], (
+            'Проверьте, что on_sent вызывается только после отправки'
+        )
+
+    def test_unexpected_errors_do_not_stop_thread(self):
+        sent = []
+
+        def send(chat_id, text):
+            if text == 'первое':
+                raise ValueError('сбой')
+            sent.append((chat_id, text))
+
+        def on_sent(chat_id, messages):
+            raise KeyError(chat_id)
+
+        queue = SendQueue(send, Outbox(chat_rate=100), on_sent=on_sent)
+        queue.put(1, 'первое')
+        queue.put(2, 'второе')
+        queue.start()
+        queue.put(1, 'третье')
+        queue.stop(timeout=2)
+        assert not queue._thread.is_alive()
+        assert sorted(sent) == [(1, 'третье'), (2, 'второе')], (
+            'Проверьте, что ошибки send и on_sent пишутся в лог, а поток '
+            'отправки продолжает работу'
+        )
+
+    @pytest.mark.parametrize('error, attempts, sent', [
+        (TimedOut(), 2, [(1, ['сообщение'])]),
+        (NetworkError('Bad Gateway'), 2, [(1, ['сообщение'])]),
+        (BadRequest('Chat not found'), 1, [(1, ['сообщение'])]),
+    ])
+    def test_transient_errors_retried(self, monkeypatch, error, attempts,
+                                      sent):
+        monkeypatch.setattr(notifier, 'SEND_RETRY_DELAY', 0.01)
+        tries = []
+        done = []
+
+        def send(chat_id, text):
+            tries.append(text)
+            if len(tries) == 1:
+                raise error
+
+        queue = SendQueue(send, Outbox(chat_rate=100),
+                          on_sent=lambda chat_id, messages: done.append(
+                              (chat_id, messages)
+                          )).start()
+        queue.put(1, 'сообщение')
+        queue.stop(timeout=2)
+        assert len(tries) == attempts, (
+            'Проверьте, что отправка повторяется после сетевой ошибки и '
+            'таймаута, но не после BadRequest'
+        )
+        assert done == sent, (
+            'Проверьте, что on_sent вызывается после отправки или '
+            'окончательной ошибки'
+        )
@@ -0,0 +1,72 @@
+import exceptions as exptns
+from engine import PollingEngine
+from policy import AdaptivePolicy, parse_retry_after
+from subscribers import Subscriber, SubscriberRegistry
+from utils import FakeClock
+
+
+class TestAdaptivePolicy:
+
+    def make_policy(self):
+        return AdaptivePolicy(base=600, active=60, min_backoff=10,
+                              max_backoff=100, jitter=0, rand=lambda: 1.0)
+
+    def test_backoff_grows_and_resets(self):
+        policy = self.make_policy()
+        subscriber = Subscriber('token', 1)
+        delays = [policy.next_delay(subscriber, ConnectionError('нет сети'))
+                  for _ in range(6)]
+        assert delays == [10, 20, 40, 80, 100, 100], (
+            'Проверьте, что при сбоях пауза растёт экспоненциально '
+            'до max_backoff'
+        )
+        assert policy.next_delay(subscriber) == 600
+        assert subscriber.failures == 0, (
+            'Проверьте, что после успешного опроса счётчик сбоев сброшен'
+        )
+
+    def test_timeout_backs_off(self):
+        policy = self.make_policy()
+        subscriber = Subscriber('token', 1)
+        delays = [policy.next_delay(subscriber, TimeoutError('таймаут'))
+                  for _ in range(2)]
+        assert delays == [10, 20], (
+            'Проверьте, что запрос, не уложившийся в таймаут пула, тоже '
+            'увеличивает паузу'
+        )
+
+    def test_reviewing_homework_polls_faster(self):
+        policy = self.make_policy()
+        subscriber = Subscriber('token', 1)
+        subscriber.homeworks.mark(1, 'reviewing')
+        assert policy.next_delay(subscriber) == 60, (
+            'Проверьте, что пока работа на ревью, опрос идёт чаще'
+        )
+
+    def test_retry_after_is_honoured(self):
+        policy = self.make_policy()
+        error = ConnectionError('429')
+        error.__cause__ = exptns.NotOkResponseError('429', retry_after=900)
+        assert policy.next_delay(Subscriber('token', 1), error) == 900
+        assert parse_retry_after('120', now=0) == 120
+        assert parse_retry_after('Thu, 01 Jan 1970 00:01:00 GMT', 0) == 60
+
+    def test_engine_schedules_with_fake_clock(self):
+        clock = FakeClock()
+        registry = SubscriberRegistry([Subscriber('token', 1)])
+        polls = []
+
+        def poll(subscriber):
+            polls.append(clock.now)
+            return ConnectionError('нет сети') if len(polls) < 3 else None
+
+        engine = PollingEngine(registry, poll, 1, self.make_policy(),
+                               clock=clock, sleep=clock.sleep)
+        for _ in range(20):
+            engine.run_cycle()
+            clock.sleep(engine.time_to_next_poll())
+        engine.shutdown()
+        assert polls[:4] == [0, 10, 30, 630], (
+            'Проверьте, что движок опрашивает подписчика по расписанию '
+            'политики'
+        )
@@ -0,0 +1,226 @@
+import threading
+import time
+from functools import partial
+
+import homework
+from api_client import PracticumClient, ResponseCache
+from engine import FetchPoolEngine
+from error_digest import ErrorAggregator
+from notifier import Outbox, SendQueue
+from policy import FixedPolicy
+from pools import MonitoredPool
+from subscribers import Subscriber, SubscriberRegistry
+from utils import ListQueue
+
+
+class TestMonitoredPool:
+
+    def test_submit_waits_for_free_worker(self):
+        pool = MonitoredPool('test', 2)
+        release = threading.Event()
+        running = []
+
+        def task():
+            running.append(1)
+            release.wait(5)
+
+        pool.submit(task)
+        pool.submit(task)
+        third = threading.Thread(target=pool.submit, args=(task,))
+        third.start()
+        third.join(0.2)
+        assert third.is_alive(), (
+            'Проверьте, что пул не принимает задач больше, чем потоков'
+        )
+        release.set()
+        third.join(5)
+        pool.shutdown()
+        assert len(running) == 3
+
+    def test_utilisation(self):
+        pool = MonitoredPool('test', 2)
+        pool.utilisation()
+        futures = [pool.submit(time.sleep, 0.2) for _ in range(2)]
+        for future in futures:
+            future.result()
+        assert pool.utilisation() > 0.8, (
+            'Проверьте, что занятые всё время потоки дают загрузку около 1'
+        )
+        time.sleep(0.1)
+        assert pool.utilisation() == 0
+        pool.shutdown()
+
+
+class TestFetchPoolEngine:
+
+    def make_registry(self, count):
+        return SubscriberRegistry([Subscriber(f'token{index}', index,
+                                              timestamp=0)
+                                   for index in range(count)])
+
+    def test_answers_handled_in_loop_thread(self):
+        registry = self.make_registry(5)
+        threads = set()
+        handled = []
+
+        def fetch(subscriber):
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return subscriber.token
+
+        def handle(subscriber, answer):
+            assert threading.get_ident() == threading.main_thread().ident
+            handled.append(answer())
+
+        engine = FetchPoolEngine(registry, fetch, handle,
+                                 MonitoredPool('fetch', 5), FixedPolicy(), 5)
+        started = time.monotonic()
+        engine.run_cycle()
+        elapsed = time.monotonic() - started
+        engine.shutdown()
+        assert sorted(handled) == sorted(s.token for s in registry)
+        assert elapsed < 0.2, (
+            'Проверьте, что запросы к API выполняются параллельно'
+        )
+        assert threading.main_thread().ident not in threads
+
+    def test_slow_fetch_does_not_hold_back_others(self):
+        registry = self.make_registry(8)
+        finished = {}
+
+        def fetch(subscriber):
+            time.sleep(0.5 if subscriber.token == 'token0' else 0.05)
+            return subscriber.token
+
+        def handle(subscriber, answer):
+            finished[answer()] = time.monotonic() - started
+
+        engine = FetchPoolEngine(registry, fetch, handle,
+                                 MonitoredPool('fetch', 4), FixedPolicy(), 5)
+        started = time.monotonic()
+        engine.run_cycle()
+        engine.shutdown()
+        assert len(finished) == 8
+        assert max(finished[f'token{index}'] for index in range(1, 8)) < 0.4, (
+            'Проверьте, что освободившийся поток сразу берёт следующего '
+            'подписчика, не дожидаясь самого медленного запроса'
+        )
+
+    def test_slow_fetch_times_out(self):
+        registry = self.make_registry(2)
+        release = threading.Event()
+
+        def fetch(subscriber):
+            if subscriber.token == 'token1':
+                release.wait(5)
+            return {'homeworks': [], 'current_date': 1}
+
+        queue = ListQueue()
+        errors = []
+
+        def handle(subscriber, answer):
+            error = homework.handle_answer(queue, ErrorAggregator(),
+                                           subscriber, answer)
+            errors.append((subscriber.token, type(error)))
+            return error
+
+        engine = FetchPoolEngine(registry, fetch, handle,
+                                 MonitoredPool('fetch', 2), FixedPolicy(),
+                                 timeout=0.2)
+        engine.run_cycle()
+        release.set()
+        engine.shutdown()
+        assert sorted(errors) == [('token0', type(None)),
+                                  ('token1', TimeoutError)], (
+            'Проверьте, что опрос, не уложившийся в таймаут, считается '
+            'неудачным, а остальные разбираются как обычно'
+        )
+        assert queue and queue[0][0] == (1,), (
+            'Проверьте, что о таймауте сообщается в чат подписчика'
+        )
+
+    def test_late_fetch_does_not_touch_cache(self, monkeypatch):
+        release = threading.Event()
+        finished = threading.Event()
+
+        class Response:
+            status_code = 200
+            headers = {}
+            content = b'{"homeworks": [], "current_date": 1}'
+
+        class Session:
+            def get(self, headers, **kwargs):
+                if 'token1' in headers['Authorization']:
+                    release.wait(5)
+                    finished.set()
+                return Response()
+
+        client = PracticumClient(use_cache=True)
+        client.session = Session()
+        client.cache = ResponseCache()
+        monkeypatch.setattr(homework, 'api_client', client)
+        engine = FetchPoolEngine(
+            self.make_registry(2), homework.fetch_response,
+            partial(homework.handle_fetched, ListQueue(), ErrorAggregator()),
+            MonitoredPool('fetch', 2), FixedPolicy(), timeout=0.2
+        )
+        engine.run_cycle()
+        release.set()
+        finished.wait(5)
+        engine.shutdown()
+        assert len(client.cache) == 1, (
+            'Проверьте, что ответ, пришедший после таймаута, не попадает '
+            'в кеш: сверка с кешем идёт в потоке цикла'
+        )
+
+
+class TestPooledSendQueue:
+
+    def test_sends_run_in_parallel(self):
+        delivered = []
+        lock = threading.Lock()
+
+        def send(chat_id, message):
+            time.sleep(0.1)
+            with lock:
+                delivered.append(chat_id)
+
+        queue = SendQueue(send, Outbox(rate=100, chat_rate=100),
+                          pool=MonitoredPool('send', 4))
+        queue.start()
+        started = time.monotonic()
+        for chat_id in range(8):
+            queue.put(chat_id, 'сообщение')
+        while len(delivered) < 8 and time.monotonic() - started < 5:
+            time.sleep(0.01)
+        elapsed = time.monotonic() - started
+        queue.stop(timeout=5)
+        assert sorted(delivered) == list(range(8))
+        assert elapsed < 0.6, (
+            'Проверьте, что сообщения отправляются несколькими потоками'
+        )
+
+    def test_chat_batches_not_sent_concurrently(self):
+        sent = []
+        active = []
+
+        def send(chat_id, message):
+            active.append(message)
+            overlap = len(active)
+            time.sleep(0.05)
+            active.remove(message)
+            sent.append((message, overlap))
+
+        queue = SendQueue(send, Outbox(rate=100, chat_rate=100),
+                          pool=MonitoredPool('send', 4))
+        queue.start()
+        for index in range(4):
+            queue.put(1, f'сообщение {index}')
+            time.sleep(0.02)
+        queue.stop(timeout=5)
+        assert '\n\n'.join(message for message, _ in sent) == '\n\n'.join(
+            f'сообщение {index}' for index in range(4)
+        ), 'Проверьте, что сообщения одного чата уходят по порядку'
+        assert max(overlap for _, overlap in sent) == 1, (
+            'Проверьте, что у чата не больше одной пачки в отправке'
+        )
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import pstats
+import signal
+import threading
+import types
+
+from profiling import Profiler
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+async def busy_async(n):
+    await asyncio.sleep(0)
+    return busy(n)
+
+
+def make_module(profiler):
+    module = types.SimpleNamespace(busy=busy, busy_async=busy_async)
+    profiler.instrument(module, ('busy', 'busy_async'))
+    return module
+
+
+class TestProfiler:
+
+    def test_wrapped_functions_idle_without_capture(self, tmp_path):
+        profiler = Profiler('sample', cycles=1, directory=tmp_path)
+        module = make_module(profiler)
+        assert module.busy(10) == busy(10)
+        assert asyncio.run(module.busy_async(10)) == busy(10)
+        assert profiler.timers.summary() == {}, (
+            'Проверьте, что без захвата вызовы не замеряются'
+        )
+        assert list(tmp_path.iterdir()) == []
+
+    def test_sample_capture_writes_speedscope(self, tmp_path):
+        profiler = Profiler('sample', cycles=2, directory=tmp_path,
+                            interval=0.001)
+        module = make_module(profiler)
+        profiler.start()
+        worker = threading.Thread(target=module.busy, args=(300000,))
+        worker.start()
+        worker.join()
+        asyncio.run(module.busy_async(10))
+        profiler.cycle_done()
+        assert profiler.active, (
+            'Проверьте, что захват длится заданное число циклов'
+        )
+        profiler.cycle_done()
+        assert not profiler.active
+
+        [path] = tmp_path.glob('*.speedscope.json')
+        with open(path) as file:
+            profile = json.load(file)
+        frames = [frame['name'] for frame in profile['shared']['frames']]
+        assert 'busy' in frames, (
+            'Проверьте, что выборка снимает стеки других потоков'
+        )
+        assert all(len(sampled['samples']) == len(sampled['weights'])
+                   for sampled in profile['profiles'])
+        [timers_path] = tmp_path.glob('*.timers.json')
+        with open(timers_path) as file:
+            timers = json.load(file)
+        assert timers['busy']['calls'] == 1
+        assert timers['busy_async']['calls'] == 1
+
+    def test_cprofile_capture_covers_other_threads(self, tmp_path):
+        profiler = Profiler('cprofile', cycles=1, directory=tmp_path)
+        module = make_module(profiler)
+        profiler.start()
+        worker = threading.Thread(target=module.busy, args=(1000,))
+        worker.start()
+        worker.join()
+        path = profiler.stop()
+        functions = {function for _, _, function
+                     in pstats.Stats(path).stats}
+        assert 'busy' in functions, (
+            'Проверьте, что cprofile учитывает вызовы в других потоках'
+        )
+
+    def test_signal_starts_capture_at_cycle_end(self, tmp_path):
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            profiler = Profiler('sample', cycles=1,
+                                directory=tmp_path).arm()
+            os.kill(os.getpid(), signal.SIGUSR1)
+            assert not profiler.active, (
+                'Проверьте, что захват начинается на границе цикла'
+            )
+            profiler.cycle_done()
+            assert profiler.active
+            profiler.cycle_done()
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert list(tmp_path.glob('*.speedscope.json'))
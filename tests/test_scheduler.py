@@ -0,0 +1,68 @@
+from collections import Counter
+
+from scheduler import PollScheduler
+from subscribers import Subscriber, SubscriberRegistry
+from utils import FakeClock
+
+
+class TestPollScheduler:
+
+    def test_first_polls_spread_over_stagger(self):
+        clock = FakeClock()
+        registry = SubscriberRegistry(
+            Subscriber(f'token{index}', index) for index in range(600)
+        )
+        scheduler = PollScheduler(registry, stagger=600, clock=clock)
+        clock.now = 600
+        due = scheduler.pop_due()
+        assert len(due) == 600
+        per_minute = Counter(int(scheduled // 60) for _, scheduled in due)
+        assert max(per_minute.values()) < 100, (
+            'Проверьте, что первые опросы равномерно разнесены по окну'
+        )
+
+    def test_polls_within_window_share_a_cycle(self):
+        clock = FakeClock()
+        registry = SubscriberRegistry(
+            Subscriber(f'token{index}', index) for index in range(600)
+        )
+        scheduler = PollScheduler(registry, stagger=600, clock=clock,
+                                  window=10)
+        cycles = []
+        while clock.now < 600:
+            cycles.append(len(scheduler.pop_due()))
+            clock.now += scheduler.time_to_next()
+        cycles.append(len(scheduler.pop_due()))
+        assert sum(cycles) == 600
+        assert len(cycles) <= 62, (
+            'Проверьте, что опросы, наступившие за window секунд, '
+            'выполняются одним циклом'
+        )
+
+    def test_reschedule_keeps_offset_and_reports_drift(self):
+        clock = FakeClock()
+        subscriber = Subscriber('token', 1)
+        registry = SubscriberRegistry([subscriber])
+        scheduler = PollScheduler(registry, stagger=0, clock=clock)
+        [(_, scheduled)] = scheduler.pop_due()
+        clock.now = 3
+        scheduler.started(scheduled)
+        scheduler.reschedule(subscriber, scheduled, 600)
+        assert subscriber.next_poll == 600, (
+            'Проверьте, что следующий опрос отсчитывается от расписания'
+        )
+        assert scheduler.time_to_next() == 60
+        assert scheduler.drift() == {'polls': 1, 'mean': 3, 'max': 3}, (
+            'Проверьте, что планировщик сообщает отставание от расписания'
+        )
+
+    def test_new_subscribers_are_picked_up(self):
+        clock = FakeClock()
+        registry = SubscriberRegistry()
+        scheduler = PollScheduler(registry, clock=clock)
+        assert scheduler.pop_due() == []
+        registry.add(Subscriber('token', 1))
+        assert [sub.token for sub, _ in scheduler.pop_due()] == ['token'], (
+            'Проверьте, что добавленный подписчик попадает в расписание'
+        )
+        assert scheduler.pop_due() == []
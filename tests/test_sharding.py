@@ -0,0 +1,48 @@
+from sharding import HashRing, Shard, merge_metrics, with_label
+from subscribers import Subscriber, SubscriberRegistry
+
+
+class TestHashRing:
+
+    def test_adding_node_moves_only_its_share(self):
+        keys = range(10000)
+        before = HashRing(range(4))
+        after = HashRing(range(5))
+        moved = [key for key in keys
+                 if before.node_for(key) != after.node_for(key)]
+        assert all(after.node_for(key) == 4 for key in moved), (
+            'Проверьте, что при добавлении узла ключи переходят только к нему'
+        )
+        assert len(moved) < len(keys) * 0.3, (
+            'Проверьте, что переезжает примерно 1/N ключей'
+        )
+
+    def test_shards_partition_chats(self):
+        registry = SubscriberRegistry(
+            Subscriber(f'token{index}', index) for index in range(100)
+        )
+        shards = [Shard(index, 3).select(registry) for index in range(3)]
+        chats = sorted(subscriber.chat_id for shard in shards
+                       for subscriber in shard)
+        assert chats == list(range(100)), (
+            'Проверьте, что каждый чат достаётся ровно одному процессу'
+        )
+        assert all(len(shard) for shard in shards)
+
+
+class TestMergeMetrics:
+
+    def test_worker_label_added(self):
+        assert with_label('polls 3', 'worker', 1) == 'polls{worker="1"} 3'
+        assert with_label('errors{exception="E"} 2', 'worker', 0) == (
+            'errors{exception="E",worker="0"} 2'
+        )
+
+    def test_families_merged(self):
+        family = ('polls', 'counter', 'Опросы.', ['polls 1'])
+        lines = merge_metrics([{'index': 0, 'metrics': [family]},
+                               {'index': 1, 'metrics': [family]}])
+        assert lines == ['# HELP polls Опросы.', '# TYPE polls counter',
+                         'polls{worker="0"} 1', 'polls{worker="1"} 1'], (
+            'Проверьте, что описание метрики выводится один раз'
+        )
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+NETWORK_MODULES = ('telegram', 'requests', 'aiohttp')
+RUN_CHECK = '''
+import runpy
+import sys
+sys.argv = ['homework.py', '--check']
+try:
+    runpy.run_path('homework.py', run_name='__main__')
+except SystemExit as error:
+    print('exit', error.code)
+print('loaded', *[name for name in {modules!r} if name in sys.modules])
+'''
+
+
+def run_python(code, **env):
+    environ = {key: value for key, value in os.environ.items()
+               if key not in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
+                              'TELEGRAM_CHAT_ID', 'SUBSCRIBERS_PATH')}
+    environ['HOMEWORK_ENV_LOADED'] = '1'
+    environ.update(env)
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=environ,
+                          capture_output=True, text=True, timeout=60).stdout
+
+
+class TestStartup:
+
+    def test_settings_read_lazily(self):
+        output = run_python(
+            'import sys, settings\n'
+            'print(\'dotenv\' in sys.modules)\n'
+            'from settings import TELEGRAM_TOKEN\n'
+            'print(\'dotenv\' in sys.modules, TELEGRAM_TOKEN)',
+            TELEGRAM_TOKEN='1:abc', HOMEWORK_ENV_LOADED='',
+        )
+        assert output.split() == ['False', 'True', '1:abc'], (
+            'Проверьте, что settings читает окружение при первом обращении, '
+            'а не при импорте'
+        )
+
+    def test_check_skips_network_stacks(self, tmp_path):
+        output = run_python(
+            RUN_CHECK.format(modules=NETWORK_MODULES),
+            PRACTICUM_TOKEN='token', TELEGRAM_TOKEN='1:abc',
+            TELEGRAM_CHAT_ID='1', STATE_PATH=str(tmp_path / 'state.db'),
+        )
+        assert 'Настройки в порядке.' in output
+        assert 'exit 0' in output, (
+            'Проверьте, что --check с верными настройками выходит с кодом 0'
+        )
+        assert output.splitlines()[-1] == 'loaded', (
+            'Проверьте, что --check не импортирует сетевые библиотеки'
+        )
+        assert not (tmp_path / 'state.db').exists(), (
+            'Проверьте, что --check не создаёт базу состояния'
+        )
+
+    def test_check_reports_problems(self):
+        output = run_python(RUN_CHECK.format(modules=NETWORK_MODULES),
+                            TELEGRAM_TOKEN='token', POLL_POLICY='random',
+                            MESSAGE_FORMAT='bbcode', MIN_BACKOFF='15s',
+                            LOG_LEVEL='verbose', JSON_DECODER='yaml')
+        assert 'exit 1' in output, (
+            'Проверьте, что --check с ошибками завершается с кодом 1'
+        )
+        for problem in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN не похож',
+                        'POLL_POLICY', 'MESSAGE_FORMAT',
+                        "MIN_BACKOFF='15s' не число", "LOG_LEVEL='verbose'",
+                        "JSON_DECODER='yaml'"):
+            assert problem in output, (
+                f'Проверьте, что --check сообщает об ошибке {problem}'
+            )
+
+    def test_check_rejects_rate_below_one_per_worker(self, monkeypatch):
+        import homework
+        monkeypatch.setattr(homework, 'TELEGRAM_RATE', 25)
+        assert not any('--workers' in problem
+                       for problem in homework.config_problems(25))
+        assert any('--workers 26' in problem
+                   for problem in homework.config_problems(26)), (
+            'Проверьте, что --check сообщает, если на рабочий процесс '
+            'приходится меньше одного сообщения в секунду'
+        )
@@ -0,0 +1,155 @@
+import sqlite3
+
+import pytest
+
+from homework import process_response
+from state import (MemoryStateBackend, SQLiteStateBackend, StateJournal,
+                   token_key)
+from subscribers import Subscriber, SubscriberRegistry
+from utils import ListQueue
+
+RESPONSE = {
+    'homeworks': [{'id': 7, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 42,
+}
+
+
+def start(backend):
+    registry = SubscriberRegistry([Subscriber('token', 1, timestamp=10)])
+    journal = StateJournal(backend).restore(registry)
+    queue = ListQueue()
+    journal.bind(queue)
+    return registry, journal, queue
+
+
+class InterruptedAfterCommit:
+    """Соединение, в котором SIGTERM приходит сразу после COMMIT."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def execute(self, sql, *args):
+        cursor = self.connection.execute(sql, *args)
+        if sql == 'COMMIT':
+            raise SystemExit(0)
+        return cursor
+
+
+class TestStateJournal:
+
+    def test_messages_released_only_after_commit(self):
+        registry, journal, queue = start(MemoryStateBackend())
+        process_response(journal, registry.get('token'), RESPONSE)
+        assert queue == [], (
+            'Проверьте, что уведомление не уходит до сохранения состояния'
+        )
+        journal.commit(registry)
+        assert len(queue) == 1
+
+    def test_sent_marks_notifications_of_batch(self):
+        registry, journal, queue = start(MemoryStateBackend())
+        journal.put(1, 'первое')
+        journal.put(1, 'второе')
+        journal.commit(registry)
+        journal.sent(1, ['не из журнала', 'второе'])
+        journal.commit(registry)
+        assert journal.backend.load()[1] == [(1, 1, 'первое')], (
+            'Проверьте, что отмечаются уведомления из отправленной пачки, '
+            'а не первые в очереди чата'
+        )
+
+    def test_only_changed_subscribers_written(self):
+        registry, journal, queue = start(MemoryStateBackend())
+        registry.add(Subscriber('other', 2, timestamp=10))
+        journal.commit(registry)
+        batches = []
+        write = journal.backend.write
+        journal.backend.write = lambda batch: batches.append(batch) or write(
+            batch
+        )
+        process_response(journal, registry.get('token'), RESPONSE)
+        journal.commit(registry)
+        journal.commit(registry)
+        assert len(batches) == 1, (
+            'Проверьте, что без изменений commit() ничего не пишет'
+        )
+        assert len(batches[0].cursors) == 1, (
+            'Проверьте, что пишутся только изменившиеся подписчики'
+        )
+        assert batches[0].statuses == [(batches[0].cursors[0][0], 7,
+                                        'approved')]
+
+    def test_failed_write_keeps_changes(self):
+        registry, journal, queue = start(MemoryStateBackend())
+        write = journal.backend.write
+
+        def fail(batch):
+            raise sqlite3.OperationalError('database is locked')
+
+        journal.backend.write = fail
+        process_response(journal, registry.get('token'), RESPONSE)
+        journal.commit(registry)
+        journal.backend.write = write
+        journal.commit(registry)
+        subscribers, _ = journal.backend.load()
+        assert list(subscribers.values()) == [(42, {7: 'approved'})], (
+            'Проверьте, что изменения, которые не удалось сохранить, '
+            'пишутся при следующем commit()'
+        )
+        assert len(queue) == 1
+
+    def test_restart_resends_only_undelivered(self, tmp_path):
+        path = tmp_path / 'state.db'
+        registry, journal, queue = start(SQLiteStateBackend(path))
+        process_response(journal, registry.get('token'), RESPONSE)
+        journal.commit(registry)
+        journal.backend.close()
+
+        registry, journal, queue = start(SQLiteStateBackend(path))
+        subscriber = registry.get('token')
+        assert subscriber.timestamp == 42, (
+            'Проверьте, что после перезапуска курсор читается из базы'
+        )
+        assert subscriber.homeworks.get(7) == 'approved', (
+            'Проверьте, что после перезапуска восстанавливаются статусы'
+        )
+        assert len(queue) == 1, (
+            'Проверьте, что недоставленное уведомление отправляется снова'
+        )
+        process_response(journal, subscriber, RESPONSE)
+        journal.sent(1, [queue[0][1]])
+        journal.close()
+
+        registry, journal, queue = start(SQLiteStateBackend(path))
+        assert queue == [], (
+            'Проверьте, что доставленное уведомление не отправляется повторно'
+        )
+
+    def test_exit_after_commit_not_swallowed(self, tmp_path):
+        backend = SQLiteStateBackend(tmp_path / 'state.db')
+        registry, journal, queue = start(backend)
+        process_response(journal, registry.get('token'), RESPONSE)
+        backend.connection = InterruptedAfterCommit(backend.connection)
+        with pytest.raises(SystemExit):
+            journal.commit(registry)
+        subscribers, _ = backend.load()
+        assert subscribers == {token_key('token'): (42, {7: 'approved'})}, (
+            'Проверьте, что сохранённое до остановки не теряется'
+        )
+
+    def test_crash_before_commit_loses_nothing(self, tmp_path):
+        path = tmp_path / 'state.db'
+        registry, journal, queue = start(SQLiteStateBackend(path))
+        process_response(journal, registry.get('token'), RESPONSE)
+        journal.backend.close()
+
+        registry, journal, queue = start(SQLiteStateBackend(path))
+        assert registry.get('token').timestamp == 10
+        process_response(journal, registry.get('token'), RESPONSE)
+        journal.commit(registry)
+        assert len(queue) == 1, (
+            'Проверьте, что после падения до commit() вердикт не теряется'
+        )
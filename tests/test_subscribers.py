@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+from functools import partial
+
+import homework
+from error_digest import ErrorAggregator
+from engine import PollingEngine
+from policy import FixedPolicy
+from subscribers import Subscriber, SubscriberRegistry, save_subscriber
+from utils import ListQueue
+
+
+class TestSubscribers:
+
+    def test_registry_from_json(self, tmp_path):
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2},
+        ]))
+        registry = SubscriberRegistry.from_path(path)
+        assert len(registry) == 2, (
+            'Проверьте, что реестр загружает всех подписчиков из JSON'
+        )
+        assert registry.get('b').chat_id == 2
+
+    def test_registry_from_sqlite(self, tmp_path):
+        path = tmp_path / 'subscribers.db'
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE subscribers (token, chat_id)')
+        connection.execute("INSERT INTO subscribers VALUES ('a', 1)")
+        connection.commit()
+        connection.close()
+        registry = SubscriberRegistry.from_path(path)
+        assert [s.chat_id for s in registry] == [1], (
+            'Проверьте, что реестр загружает подписчиков из SQLite'
+        )
+
+    def test_shared_token_merges_chats(self, tmp_path):
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps({'cohort': [1, 2], 'personal': 3}))
+        save_subscriber(path, 'cohort', 4)
+        save_subscriber(path, 'cohort', 4)
+        registry = SubscriberRegistry.from_path(path)
+        assert len(registry) == 2, (
+            'Проверьте, что общий токен опрашивается одним подписчиком'
+        )
+        assert registry.get('cohort').chats == (1, 2, 4), (
+            'Проверьте, что новый чат дописывается к токену, а не заменяет '
+            'прежние'
+        )
+        assert registry.get('personal').chats == (3,)
+
+    def test_verdict_rendered_once_for_all_chats(self, monkeypatch):
+        rendered = []
+        parse_status = homework.parse_status
+
+        def counting_parse_status(homework):
+            rendered.append(homework)
+            return parse_status(homework)
+
+        monkeypatch.setattr(homework, 'parse_status', counting_parse_status)
+        registry = SubscriberRegistry()
+        for chat_id in (1, 2, 3):
+            registry.subscribe('cohort', chat_id)
+        queue = ListQueue()
+        homework.process_response(queue, registry.get('cohort'), {
+            'homeworks': [{'id': 1, 'homework_name': 'hw',
+                           'status': 'approved'}],
+            'current_date': 1,
+        })
+        assert len(rendered) == 1, (
+            'Проверьте, что вердикт составляется один раз на все чаты'
+        )
+        assert [chats for chats, _ in queue] == [(1, 2, 3)], (
+            'Проверьте, что вердикт ставится во все чаты одним вызовом'
+        )
+
+    def test_failure_reported_to_owner_only(self, monkeypatch):
+        class ServerError:
+            status_code = 500
+            headers = {}
+
+        monkeypatch.setattr(homework.api_client, 'get',
+                            lambda **kwargs: ServerError())
+        registry = SubscriberRegistry()
+        for chat_id in (1, 2, 3):
+            registry.subscribe('secret-token', chat_id)
+        queue = ListQueue()
+        homework.handle_answer(queue, ErrorAggregator(),
+                               registry.get('secret-token'),
+                               partial(homework.get_api_answer_for,
+                                       'secret-token', 0))
+        assert [chats for chats, _ in queue] == [(1,)], (
+            'Проверьте, что о сбое общего токена узнаёт только его владелец'
+        )
+        assert 'secret-token' not in queue[0][1], (
+            'Проверьте, что токен не попадает в текст сообщения о сбое'
+        )
+
+    def test_engine_polls_everyone_with_bounded_concurrency(self):
+        registry = SubscriberRegistry(
+            Subscriber(str(i), i) for i in range(50)
+        )
+        polled = []
+        active = [0, 0]
+        lock = threading.Lock()
+
+        def poll(subscriber):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            polled.append(subscriber.chat_id)
+            with lock:
+                active[0] -= 1
+
+        engine = PollingEngine(registry, poll, 4, FixedPolicy())
+        engine.run_cycle()
+        engine.shutdown()
+        assert sorted(polled) == list(range(50)), (
+            'Проверьте, что за цикл опрашивается каждый подписчик'
+        )
+        assert active[1] <= 4, (
+            'Проверьте, что опросов одновременно не больше max_concurrency'
+        )
@@ -37,3 +37,25 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+    """Clock for time-dependent code: returns `now`, moved by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ListQueue(list):
+    """Send queue stub that records each call as (chat_ids, message)."""
+
+    def put(self, chat_id, message):
+        self.put_many((chat_id,), message)
+
+    def put_many(self, chat_ids, message):
+        self.append((tuple(chat_ids), message))
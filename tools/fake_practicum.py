@@ -0,0 +1,240 @@
+"""Локальная замена API Практикума и Bot API телеграма для нагрузочных тестов.
+
+Запуск: python -m tools.fake_practicum --port 8080 --latency 0.2
+Бот направляется на заглушку переменными окружения
+PRACTICUM_ENDPOINT=http://127.0.0.1:8080/api/user_api/homework_statuses/
+TELEGRAM_API_URL=http://127.0.0.1:8080/bot
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+API_PATH = '/api/user_api/homework_statuses/'
+STATUS_CYCLE = ('reviewing', 'rejected', 'reviewing', 'approved')
+HOMEWORK_NAME = re.compile(r'"([^"]+)"')
+# Ответы Bot API, нужные Updater в режиме приёма команд.
+BOT_METHODS = {
+    'getMe': {'id': 1234, 'is_bot': True, 'first_name': 'Заглушка',
+              'username': 'fake_bot'},
+    'deleteWebhook': True,
+    'getUpdates': [],
+}
+
+
+def iso(timestamp):
+    """Дата в формате date_updated API Практикума."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%SZ'
+    )
+
+
+class Simulation:
+    """Состояние заглушки: работы по токенам и статистика доставки.
+
+    У каждого токена homeworks работ, статус каждой меняется по кругу
+    STATUS_CYCLE в среднем transition_rate раз в секунду. Переходы
+    разыгрываются при опросе токена, но время перехода - случайный момент
+    с прошлого опроса, а не момент опроса: так задержка «смена статуса ->
+    уведомление», которая считается по приходу сообщения в фейковый
+    телеграм, включает и ожидание опроса.
+    """
+
+    def __init__(self, homeworks=3, transition_rate=0.01, latency=0.0,
+                 error_rate=0.0, padding=0, telegram_latency=0.0,
+                 telegram_429_rate=0.0, seed=None):
+        self.homeworks = homeworks
+        self.transition_rate = transition_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.padding = padding
+        self.telegram_latency = telegram_latency
+        self.telegram_429_rate = telegram_429_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.transitions = {}
+        self.latencies = []
+        self.counters = {'polls': 0, 'api_errors': 0, 'messages': 0,
+                         'telegram_429': 0, 'transitions': 0}
+
+    def _advance(self, token, now):
+        state = self.tokens.get(token)
+        if state is None:
+            state = self.tokens[token] = {'updated': now, 'homeworks': [
+                [index, f'{token}/{index}', 0, now]
+                for index in range(self.homeworks)
+            ]}
+        since = state['updated']
+        elapsed = now - since
+        state['updated'] = now
+        probability = min(1.0, elapsed * self.transition_rate)
+        for homework in state['homeworks']:
+            if self.random.random() < probability:
+                changed_at = since + self.random.random() * elapsed
+                homework[2] = (homework[2] + 1) % len(STATUS_CYCLE)
+                homework[3] = changed_at
+                self.transitions[homework[1]] = changed_at
+                self.counters['transitions'] += 1
+        return state['homeworks']
+
+    def answer(self, token, from_date):
+        """Тело ответа homework_statuses или None для имитации сбоя."""
+        now = time.time()
+        with self.lock:
+            self.counters['polls'] += 1
+            if self.random.random() < self.error_rate:
+                self.counters['api_errors'] += 1
+                return None
+            homeworks = [
+                {'id': index, 'homework_name': name,
+                 'status': STATUS_CYCLE[status], 'date_updated': iso(updated),
+                 'lesson_name': 'Нагрузочный тест', 'reviewer_comment': ''}
+                for index, name, status, updated in self._advance(token, now)
+                if updated >= from_date
+            ]
+        homeworks.extend(
+            {'id': -index, 'homework_name': f'{token}/old{index}',
+             'status': 'approved', 'date_updated': iso(0),
+             'lesson_name': 'Архив', 'reviewer_comment': 'Ок'}
+            for index in range(1, self.padding + 1)
+        )
+        return {'homeworks': homeworks, 'current_date': int(now)}
+
+    def delivered(self, text):
+        """Учитывает сообщение, пришедшее в фейковый телеграм."""
+        now = time.time()
+        with self.lock:
+            self.counters['messages'] += 1
+            if self.random.random() < self.telegram_429_rate:
+                self.counters['telegram_429'] += 1
+                return False
+            for name in HOMEWORK_NAME.findall(text):
+                changed_at = self.transitions.pop(name, None)
+                if changed_at is not None:
+                    self.latencies.append(now - changed_at)
+        return True
+
+    def stats(self):
+        """Счётчики и задержки доставки."""
+        with self.lock:
+            return dict(self.counters, latencies=list(self.latencies))
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Обработчик запросов к API Практикума и Bot API телеграма."""
+
+    simulation = None
+
+    def log_message(self, format, *args):
+        """Не пишет каждый запрос в stderr."""
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        """Статусы домашних работ и статистика заглушки."""
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            return self._reply(HTTPStatus.OK, self.simulation.stats())
+        if url.path != API_PATH:
+            return self._reply(HTTPStatus.NOT_FOUND, {})
+        token = self.headers.get('Authorization', '').partition(' ')[2]
+        query = parse_qs(url.query)
+        try:
+            from_date = float(query['from_date'][0])
+        except (KeyError, ValueError):
+            return self._reply(HTTPStatus.BAD_REQUEST, {
+                'code': 'UnknownError', 'message': 'from_date required'
+            })
+        time.sleep(self.simulation.latency)
+        answer = self.simulation.answer(token, from_date)
+        if answer is None:
+            return self._reply(HTTPStatus.INTERNAL_SERVER_ERROR, {})
+        return self._reply(HTTPStatus.OK, answer)
+
+    def do_POST(self):
+        """Фейковый sendMessage телеграма."""
+        method = self.path.rpartition('/')[2]
+        if method in BOT_METHODS:
+            time.sleep(self.simulation.telegram_latency)
+            return self._reply(HTTPStatus.OK,
+                               {'ok': True, 'result': BOT_METHODS[method]})
+        if not self.path.endswith('/sendMessage'):
+            return self._reply(HTTPStatus.NOT_FOUND, {'ok': False})
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.simulation.telegram_latency)
+        if not self.simulation.delivered(payload.get('text', '')):
+            return self._reply(HTTPStatus.TOO_MANY_REQUESTS, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            })
+        return self._reply(HTTPStatus.OK, {'ok': True, 'result': {
+            'message_id': 1, 'date': int(time.time()),
+            'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }})
+
+
+def make_server(simulation, host='127.0.0.1', port=0):
+    """HTTP сервер заглушки. port=0 - выбрать свободный порт."""
+    handler = type('SimulationHandler', (Handler,),
+                   {'simulation': simulation})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--homeworks', type=int, default=3,
+                        help='работ на токен')
+    parser.add_argument('--transition-rate', type=float, default=0.01,
+                        help='смен статуса работы в секунду')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка ответа API, с')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов API с кодом 500')
+    parser.add_argument('--padding', type=int, default=0,
+                        help='лишних старых работ в каждом ответе')
+    parser.add_argument('--telegram-latency', type=float, default=0.0,
+                        help='задержка ответа телеграма, с')
+    parser.add_argument('--telegram-429-rate', type=float, default=0.0,
+                        help='доля отправок, отвергнутых с 429')
+    parser.add_argument('--seed', type=int)
+    return parser.parse_args(argv)
+
+
+def simulation_from_args(args):
+    """Simulation по аргументам командной строки."""
+    return Simulation(
+        homeworks=args.homeworks, transition_rate=args.transition_rate,
+        latency=args.latency, error_rate=args.error_rate,
+        padding=args.padding, telegram_latency=args.telegram_latency,
+        telegram_429_rate=args.telegram_429_rate, seed=args.seed,
+    )
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    http_server = make_server(simulation_from_args(arguments),
+                              arguments.host, arguments.port)
+    print(f'Заглушка слушает http://{arguments.host}:'
+          f'{http_server.server_port}{API_PATH}')
+    http_server.serve_forever()
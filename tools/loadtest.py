@@ -0,0 +1,151 @@
+"""Нагрузочный тест бота против локальной заглушки API и телеграма.
+
+Запуск: python -m tools.loadtest --subscribers 2000 --latency 0.3
+Заглушка работает в отдельном процессе, поэтому пиковая память в отчёте -
+память самого бота. Отчёт печатается в JSON.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import resource
+import statistics
+import time
+from functools import partial
+from urllib.request import urlopen
+
+from telegram import Bot
+from telegram.utils.request import Request
+
+import homework
+from api_client import PracticumClient
+from engine import PollingEngine
+from error_digest import ErrorAggregator
+from notifier import Outbox, SendQueue
+from policy import FixedPolicy
+from subscribers import Subscriber, SubscriberRegistry
+from tools import fake_practicum
+
+BOT_TOKEN = '1234:loadtest'
+
+
+def serve(args, ports):
+    """Точка входа процесса заглушки."""
+    server = fake_practicum.make_server(
+        fake_practicum.simulation_from_args(args)
+    )
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def percentile(values, share):
+    """Перцентиль share (0..1) списка values."""
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        min(98, max(0, round(share * 100) - 1))
+    ]
+
+
+def run_threads(registry, base_url, args):
+    """Гоняет синхронный движок args.duration секунд."""
+    homework.api_client = PracticumClient(
+        endpoint=base_url + fake_practicum.API_PATH,
+        pool_size=args.concurrency,
+    ).open()
+    bot = Bot(token=BOT_TOKEN, base_url=base_url + '/bot',
+              request=Request(con_pool_size=2))
+    send_queue = SendQueue(partial(homework.send_message_to, bot),
+                           Outbox(rate=args.telegram_rate)).start()
+    engine = PollingEngine(
+        registry,
+        partial(homework.poll_subscriber, send_queue, ErrorAggregator()),
+        args.concurrency, FixedPolicy(args.interval), stagger=args.interval,
+    )
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        engine.run_cycle()
+        time.sleep(min(engine.time_to_next_poll(),
+                       max(0.0, deadline - time.monotonic())))
+    engine.shutdown()
+    send_queue.stop(timeout=args.interval)
+    homework.api_client.close()
+
+
+def run_async(registry, base_url, args):
+    """Гоняет asyncio режим args.duration секунд."""
+    import async_bot
+    async_bot.ENDPOINT = base_url + fake_practicum.API_PATH
+    async_bot.TELEGRAM_SEND_URL = base_url + '/bot{token}/sendMessage'
+    coroutine = async_bot.run(
+        registry, BOT_TOKEN, args.concurrency, FixedPolicy(args.interval),
+        outbox=Outbox(rate=args.telegram_rate), stagger=args.interval,
+    )
+    try:
+        asyncio.run(asyncio.wait_for(coroutine, args.duration))
+    except asyncio.TimeoutError:
+        pass
+
+
+def build_parser():
+    """Парсер аргументов: параметры бота и параметры заглушки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=5,
+                        help='пауза между опросами подписчика, с')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--telegram-rate', type=float, default=1000,
+                        help='лимит отправок в телеграм в секунду')
+    parser.add_argument('--async', dest='use_async', action='store_true')
+    parser.add_argument('--log-level', default='CRITICAL')
+    return parser
+
+
+def main(argv=None):
+    """Запускает заглушку и бота, печатает отчёт."""
+    args, server_argv = build_parser().parse_known_args(argv)
+    logging.basicConfig(level=args.log_level)
+    server_args = fake_practicum.parse_args(server_argv)
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(server_args, ports),
+                                     daemon=True)
+    server.start()
+    base_url = f'http://127.0.0.1:{ports.get(timeout=10)}'
+    registry = SubscriberRegistry(
+        Subscriber(f'token{index}', index, timestamp=0)
+        for index in range(args.subscribers)
+    )
+    started = time.monotonic()
+    if args.use_async:
+        run_async(registry, base_url, args)
+    else:
+        run_threads(registry, base_url, args)
+    elapsed = time.monotonic() - started
+    with urlopen(base_url + '/stats') as response:
+        stats = json.load(response)
+    server.terminate()
+    latencies = stats.pop('latencies')
+    report = dict(
+        stats,
+        mode='async' if args.use_async else 'threads',
+        subscribers=args.subscribers,
+        elapsed=round(elapsed, 2),
+        polls_per_second=round(stats['polls'] / elapsed, 1),
+        messages_per_second=round(stats['messages'] / elapsed, 1),
+        notified=len(latencies),
+        latency_p50=percentile(latencies, 0.5),
+        latency_p99=percentile(latencies, 0.99),
+        max_rss_mb=round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()